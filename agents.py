@@ -50,21 +50,35 @@ agents = {}
 if not agents_config or not isinstance(agents_config, dict):
     raise ValueError("❌ Failed to load agents configuration correctly")
 
-for key, config in agents_config.items():
+
+def build_agent(key, agent_llm=None):
+    """Create a fresh Agent from its agents_config entry.
+
+    Agents keep per-run state, so concurrent runs each need their own.
+    """
+    config = agents_config[key]
     print(f"Creating agent: {key}")
     print(f"Config: {config}")
     
     if not all(k in config for k in ["role", "goal", "backstory"]):
         raise ValueError(f"❌ Missing required configuration for agent {key}")
     
-    agents[key] = Agent(
+    if agent_llm is None:
+        # One LLM per agent so telemetry can attribute every completion to its role.
+        agent_llm = GeminiWrapperLLM(api_key=api_key, model=llm.model, agent_role=config["role"],
+                                     max_tokens=llm.max_tokens)
+    return Agent(
         role=config["role"],
         goal=config["goal"],
         backstory=config["backstory"],
         verbose=config.get("verbose", True),
-        llm=llm
+        llm=agent_llm
     )
 
+
+for key in agents_config:
+    agents[key] = build_agent(key)
+
 project_planning_agent = agents.get("project_planning_agent")
 estimation_agent = agents.get("estimation_agent")
 resource_allocation_agent = agents.get("resource_allocation_agent")
@@ -1,11 +1,7 @@
 import time
-import threading
 import streamlit as st
 import json
 from crewai import Agent
-from crewai import LLM 
-from litellm import completion
-from typing import Optional, List, Any
 import os
 from dotenv import load_dotenv
 from config_loader import agents_config, tasks_config
@@ -17,11 +13,18 @@ from trello_utils import (
     check_phase_completion,
     get_or_create_list
 )
+from sync_scheduler import register_project, extend_project, get_project_status
 from agents import project_planning_agent, estimation_agent, resource_allocation_agent, save_allocation_to_json
-from crew_definition import crew
+from crew_definition import STRUCTURED_ALLOCATION
+from incremental_crew import run_incremental_crew
 from crew_input import inputs
+from fanout_planner import run_fanout_plan
+from plan_library import get_plan_library, remember_plan, reuse_plan, fingerprint
 from litellm.exceptions import RateLimitError
-from parse_allocation import parse_allocation_plan
+from parse_allocation import parse_allocation_output, AllocationPlanParser, phase_tasks, plan_tasks
+from llm_telemetry import get_telemetry
+from llm_scheduler import llm_priority, INTERACTIVE
+from gemini_wrapper import GeminiWrapperLLM
 
 # Load environment variables
 load_dotenv()
@@ -30,38 +33,10 @@ api_key = os.getenv("GOOGLE_API_KEY")
 if not api_key:
     raise ValueError("❌ GOOGLE_API_KEY is missing! Check your .env file.")
 
-class GeminiWrapperLLM(LLM):
-    def __init__(self, api_key: str, model: str = "gemini/gemini-1.5-flash"):
-        super().__init__(model=model)
-        self.api_key = api_key
-        os.environ["GOOGLE_API_KEY"] = api_key  
-
-    @property
-    def supports_stop_words(self) -> bool:
-        return False  
-
-    def generate_response(self, prompt: str, **kwargs) -> str:
-        try:
-            response = completion(
-                model=self.model,
-                messages=[{"content": prompt, "role": "user"}],
-                api_key=self.api_key,
-                temperature=0.7,
-                max_tokens=2000,
-                **kwargs
-            )
-            return response.choices[0].message.content
-        except RateLimitError as e:
-            st.error("⚠️ API rate limit exceeded. Please try again later.")
-            return f"Rate limit error: {str(e)}"
-        except Exception as e:
-            st.error(f"❌ Gemini API Error: {str(e)}")
-            return f"API error: {str(e)}"
-
-
 llm = GeminiWrapperLLM(
     api_key=api_key,
-    model="gemini/gemini-1.5-flash"
+    model="gemini/gemini-1.5-flash",
+    agent_role=agents_config["resource_allocation_agent"]["role"]
 )
 
 
@@ -89,90 +64,85 @@ inputs["project_objectives"] = st.sidebar.text_area("Project Objectives", value=
 inputs["industry"] = st.sidebar.text_input("Industry", value=inputs["industry"])
 inputs["team_members"] = st.sidebar.text_area("Team Members", value=inputs["team_members"])
 inputs["project_requirements"] = st.sidebar.text_area("Project Requirements", value=inputs["project_requirements"])
+generation_mode = st.sidebar.radio(
+    "Generation Mode", ["Sequential crew", "Parallel phases", "Stream allocation plan"],
+    help="Parallel phases plans each phase concurrently after the planner lists them; "
+         "streaming generates the allocation plan in one call and starts syncing Phase 1 while the rest is written."
+)
+structured_output = st.sidebar.checkbox(
+    "Structured JSON allocation", value=STRUCTURED_ALLOCATION,
+    help="Sequential crew only: the allocator answers in compact JSON that is validated against a schema, "
+         "with one repair prompt if it does not match."
+)
+plan_library = get_plan_library()
+similar_plan = plan_library.find(inputs) if plan_library and generation_mode != "Stream allocation plan" else None
+reuse_similar = False
+if similar_plan:
+    stored_inputs = similar_plan["inputs"]
+    st.sidebar.info(f"📚 A stored plan for \"{stored_inputs.get('project_type')}\" "
+                    f"({stored_inputs.get('industry')}) is {similar_plan['score']:.0%} similar to this project.")
+    reuse_similar = st.sidebar.checkbox(
+        "Reuse the stored plan", value=True,
+        help="The stored plan is shown instantly if the team is unchanged; otherwise only the allocation step "
+             "is re-run for these team members."
+    )
 
 
-def run_crew_with_retry():
-    retries = 3
-    for attempt in range(retries):
-        try:
-            with st.spinner("🔄 Running AI Agents..."):
-                result = crew.kickoff(inputs=inputs)
-            return result.dict()
-        except RateLimitError:
-            wait_time = 10 * (attempt + 1)
-            st.warning(f"🚨 Rate Limit Exceeded! Retrying in {wait_time} seconds...")
-            time.sleep(wait_time)
-        except Exception as e:
-            st.error(f"❌ Error running CrewAI: {str(e)}")
-            return None
-    st.error("Crew execution failed after multiple attempts. Try again later.")
-    return None
-
-
-def check_phases_background(board_id, phases):
-    """Background thread to monitor phase completion and add new phases sequentially"""
-
-    sorted_phases = sorted(phases.keys(), key=int)
-    
-    if not sorted_phases:
-        st.session_state.trello_status = "⚠️ No phases found in tasks!"
-        st.session_state.syncing = False
+def render_llm_telemetry():
+    """Per-agent latency, token and cost summary for the sidebar."""
+    summary = get_telemetry().summary()
+    if not summary:
         return
-    
+    st.sidebar.header("LLM Telemetry")
+    for role, stats in summary.items():
+        st.sidebar.markdown(
+            f"**{role}** - {stats['calls']} calls ({stats['cached']} cached, {stats['retries']} retries)  \n"
+            f"⏱️ p50 {stats['p50_latency']}s · p95 {stats['p95_latency']}s  \n"
+            f"🔢 {stats['prompt_tokens']} + {stats['completion_tokens']} tokens · 💰 ${stats['cost']:.4f}"
+        )
 
-    current_phase_index = 0
-    
-
-    current_phase = sorted_phases[current_phase_index]
-    current_phase_name = f"Phase {current_phase} - Not Started"
-    
-
-    st.session_state.current_phase = current_phase
-    
- 
-    add_tasks_from_allocation(board_id, phases[current_phase], current_phase_name)
-    st.session_state.trello_status = f"✅ {current_phase_name} tasks added to Trello. Monitoring completion..."
-    
-
-    while current_phase_index < len(sorted_phases):
-        current_phase = sorted_phases[current_phase_index]
-        current_phase_name = f"Phase {current_phase} - Not Started"
-        completed_phase_name = f"Phase {current_phase} - Completed"
-        
-
-        st.session_state.current_phase = current_phase
-        st.session_state.trello_status = f"🔍 Monitoring completion of {current_phase_name}. Checking every 2 minutes..."
-        
 
-        while True:
-            if check_phase_completion(board_id, current_phase_name):
-                get_or_create_list(board_id, completed_phase_name)
-                st.session_state.trello_status = f"✅ {current_phase_name} completed!"
-                
-             
-                current_phase_index += 1
-                
-                if current_phase_index < len(sorted_phases):
-                    next_phase = sorted_phases[current_phase_index]
-                    next_phase_name = f"Phase {next_phase} - Not Started"
-                    
-              
-                    add_tasks_from_allocation(board_id, phases[next_phase], next_phase_name)
-                    st.session_state.current_phase = next_phase
-                    st.session_state.trello_status = f"🎉 Started {next_phase_name}. Monitoring completion..."
-                else:
-                    st.session_state.trello_status = "🎉 All phases completed! Project finished."
-                    st.session_state.syncing = False
-                    st.session_state.current_phase = None
-                    return
-                
-                break  
-            
-
-            time.sleep(120)  
-
-
-def sync_with_trello(parsed_data, tasks):
+def run_crew_with_retry():
+    # Throttled completions are retried one at a time by the shared LLM scheduler,
+    # so a RateLimitError here means its retries ran out.
+    try:
+        # Only the tasks whose inputs or upstream outputs changed since the last run are re-run.
+        with st.spinner("🔄 Running AI Agents..."), llm_priority(INTERACTIVE):
+            result = run_incremental_crew(inputs, structured=structured_output)
+        if result["reused_tasks"]:
+            st.info(f"♻️ Reused unchanged steps: {', '.join(result['reused_tasks'])}")
+        return result
+    except RateLimitError:
+        st.error("🚨 Rate limit still exceeded after retrying. Try again later.")
+        return None
+    except Exception as e:
+        st.error(f"❌ Error running CrewAI: {str(e)}")
+        return None
+
+
+def run_plan_reuse():
+    try:
+        with st.spinner("📚 Adapting the stored plan..."), llm_priority(INTERACTIVE):
+            return reuse_plan(similar_plan, inputs, structured=structured_output)
+    except Exception as e:
+        st.error(f"❌ Error reusing the stored plan: {str(e)}")
+        return None
+
+
+def run_fanout_with_retry():
+    try:
+        with st.spinner("🔄 Planning phases in parallel..."):
+            result = run_fanout_plan(inputs)
+    except Exception as e:
+        st.error(f"❌ Error running the fan-out planner: {str(e)}")
+        return None
+    if result.get("failed_phases"):
+        st.warning(f"⚠️ Planning failed for phase(s) {', '.join(result['failed_phases'])}; "
+                   "the plan below is incomplete and will not be synced to Trello. Generate it again to retry.")
+    return result
+
+
+def sync_with_trello(parsed_data, tasks, complete=True):
     """Start Trello synchronization process"""
     board_id = get_board_id()
     if not board_id:
@@ -187,71 +157,132 @@ def sync_with_trello(parsed_data, tasks):
     st.session_state.phases = phases
     
 
-    sync_thread = threading.Thread(
-        target=check_phases_background,
-        args=(board_id, phases),
-        daemon=True
-    )
-    sync_thread.start()
+    # One shared scheduler drives every session's project; we only keep its id. It comes
+    # from the inputs, so a re-run (even after a restart) finds its own tagged lists and cards.
+    st.session_state.project_id = fingerprint(inputs)
+    register_project(st.session_state.project_id, board_id, phases, complete)
 
 
-def ensure_fields_present(task):
-    """Ensure all required fields are present in task data, with proper formatting"""
+def extend_trello_sync(tasks, complete=False):
+    """Hand phases that finished streaming to the project registered by sync_with_trello."""
+    phases = parse_allocation_tasks(tasks)
+    for phase, phase_tasks in phases.items():
+        st.session_state.phases.setdefault(phase, []).extend(phase_tasks)
+    extend_project(st.session_state.project_id, phases, complete)
+
+
+def render_task(task):
+    st.markdown(f"### 🛠️ {task['task_name']}")
+    st.write(f"**👨‍💻 Assigned To:** {task['assigned_to']}")
+    st.write(f"**⏳ Duration:** {task['duration']}")
+    if task.get("resources"):
+        st.write(f"**👥 Resources:** {', '.join(task['resources'])}")
+    st.write(f"**📌 Phase:** {task['phase']}")
+    st.write("---")
+
+
+def allocation_prompt():
+    """The Resource Allocator's task as one self-contained prompt."""
+    config = tasks_config["resource_allocation"]
+    return f"{config['description'].format(**inputs)}\n\nExpected output: {config['expected_output']}"
+
+
+def stream_allocation_plan():
+    """Stream the allocation plan, rendering each phase and syncing it to Trello as soon as it is complete."""
+    parser = AllocationPlanParser()
+    raw_box = st.empty()
+    raw_text = ""
+    tasks = []
+    # Like the crew path, only start a sync if none is running for this session.
+    sync = {"allowed": not st.session_state.syncing, "registered": False}
+
+    def publish(events):
+        for event in events:
+            if event[0] != "phase":
+                continue
+            new_tasks = phase_tasks(event[1])
+            tasks.extend(new_tasks)
+            for task in new_tasks:
+                render_task(task)
+            if sync["registered"]:
+                extend_trello_sync(new_tasks)
+            elif sync["allowed"]:
+                sync["allowed"] = False
+                st.session_state.syncing = True
+                sync_with_trello(None, new_tasks, complete=False)
+                sync["registered"] = st.session_state.syncing
+
+    st.subheader("📋 Project Tasks")
+    failed = True
+    try:
+        with st.spinner("🔄 Streaming the allocation plan..."):
+            for chunk in llm.generate_response_stream(allocation_prompt()):
+                raw_text += chunk
+                raw_box.code(raw_text, language="markdown")
+                publish(parser.feed(chunk))
+            publish(parser.close())
+        failed = False
+    except RateLimitError:
+        st.error("⚠️ API rate limit exceeded. Please try again later.")
+    except Exception as e:
+        st.error(f"❌ Gemini API Error: {str(e)}")
+
+    if failed:
+        # Like an incomplete fan-out plan: the partial plan is neither finalized nor saved.
+        parser.close(truncated=True)
+        if sync["registered"]:
+            # The phases already synced stay on Trello; a new run of this project picks them up.
+            st.session_state.syncing = False
+            st.warning("⚠️ The allocation plan stopped before it finished. The phases synced so far stay on "
+                       "Trello, but the project is left incomplete. Generate the plan again to finish it.")
+        return
 
-    if "assigned_to" in task:
-        if isinstance(task["assigned_to"], list):
-            task["assigned_to"] = ", ".join(task["assigned_to"])
-        elif task["assigned_to"] is None:
-            task["assigned_to"] = "Unassigned"
+    if sync["registered"]:
+        extend_project(st.session_state.project_id, {}, complete=True)
+    if tasks:
+        save_allocation_to_json(tasks)
+        st.success("✅ Project Plan Generated!")
     else:
-        task["assigned_to"] = "Unassigned"
-    
-
-    if "duration" not in task or not task["duration"]:
-        task["duration"] = "N/A"
-    
-
-    if "resources" not in task or not task["resources"]:
-        task["resources"] = []
-    
-    return task
+        st.warning("⚠️ No resource allocation output was generated.")
 
 
-if st.sidebar.button("Generate Project Plan"):
-    result = run_crew_with_retry()
+generate = st.sidebar.button("Generate Project Plan")
+if generate and generation_mode == "Stream allocation plan":
+    stream_allocation_plan()
+elif generate:
+    if reuse_similar:
+        result = run_plan_reuse()
+    else:
+        result = run_fanout_with_retry() if generation_mode == "Parallel phases" else run_crew_with_retry()
     if result:
         raw_alloc = None
+        structured_alloc = None
         if "tasks_output" in result and isinstance(result["tasks_output"], list):
             for task_output in result["tasks_output"]:
                 if isinstance(task_output, dict) and task_output.get("agent") == "Resource Allocator":
                     raw_alloc = task_output.get("raw")
+                    structured_alloc = task_output.get("pydantic")
                     break
         
         if raw_alloc:
             st.text_area("Raw Allocation Output", raw_alloc, height=200)
 
-            parsed_data = parse_allocation_plan(raw_alloc)
+            parsed_data = parse_allocation_output(raw_alloc, structured_alloc)
             tasks = []
             
 
             st.write("Debug - Parsed data structure:", parsed_data)
             
-            for phase in parsed_data.get("phases", []):
-                for task in phase.get("tasks", []):
-    
-                    task = ensure_fields_present(task)
-                    
-                    tasks.append({
-                        "task_name": f"{task.get('task_id', 'Task')} - {task.get('task_name', 'Unnamed Task')}",
-                        "assigned_to": task["assigned_to"],
-                        "duration": task["duration"],
-                        "resources": task.get("resources", []),
-                        "phase": f"{phase.get('phase_number', '0')}. {phase.get('phase_name', 'Unnamed Phase')}"
-                    })
+            tasks.extend(plan_tasks(parsed_data))
+            if tasks and not reuse_similar:
+                remember_plan(inputs, result)
 
             st.write("Debug - Tasks before saving:", tasks)
             
-            save_allocation_to_json(tasks)
+            # An incomplete fan-out plan is shown but neither saved nor synced.
+            complete_plan = not result.get("failed_phases")
+            if complete_plan:
+                save_allocation_to_json(tasks)
 
             st.success("✅ Project Plan Generated!")
             st.subheader("📌 Project Overview")
@@ -263,16 +294,10 @@ if st.sidebar.button("Generate Project Plan"):
             
             st.subheader("📋 Project Tasks")
             for task in tasks:
-                st.markdown(f"### 🛠️ {task['task_name']}")
-                st.write(f"**👨‍💻 Assigned To:** {task['assigned_to']}")
-                st.write(f"**⏳ Duration:** {task['duration']}")
-                if task.get("resources"):
-                    st.write(f"**👥 Resources:** {', '.join(task['resources'])}")
-                st.write(f"**📌 Phase:** {task['phase']}")
-                st.write("---")
+                render_task(task)
 
 
-            if not st.session_state.syncing:
+            if complete_plan and not st.session_state.syncing:
                 st.session_state.syncing = True
                 sync_with_trello(parsed_data, tasks)
 
@@ -282,18 +307,27 @@ if st.sidebar.button("Generate Project Plan"):
 
 
 if st.session_state.syncing:
+    sync_status = get_project_status(st.session_state.get("project_id"))
+    if sync_status:
+        st.session_state.trello_status = sync_status["status"]
+        st.session_state.current_phase = sync_status["current_phase"]
+        if sync_status["state"] == "done":
+            st.session_state.syncing = False
+
     st.subheader("🔄 Trello Synchronization Status")
     st.info(st.session_state.trello_status)
     
     if st.session_state.current_phase and st.session_state.phases:
         current_phase = st.session_state.current_phase
-        phase_tasks = st.session_state.phases.get(current_phase, [])
+        current_tasks = st.session_state.phases.get(current_phase, [])
         
         st.subheader(f"Current Phase: {current_phase}")
-        if phase_tasks:
-            st.write(f"Tasks in this phase: {len(phase_tasks)}")
-            for task in phase_tasks:
+        if current_tasks:
+            st.write(f"Tasks in this phase: {len(current_tasks)}")
+            for task in current_tasks:
                 st.write(f"- {task.get('task_name')} (Assigned to: {task.get('assigned_to')})")
     
     if st.button("Refresh Status"):
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+render_llm_telemetry()
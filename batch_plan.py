@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from config_loader import agents_config
+from crew_input import inputs as default_inputs
+from llm_scheduler import get_llm_scheduler, llm_priority, BATCH
+from parse_allocation import parse_allocation_output, plan_tasks
+from plan_library import remember_plan
+
+load_dotenv()
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+BATCH_OUTPUT_DIR = os.getenv("BATCH_OUTPUT_DIR", "batch_output")
+INPUT_KEYS = list(default_inputs.keys())
+
+
+def input_id(project_inputs):
+    """Stable id for one input line: its own "id" field, or a hash of its inputs."""
+    if project_inputs.get("id"):
+        return str(project_inputs["id"])
+    material = json.dumps({key: project_inputs.get(key) for key in INPUT_KEYS}, sort_keys=True)
+    return f"project-{hashlib.sha1(material.encode('utf-8')).hexdigest()[:12]}"
+
+
+def read_inputs(path):
+    """Yield (id, inputs, error) for every non-empty line of a JSONL file."""
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                project_inputs = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"line-{line_number}", None, f"invalid JSON: {str(e)}"
+                continue
+            missing = [key for key in INPUT_KEYS if not project_inputs.get(key)]
+            project_id = input_id(project_inputs)
+            if missing:
+                yield project_id, None, f"missing inputs: {', '.join(missing)}"
+            else:
+                yield project_id, {key: project_inputs[key] for key in INPUT_KEYS}, None
+
+
+def output_path(output_dir, project_id):
+    return os.path.join(output_dir, f"{project_id}.json")
+
+
+def is_done(output_dir, project_id):
+    try:
+        with open(output_path(output_dir, project_id)) as f:
+            return json.load(f).get("status") == "done"
+    except (OSError, ValueError):
+        return False
+
+
+def write_json(path, data):
+    # Write-then-rename, so an interrupted batch never leaves a half-written output behind.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def allocator_output(result):
+    """The Resource Allocator's task output from a crew.kickoff().dict()-shaped result."""
+    tasks_output = result.get("tasks_output") or []
+    allocator = agents_config["resource_allocation_agent"]["role"]
+    for task_output in tasks_output:
+        if isinstance(task_output, dict) and task_output.get("agent") == allocator:
+            return task_output
+    return tasks_output[-1] if tasks_output else {"raw": result.get("raw")}
+
+
+def usage_metrics(crew):
+    usage = crew.usage_metrics
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump()
+    return usage.dict() if hasattr(usage, "dict") else dict(usage or {})
+
+
+def plan_project(project_inputs, mode="crew", structured=False):
+    """Run one project's planning crew; returns (kickoff result dict, usage metrics)."""
+    if mode == "fanout":
+        from fanout_planner import run_fanout_plan
+        result = run_fanout_plan(project_inputs)
+        return result, result.get("token_usage", {})
+    from crew_definition import build_crew
+    # Fresh agents and tasks per project: crews running side by side must not share state.
+    crew = build_crew(structured=structured)
+    result = crew.kickoff(inputs=project_inputs)
+    return result.dict(), usage_metrics(crew)
+
+
+def run_one(project_id, project_inputs, output_dir, mode, structured=False):
+    started = time.monotonic()
+    with llm_priority(BATCH):
+        result, usage = plan_project(project_inputs, mode, structured)
+    output = allocator_output(result)
+    raw = output.get("raw") or ""
+    parsed = parse_allocation_output(raw, output.get("pydantic"))
+    if not parsed["phases"]:
+        # Leave no output, so the next run of the batch tries this project again.
+        raise RuntimeError("no phases could be parsed from the allocation output")
+    record = {
+        "id": project_id,
+        "status": "done",
+        "mode": mode,
+        "inputs": project_inputs,
+        "plan": parsed,
+        "tasks": plan_tasks(parsed),
+        "raw_allocation": raw,
+        "usage": usage,
+        "seconds": round(time.monotonic() - started, 2)
+    }
+    write_json(output_path(output_dir, project_id), record)
+    remember_plan(project_inputs, result)
+    return record
+
+
+def run_batch(input_file, output_dir=BATCH_OUTPUT_DIR, workers=BATCH_WORKERS, mode="crew", force=False,
+              structured=False):
+    """Plan every project in input_file; completed ones are skipped unless force is set."""
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, "summary.jsonl")
+    summary_lock = threading.Lock()
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+
+    def log(entry):
+        with summary_lock:
+            with open(summary_path, "a") as f:
+                f.write(json.dumps(dict(entry, timestamp=time.time())) + "\n")
+
+    pending = []
+    seen = set()
+    for project_id, project_inputs, error in read_inputs(input_file):
+        if project_id in seen:
+            print(f"⚠️ Duplicate input {project_id}; planning it once")
+            continue
+        seen.add(project_id)
+        if error:
+            print(f"❌ {project_id}: {error}")
+            counts["failed"] += 1
+            log({"id": project_id, "status": "failed", "error": error})
+        elif not force and is_done(output_dir, project_id):
+            counts["skipped"] += 1
+        else:
+            pending.append((project_id, project_inputs))
+
+    print(f"📦 {len(pending)} projects to plan ({counts['skipped']} already done) with {workers} workers")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(run_one, project_id, project_inputs, output_dir, mode, structured): project_id
+                   for project_id, project_inputs in pending}
+        for future in as_completed(futures):
+            project_id = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"❌ {project_id} failed: {str(e)}")
+                counts["failed"] += 1
+                log({"id": project_id, "status": "failed", "error": str(e)})
+                continue
+            counts["done"] += 1
+            print(f"✅ {project_id}: {len(record['tasks'])} tasks in {record['seconds']}s")
+            log({"id": project_id, "status": "done", "tasks": len(record["tasks"]),
+                 "seconds": record["seconds"], "usage": record["usage"]})
+
+    print(f"🏁 Batch finished: {counts['done']} planned, {counts['skipped']} skipped, {counts['failed']} failed")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan many projects from a JSONL file of crew inputs.")
+    parser.add_argument("input_file", help="JSONL with one object per project (same keys as crew_input.inputs)")
+    parser.add_argument("--output-dir", default=BATCH_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--mode", choices=["crew", "fanout"], default="crew",
+                        help="Sequential crew per project, or the parallel per-phase planner")
+    parser.add_argument("--format", choices=["markdown", "json"], default=os.getenv("ALLOCATION_FORMAT", "markdown"),
+                        help="Allocation output format in crew mode; json is validated against AllocationPlanOutput")
+    parser.add_argument("--rpm", type=int, help="Override the shared requests-per-minute budget")
+    parser.add_argument("--tpm", type=int, help="Override the shared tokens-per-minute budget")
+    parser.add_argument("--force", action="store_true", help="Re-plan projects that already have an output")
+    args = parser.parse_args(argv)
+
+    scheduler = get_llm_scheduler()
+    if args.rpm:
+        scheduler.rpm = args.rpm
+    if args.tpm:
+        scheduler.tpm = args.tpm
+    counts = run_batch(args.input_file, args.output_dir, args.workers, args.mode, args.force,
+                       args.format == "json")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import pstats
+import argparse
+import cProfile
+import tempfile
+
+# Offline runs need no real key, and should leave the real telemetry log alone.
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LLM_TELEMETRY_FILE", "")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+import benchmark_sync
+from fake_llm import LLMBackend, SyntheticLLM, set_llm_backend, FAKE_LLM_FIXTURES
+from crew_input import inputs
+from parse_allocation import parse_allocation_output, plan_tasks
+from agents import save_allocation_to_json
+from llm_telemetry import get_telemetry
+
+
+def run_pipeline(mode="crew", workers=4, trello_latency=0.0, structured=False):
+    """crew.kickoff -> parse_allocation_output -> save_allocation_to_json -> Trello sync; returns stage timings."""
+    timings = {}
+
+    started = time.monotonic()
+    if mode == "fanout":
+        from fanout_planner import run_fanout_plan
+        result = run_fanout_plan(inputs)
+    else:
+        from crew_definition import build_crew
+        result = build_crew(structured=structured).kickoff(inputs=inputs).dict()
+    timings["kickoff"] = time.monotonic() - started
+
+    started = time.monotonic()
+    output = result["tasks_output"][-1]
+    parsed = parse_allocation_output(output["raw"], output.get("pydantic"))
+    tasks = plan_tasks(parsed)
+    timings["parse"] = time.monotonic() - started
+
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        save_allocation_to_json(tasks, os.path.join(tmp_dir, "allocation_tasks.json"))
+    timings["save"] = time.monotonic() - started
+
+    started = time.monotonic()
+    sync = benchmark_sync.run_sync(len(tasks), workers=workers, latency=trello_latency, tasks=tasks)
+    timings["trello_sync"] = time.monotonic() - started
+
+    timings["total"] = sum(timings.values())
+    return timings, {"phases": len(parsed["phases"]), "tasks": len(tasks), "trello_requests": sync["requests"],
+                     "cards_on_board": sync["cards_on_board"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the planning pipeline end to end against an offline LLM.")
+    parser.add_argument("--backend", choices=["synthetic", "replay", "record", "live"], default="synthetic")
+    parser.add_argument("--fixtures", default=FAKE_LLM_FIXTURES, help="Replay/record fixture file")
+    parser.add_argument("--mode", choices=["crew", "fanout"], default="crew")
+    parser.add_argument("--format", choices=["markdown", "json"], default="markdown",
+                        help="Allocation output format in crew mode")
+    parser.add_argument("--phases", type=int, default=10, help="Synthetic plan size: phases")
+    parser.add_argument("--tasks", type=int, default=4, help="Synthetic plan size: tasks per phase")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Synthetic latency per completion (seconds)")
+    parser.add_argument("--trello-latency", type=float, default=0.0, help="Fake Trello latency per request")
+    parser.add_argument("--workers", type=int, default=4, help="Trello sync workers")
+    parser.add_argument("--profile", action="store_true", help="Print the top functions by cumulative time")
+    args = parser.parse_args(argv)
+
+    set_llm_backend(LLMBackend(args.backend, fixtures=args.fixtures,
+                               synthetic=SyntheticLLM(args.phases, args.tasks, args.llm_latency)))
+    profiler = cProfile.Profile() if args.profile else None
+
+    # Silence crew and sync progress output while measuring.
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        if profiler:
+            profiler.enable()
+        timings, sizes = run_pipeline(args.mode, args.workers, args.trello_latency, args.format == "json")
+    finally:
+        if profiler:
+            profiler.disable()
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"📐 {sizes['phases']} phases, {sizes['tasks']} tasks, {sizes['cards_on_board']} cards on board, "
+          f"{sizes['trello_requests']} Trello requests ({args.backend} LLM, {args.mode} mode, {args.format})")
+    for stage, seconds in timings.items():
+        print(f"{stage:>12} {seconds:>9.3f}s")
+    for role, stats in get_telemetry().summary().items():
+        print(f"🤖 {role}: {stats['calls']} calls, p50 {stats['p50_latency']}s, p95 {stats['p95_latency']}s")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    return timings
+
+
+if __name__ == "__main__":
+    main()
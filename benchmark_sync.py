@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+# Keep the benchmark away from the real delta-poll cursor and board summary files.
+os.environ["TRELLO_CURSOR_FILE"] = ""
+os.environ["TRELLO_BOARD_SUMMARY_FILE"] = os.path.join(tempfile.gettempdir(), "benchmark_board_summary.json")
+
+import trello_utils
+from trello_utils import TrelloClient, TokenBucket, set_client, board_cache, BOARD_NAME
+from fake_trello import FakeTrello
+
+TEAM = {
+    "johndoe892004": "John Doe",
+    "janedoe": "Jane Doe",
+    "bobsmith892004": "Bob Smith",
+    "alicejohnson": "Alice Johnson",
+    "tombrown": "Tom Brown"
+}
+ROLES = ["Project Manager", "Software Engineer", "Designer", "QA Engineer", "QA Engineer"]
+
+
+def synthetic_plan(card_count, phase_count=None):
+    """Tasks in the allocation_tasks.json shape, spread evenly over phases."""
+    phase_count = phase_count or max(1, min(10, card_count // 10))
+    names = list(TEAM.values())
+    tasks = []
+    for index in range(card_count):
+        phase = index * phase_count // card_count + 1
+        member = index % len(names)
+        tasks.append({
+            "task_name": f"{phase}.{index + 1} - Synthetic task {index + 1}",
+            "assigned_to": f"{names[member]} ({ROLES[member]})",
+            "duration": f"{index % 5 + 1} days",
+            "resources": ["Laptop", "Design tools"],
+            "phase": f"{phase}. Synthetic Phase {phase}"
+        })
+    return tasks
+
+
+def run_sync(card_count, workers=1, latency=0.0, error_rate=0.0, throttle=False, tasks=None):
+    """Sync `tasks` (or a synthetic plan of card_count cards) through a fresh fake Trello."""
+    if tasks is not None:
+        card_count = len(tasks)
+    fake = FakeTrello(latency=latency, error_rate=error_rate, auto_complete=True, members=TEAM, seed=card_count)
+    fake.add_board(BOARD_NAME)
+    fake.start()
+
+    rate_limiter = None if throttle else TokenBucket(capacity=10 ** 9, period=1)
+    set_client(TrelloClient(api_key="bench", token="bench", base_url=fake.base_url,
+                            pool_size=max(10, workers), rate_limiter=rate_limiter))
+    board_cache.invalidate()
+    # Fake board ids repeat across runs; a stale summary would mark their phases as already finished.
+    if os.path.exists(trello_utils.BOARD_SUMMARY_FILE):
+        os.remove(trello_utils.BOARD_SUMMARY_FILE)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plan_file = os.path.join(tmp_dir, "allocation_tasks.json")
+        with open(plan_file, "w") as f:
+            json.dump(tasks if tasks is not None else synthetic_plan(card_count), f)
+
+        previous_json_file, previous_workers = trello_utils.JSON_FILE, trello_utils.TRELLO_SYNC_WORKERS
+        trello_utils.JSON_FILE, trello_utils.TRELLO_SYNC_WORKERS = plan_file, workers
+        started = time.monotonic()
+        try:
+            trello_utils.check_and_add_tasks()
+        finally:
+            trello_utils.JSON_FILE, trello_utils.TRELLO_SYNC_WORKERS = previous_json_file, previous_workers
+        elapsed = time.monotonic() - started
+
+    fake.stop()
+    requests_made = len(fake.log)
+    return {
+        "cards": card_count,
+        "cards_on_board": len(fake.cards),
+        "requests": requests_made,
+        "requests_per_card": round(requests_made / card_count, 2) if card_count else 0.0,
+        "throttled": fake.request_count(status=429),
+        "seconds": round(elapsed, 3),
+        "cards_per_second": round(card_count / elapsed, 2) if elapsed > 0 else 0.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Trello sync against a local fake Trello server.")
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated card counts")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected per-request latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--throttle", action="store_true", help="Keep the real 100 req / 10 s token bucket")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(",") if size]:
+        # Silence the per-card progress prints while measuring.
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            results.append(run_sync(size, args.workers, args.latency, args.error_rate, args.throttle))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    print(f"{'cards':>6} {'on board':>9} {'requests':>9} {'req/card':>9} {'429s':>5} {'seconds':>8} {'cards/s':>8}")
+    for result in results:
+        print(f"{result['cards']:>6} {result['cards_on_board']:>9} {result['requests']:>9} "
+              f"{result['requests_per_card']:>9} {result['throttled']:>5} {result['seconds']:>8} "
+              f"{result['cards_per_second']:>8}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
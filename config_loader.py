@@ -24,8 +24,14 @@ if not os.path.exists(tasks_config_path):
     tasks_config_path = os.path.join(os.path.dirname(__file__), 'tasks.yaml')
 
 
+members_config_path = os.path.join(CONFIG_DIR, 'members.yaml')
+if not os.path.exists(members_config_path):
+    members_config_path = os.path.join(os.path.dirname(__file__), 'members.yaml')
+
+
 agents_config = load_yaml_config(agents_config_path)
 tasks_config = load_yaml_config(tasks_config_path)
+members_config = load_yaml_config(members_config_path) or {}
 
 
 print(f"Loaded agents config from: {agents_config_path}")
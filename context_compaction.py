@@ -0,0 +1,170 @@
+import os
+import re
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# CONTEXT_COMPACTION=0 passes the upstream agents' full prose on as context.
+CONTEXT_COMPACTION = os.getenv("CONTEXT_COMPACTION", "1") != "0"
+
+# Anchored so a task or phase number is never read as the start of a range:
+# in "Task 1.10 - 2 days" the duration is "2 days", not "10 - 2 days".
+DURATION_PATTERN = re.compile(
+    r'(?<![\w.])(?<!Task )(?<!Phase )(\d+(?:\.\d+)?(?:\s*(?:-|–|to)\s*\d+(?:\.\d+)?)?\s*'
+    r'(?:hours?|hrs?|days?|weeks?|wks?|months?|sprints?))\b',
+    re.IGNORECASE
+)
+PHASE_PATTERN = re.compile(r'^Phase\s*(\d+)\s*[:.\-–]?\s*(.*)$', re.IGNORECASE)
+ITEM_PATTERN = re.compile(r'^(?:Task\s*)?(\d+(?:\.\d+)+|\d+[.)])?\s*[:.\-–]?\s*(.+)$', re.IGNORECASE)
+
+
+def _clean(line):
+    """Strip markdown decoration from one line."""
+    line = re.sub(r'[*_`]+', '', line.strip())
+    return line.lstrip('#>-•+ ').strip()
+
+
+def _is_item(raw_line):
+    stripped = raw_line.strip()
+    return bool(re.match(r'^(#{1,6}\s|[-*•+]\s|\d+(\.\d+)*[.)]?\s|\*\*|Task\s*\d)', stripped, re.IGNORECASE))
+
+
+def _table_row(raw_line):
+    """A markdown table row as the bullet line compact_context reads, e.g. '- 1.1 Design - 3 days'."""
+    cells = [_clean(cell) for cell in raw_line.strip().strip('|').split('|')]
+    task_id = next((cell for cell in cells if re.fullmatch(r'(Task\s*)?\d+(\.\d+)*', cell, re.IGNORECASE)), "")
+    duration = next((match.group(1) for match in map(DURATION_PATTERN.search, cells) if match), "")
+    name = next((cell for cell in cells
+                 if cell and cell != task_id and re.search(r'[A-Za-z]', DURATION_PATTERN.sub("", cell))
+                 and not PHASE_PATTERN.match(cell)), "")
+    phase = next((cell for cell in cells if PHASE_PATTERN.match(cell)), None)
+    lines = [phase] if phase else []
+    # Rows without a task id or duration (a team roster, say) aren't tasks.
+    if name and (task_id or duration):
+        lines.append("- " + " - ".join(part for part in (" ".join(filter(None, (task_id, name))), duration) if part))
+    return lines
+
+
+def _expand_tables(text):
+    """Lines of text with table header rows dropped and every other table row turned into an item."""
+    raw_lines = (text or "").splitlines()
+    lines = []
+    last_phase = None
+    for index, raw_line in enumerate(raw_lines):
+        if not raw_line.strip().startswith('|'):
+            lines.append(raw_line)
+            continue
+        following = raw_lines[index + 1].strip() if index + 1 < len(raw_lines) else ""
+        if following.startswith('|') and set(following) <= set('|-: '):
+            continue
+        for line in _table_row(raw_line):
+            # A phase column repeats on every row; only a new phase starts a header.
+            if PHASE_PATTERN.match(line):
+                if line == last_phase:
+                    continue
+                last_phase = line
+            lines.append(line)
+    return lines
+
+
+def compact_context(text):
+    """Reduce an agent's prose to phase headers plus one 'id name - duration' line per task.
+
+    Detail lines (rationale, descriptions) are dropped; a duration found on
+    them is attached to the item they belong to. Markdown table rows count
+    as items too. Text without a recognisable outline is returned
+    unchanged, so nothing is lost on free-form answers.
+    """
+    lines = []
+    items = 0
+    current = None
+
+    def flush():
+        nonlocal current
+        if current:
+            entry = "- " + " ".join(part for part in (current["id"], current["name"]) if part)
+            if current["duration"]:
+                entry += f" - {current['duration']}"
+            lines.append(entry)
+        current = None
+
+    for raw_line in _expand_tables(text):
+        line = _clean(raw_line)
+        if not line or line.startswith('---') or set(line) <= set('=|-: '):
+            continue
+
+        phase = PHASE_PATTERN.match(line)
+        if phase:
+            flush()
+            name = phase.group(2).split(" - ")[0].strip(" :")
+            lines.append(f"Phase {phase.group(1)}: {name}".rstrip(": "))
+            continue
+
+        if _is_item(raw_line):
+            label, _, value = line.partition(":")
+            duration = DURATION_PATTERN.search(line)
+            # "Duration: 3 days" style detail lines belong to the current item.
+            if current and value and len(label.split()) <= 4 and not re.match(r'^(Task\s*)?\d', label, re.IGNORECASE):
+                if duration and not current["duration"]:
+                    current["duration"] = duration.group(1)
+                continue
+            flush()
+            item = ITEM_PATTERN.match(line)
+            task_id = (item.group(1) or "").rstrip(".)") if item else ""
+            name = re.split(r':| - | – ', item.group(2) if item else line)[0]
+            name = re.sub(r'\(\s*\)', '', DURATION_PATTERN.sub("", name)).strip(" -–")[:80]
+            if name:
+                current = {"id": task_id, "name": name, "duration": duration.group(1) if duration else ""}
+                items += 1
+        elif current and not current["duration"]:
+            duration = DURATION_PATTERN.search(line)
+            if duration:
+                current["duration"] = duration.group(1)
+    flush()
+
+    if items == 0:
+        return text
+    return "\n".join(lines)
+
+
+def compacted_output(output):
+    """A copy of a TaskOutput whose raw text is its compact summary; the output itself is left as is."""
+    compacted = compact_context(output.raw)
+    if compacted is output.raw:
+        return output
+    print(f"🗜️ Compacted {getattr(output, 'agent', 'task')} output for the next agent: "
+          f"{len(output.raw)} -> {len(compacted)} chars")
+    return output.model_copy(update={"raw": compacted})
+
+
+def _compact_into(stand_in, previous):
+    """Task callback: hand the compact summary to stand_in, then run the callback the task already had."""
+    def callback(output):
+        stand_in.output = compacted_output(output)
+        if previous is not None:
+            return previous(output)
+    return callback
+
+
+def apply_context_compaction(tasks, enabled=CONTEXT_COMPACTION):
+    """Make every task but the first read the compact summaries of its upstream tasks as context.
+
+    Each upstream task gets a stand-in Task whose output its callback fills
+    with the summary, and downstream contexts point at the stand-ins. The
+    upstream outputs keep their full text, so crew_output.tasks_output and
+    anything stored from it are unaffected.
+    """
+    if not enabled or len(tasks) < 2:
+        return tasks
+    from crewai import Task
+
+    stand_ins = {}
+    for task in tasks[:-1]:
+        stand_ins[id(task)] = Task(description=task.description, expected_output=task.expected_output)
+        task.callback = _compact_into(stand_ins[id(task)], task.callback)
+    for index, task in enumerate(tasks[1:], start=1):
+        # A task without an explicit context reads every task before it.
+        context = task.context if isinstance(task.context, list) else tasks[:index]
+        task.context = [stand_ins.get(id(upstream), upstream) for upstream in context]
+    return tasks
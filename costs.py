@@ -1,9 +1,18 @@
+import os
 import pandas as pd
 from crew_definition import crew
+from agents import llm
+from llm_telemetry import LLMTelemetry, LLM_TELEMETRY_FILE, estimate_cost
 
-costs = 0.150 * (crew.usage_metrics.prompt_tokens + crew.usage_metrics.completion_tokens) / 1_000_000
+costs = estimate_cost(llm.model, crew.usage_metrics.prompt_tokens, crew.usage_metrics.completion_tokens)
 print(f" Total estimated cost: ${costs:.4f}")
 
 df_usage_metrics = pd.DataFrame([crew.usage_metrics.dict()])
 print("\nUsage Metrics:")
 print(df_usage_metrics)
+
+# Per-agent breakdown from the per-call telemetry log.
+if os.path.exists(LLM_TELEMETRY_FILE):
+    df_agents = pd.DataFrame.from_dict(LLMTelemetry(path=LLM_TELEMETRY_FILE).load().summary(), orient="index")
+    print("\nPer-agent Usage:")
+    print(df_agents)
@@ -4,18 +4,50 @@
 #     output_pydantic=ProjectPlanOutput,#this should be in task class, can mention in yaml file also. task.output. upgrade to gemini 2.0 flash
 #     verbose=True
 # )
+import os
+
 from crewai import Crew, Process
-from agents import project_planning_agent, estimation_agent, resource_allocation_agent
-from tasks import tasks
+from agents import project_planning_agent, estimation_agent, resource_allocation_agent, build_agent
+from tasks import tasks, build_task
 from config_loader import tasks_config
+from context_compaction import apply_context_compaction, CONTEXT_COMPACTION
+
+PLAN_TASKS = ["task_breakdown", "time_resource_estimation", "resource_allocation"]
+PROJECT_FIELDS = ["project_type", "industry", "project_objectives", "project_requirements"]
+# The input fields and upstream task outputs each plan task depends on; incremental_crew.py
+# re-runs a task only when one of them changed.
+TASK_GRAPH = {
+    "task_breakdown": {"inputs": PROJECT_FIELDS, "context": []},
+    "time_resource_estimation": {"inputs": PROJECT_FIELDS, "context": ["task_breakdown"]},
+    "resource_allocation": {"inputs": PROJECT_FIELDS + ["team_members"],
+                            "context": ["task_breakdown", "time_resource_estimation"]}
+}
+TASK_GRAPH["resource_allocation_json"] = TASK_GRAPH["resource_allocation"]
+# ALLOCATION_FORMAT=json asks the allocator for JSON validated against AllocationPlanOutput.
+STRUCTURED_ALLOCATION = os.getenv("ALLOCATION_FORMAT", "markdown") == "json"
+
+
+def plan_task_keys(structured=STRUCTURED_ALLOCATION):
+    return PLAN_TASKS[:-1] + ["resource_allocation_json"] if structured else list(PLAN_TASKS)
+
+
+def build_crew(compact_context=CONTEXT_COMPACTION, structured=STRUCTURED_ALLOCATION):
+    """A fresh planning crew with its own agents and tasks, for runs that must not share state."""
+    keys = plan_task_keys(structured)
+    crew_agents = {key: build_agent(tasks_config[key]["agent"]) for key in keys}
+    crew_tasks = [build_task(key, crew_agents[key]) for key in keys]
+    return Crew(
+        agents=list(crew_agents.values()),
+        tasks=apply_context_compaction(crew_tasks, compact_context),
+        verbose=True,
+        process=Process.sequential,
+        memory=False
+    )
+
 
 crew = Crew(
     agents=[project_planning_agent, estimation_agent, resource_allocation_agent],
-    tasks=[
-        tasks["task_breakdown"],
-        tasks["time_resource_estimation"],
-        tasks["resource_allocation"]
-    ],
+    tasks=apply_context_compaction([tasks[key] for key in plan_task_keys()]),
     verbose=True,
     process=Process.sequential,
     memory=False
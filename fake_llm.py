@@ -0,0 +1,236 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# live (default) | record | replay | synthetic
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live")
+FAKE_LLM_FIXTURES = os.getenv("FAKE_LLM_FIXTURES", os.path.join("fixtures", "llm_replay.jsonl"))
+FAKE_LLM_PHASES = int(os.getenv("FAKE_LLM_PHASES", "10"))
+FAKE_LLM_TASKS = int(os.getenv("FAKE_LLM_TASKS", "4"))
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.2"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+DEFAULT_TEAM = [
+    ("John Doe", "Project Manager"),
+    ("Jane Doe", "Software Engineer"),
+    ("Bob Smith", "Designer"),
+    ("Alice Johnson", "QA Engineer"),
+    ("Tom Brown", "QA Engineer")
+]
+PHASE_NAMES = [
+    "Requirements Gathering and Analysis", "Site Mapping and Wireframing", "UI/UX Design",
+    "Content Creation", "Front-end Development", "Back-end Development", "Database Implementation",
+    "Testing and QA", "Deployment", "Post-launch Support"
+]
+TASK_VERBS = ["Plan", "Draft", "Review", "Build", "Test", "Document", "Refine", "Integrate"]
+RESOURCES = ["Laptop", "Figma", "GitHub", "Jira", "Staging server", "Test devices", "Analytics"]
+
+
+def prompt_text(prompt):
+    """Flatten a prompt (string or chat messages) into one string."""
+    if isinstance(prompt, list):
+        return "\n".join(str(message.get("content", "")) for message in prompt if isinstance(message, dict))
+    return str(prompt or "")
+
+
+def prompt_key(prompt):
+    """Content hash of a prompt, used to look up recorded completions."""
+    material = json.dumps(prompt, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ReplayStore:
+    """Recorded completions in a JSONL file, looked up by prompt hash."""
+
+    def __init__(self, path=FAKE_LLM_FIXTURES):
+        self.path = path
+        self.responses = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[entry["key"]] = entry["response"]
+
+    def get(self, prompt):
+        key = prompt_key(prompt)
+        if key not in self.responses:
+            raise LookupError(f"No recorded completion for prompt {key[:12]} in {self.path}")
+        return self.responses[key]
+
+    def record(self, prompt, response):
+        key = prompt_key(prompt)
+        with self.lock:
+            if self.responses.get(key) == response:
+                return
+            self.responses[key] = response
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "prompt": prompt_text(prompt)[:200], "response": response}) + "\n")
+
+
+class SyntheticLLM:
+    """Generates plan-shaped markdown without calling a model.
+
+    The output follows whichever planning prompt it is given: a phase list
+    for the fan-out planner, a single phase for per-phase prompts, and a
+    full `## Phase N:` / `### Task N.M:` plan otherwise. Team members are
+    taken from the prompt when it lists them.
+    """
+
+    def __init__(self, phases=FAKE_LLM_PHASES, tasks_per_phase=FAKE_LLM_TASKS, latency=FAKE_LLM_LATENCY,
+                 seed=FAKE_LLM_SEED):
+        self.phases = phases
+        self.tasks_per_phase = tasks_per_phase
+        self.latency = latency
+        self.seed = seed
+
+    def team(self, text):
+        members = re.findall(r'([A-Z][a-z]+ [A-Z][a-z]+)\s*\(([^)]+)\)', text)
+        unique = []
+        for member in members:
+            if member not in unique:
+                unique.append(member)
+        return unique or DEFAULT_TEAM
+
+    def phase_name(self, number):
+        return PHASE_NAMES[(number - 1) % len(PHASE_NAMES)]
+
+    def render_phase(self, number, name, team, rng):
+        lines = [f"## Phase {number}: {name}"]
+        for index in range(1, self.tasks_per_phase + 1):
+            member, role = team[(number + index) % len(team)]
+            lines += [
+                f"### Task {number}.{index}: {rng.choice(TASK_VERBS)} {name.lower()} deliverable {index}",
+                f"- **Assigned to**: {member} ({role})",
+                f"- **Duration**: {rng.randint(1, 10)} days",
+                f"- **Resources needed**: {', '.join(rng.sample(RESOURCES, 2))}",
+                f"- **Dependencies**: {f'Task {number}.{index - 1}' if index > 1 else 'None'}",
+                ""
+            ]
+        return "\n".join(lines)
+
+    def render_json(self, team, rng):
+        phases = []
+        for number in range(1, self.phases + 1):
+            tasks = []
+            for index in range(1, self.tasks_per_phase + 1):
+                member, role = team[(number + index) % len(team)]
+                tasks.append({
+                    "id": f"{number}.{index}",
+                    "name": f"{rng.choice(TASK_VERBS)} {self.phase_name(number).lower()} deliverable {index}",
+                    "assigned_to": [f"{member} ({role})"],
+                    "duration": f"{rng.randint(1, 10)} days",
+                    "resources": rng.sample(RESOURCES, 2),
+                    "dependencies": [f"{number}.{index - 1}"] if index > 1 else []
+                })
+            phases.append({"number": number, "name": self.phase_name(number), "tasks": tasks})
+        return json.dumps({"phases": phases}, separators=(",", ":"))
+
+    def respond(self, prompt):
+        text = prompt_text(prompt)
+        rng = random.Random(f"{self.seed}:{prompt_key(prompt)}")
+        team = self.team(text)
+
+        if re.search(r'List the phases', text, re.IGNORECASE):
+            body = "\n\n".join(f"## Phase {n}: {self.phase_name(n)}\n- Deliver the {self.phase_name(n).lower()} work"
+                               for n in range(1, self.phases + 1))
+        elif "JSON" in text:
+            body = self.render_json(team, rng)
+        elif re.search(r'(Assign the tasks of|Break) Phase (\d+): (.+?) of the', text):
+            match = re.search(r'(Assign the tasks of|Break) Phase (\d+): (.+?) of the', text)
+            body = self.render_phase(int(match.group(2)), match.group(3), team, rng)
+        else:
+            project = re.search(r'Project Type: (.+)', text)
+            title = project.group(1).strip() if project else "Website"
+            body = f"# Resource Allocation Plan for {title} Project\n\n" + "\n".join(
+                self.render_phase(n, self.phase_name(n), team, rng) for n in range(1, self.phases + 1))
+
+        # crewai agents expect a ReAct-style answer; plain prompts get the markdown alone.
+        if isinstance(prompt, list):
+            body = f"Thought: I now can give a great answer\nFinal Answer: {body}"
+        return body
+
+    def complete(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.respond(prompt)
+
+    def stream(self, prompt, chunk_size=40):
+        text = self.respond(prompt)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+        for chunk in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield chunk
+
+
+class LLMBackend:
+    """Pluggable completion source for GeminiWrapperLLM.
+
+    "live" calls the model; "record" calls it and saves every completion to
+    the fixture file; "replay" serves completions from that file by prompt
+    hash; "synthetic" generates plan markdown locally. Offline modes skip
+    the response cache and the rate-limit scheduler.
+    """
+
+    def __init__(self, mode=LLM_BACKEND, fixtures=FAKE_LLM_FIXTURES, synthetic=None):
+        if mode not in ("live", "record", "replay", "synthetic"):
+            raise ValueError(f"Unknown LLM_BACKEND: {mode}")
+        self.mode = mode
+        self.store = ReplayStore(fixtures) if mode in ("record", "replay") else None
+        self.synthetic = synthetic or SyntheticLLM()
+
+    @property
+    def offline(self):
+        return self.mode in ("replay", "synthetic")
+
+    def complete(self, prompt):
+        if self.mode == "replay":
+            return self.store.get(prompt)
+        return self.synthetic.complete(prompt)
+
+    def stream(self, prompt):
+        if self.mode == "replay":
+            yield self.store.get(prompt)
+            return
+        yield from self.synthetic.stream(prompt)
+
+    def record(self, prompt, response):
+        if self.mode == "record" and isinstance(response, str) and response:
+            self.store.record(prompt, response)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_llm_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = LLMBackend()
+    return _backend
+
+
+def set_llm_backend(backend):
+    """Swap the backend for every GeminiWrapperLLM, e.g. from a benchmark or test."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+if __name__ == "__main__":
+    # python fake_llm.py [prompt]  - print what synthetic mode would answer
+    print(SyntheticLLM(latency=0).respond(" ".join(sys.argv[1:]) or "Project Type: Website"))
@@ -0,0 +1,368 @@
+import re
+import json
+import time
+import random
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTrello:
+    """In-memory stand-in for the parts of the Trello API trello_utils uses.
+
+    Serves /1/... routes over a local HTTP server: boards, lists, cards,
+    board members, member lookup/search, card idMembers, board actions,
+    webhooks and /batch. Latency and 429 responses can be injected, and
+    every request is appended to `log` as (method, path, status, seconds).
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, retry_after=1, auto_complete=False,
+                 members=None, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.auto_complete = auto_complete
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.log = []
+        self.counter = 0
+
+        self.boards = {}
+        self.lists = {}
+        self.cards = {}
+        self.members = {}
+        self.actions = []
+        self.webhooks = {}
+
+        for username, full_name in (members or {}).items():
+            self.add_member(username, full_name)
+
+        self.routes = [
+            ("GET", r"/members/me/boards", self.get_my_boards),
+            ("POST", r"/boards/?", self.post_board),
+            ("GET", r"/boards/(\w+)/lists", self.get_board_lists),
+            ("GET", r"/boards/(\w+)/members", self.get_board_members),
+            ("PUT", r"/boards/(\w+)/members", self.put_board_member),
+            ("GET", r"/boards/(\w+)/cards(?:/open)?", self.get_board_cards),
+            ("GET", r"/boards/(\w+)/actions", self.get_board_actions),
+            ("POST", r"/lists", self.post_list),
+            ("PUT", r"/lists/(\w+)/closed", self.put_list_closed),
+            ("GET", r"/lists/(\w+)/cards", self.get_list_cards),
+            ("POST", r"/lists/(\w+)/archiveAllCards", self.archive_all_cards),
+            ("POST", r"/cards", self.post_card),
+            ("PUT", r"/cards/(\w+)", self.put_card),
+            ("POST", r"/cards/(\w+)/idMembers", self.post_card_member),
+            ("PUT", r"/cards/(\w+)/idMembers", self.post_card_member),
+            ("DELETE", r"/cards/(\w+)/idMembers/(\w+)", self.delete_card_member),
+            ("GET", r"/search/members/?", self.search_members),
+            ("GET", r"/members/([\w.-]+)", self.get_member),
+            ("GET", r"/tokens/(\w+)/webhooks", self.get_webhooks),
+            ("POST", r"/webhooks/?", self.post_webhook),
+            ("DELETE", r"/webhooks/(\w+)", self.delete_webhook),
+            ("GET", r"/batch", self.get_batch),
+        ]
+
+    # -- data helpers -------------------------------------------------
+
+    def new_id(self):
+        with self.lock:
+            self.counter += 1
+            return f"{self.counter:024x}"
+
+    def add_member(self, username, full_name=None):
+        member = {"id": self.new_id(), "username": username, "fullName": full_name or username}
+        self.members[member["id"]] = member
+        return member
+
+    def add_board(self, name, member_ids=None):
+        board = {"id": self.new_id(), "name": name, "closed": False,
+                 "memberIds": list(member_ids if member_ids is not None else self.members)}
+        self.boards[board["id"]] = board
+        return board
+
+    def record_action(self, action_type, board_id, card, list_id, old=None):
+        data = {"card": dict(card), "list": {"id": list_id}, "board": {"id": board_id}}
+        if old:
+            data["old"] = old
+        self.actions.append({"id": self.new_id(), "type": action_type, "data": data,
+                             "idBoard": board_id, "date": time.time()})
+
+    def complete_card(self, card_id):
+        """Mark a card done as a team member would, recording the updateCard action."""
+        with self.lock:
+            card = self.cards[card_id]
+            if not card["dueComplete"]:
+                card["dueComplete"] = True
+                self.record_action("updateCard", card["idBoard"], card, card["idList"], {"dueComplete": False})
+
+    def complete_list(self, list_id):
+        with self.lock:
+            for card in list(self.cards.values()):
+                if card["idList"] == list_id:
+                    self.complete_card(card["id"])
+
+    # -- request dispatch ---------------------------------------------
+
+    def dispatch(self, method, path, params):
+        path = path[2:] if path.startswith("/1/") else path
+        for route_method, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                with self.lock:
+                    return handler(params, *match.groups())
+        return 404, {"message": f"Route not found: {method} {path}"}
+
+    def get_my_boards(self, params):
+        return 200, [dict(board) for board in self.boards.values()]
+
+    def post_board(self, params):
+        return 200, self.add_board(params.get("name", "Board"))
+
+    def get_board_lists(self, params, board_id):
+        if board_id not in self.boards:
+            return 404, {"message": "board not found"}
+        show = params.get("filter", "open")
+        lists = [lst for lst in self.lists.values() if lst["idBoard"] == board_id]
+        if show == "open":
+            lists = [lst for lst in lists if not lst["closed"]]
+        elif show == "closed":
+            lists = [lst for lst in lists if lst["closed"]]
+        return 200, sorted(lists, key=lambda lst: lst["pos"])
+
+    def get_board_members(self, params, board_id):
+        board = self.boards.get(board_id)
+        if board is None:
+            return 404, {"message": "board not found"}
+        return 200, [self.members[member_id] for member_id in board["memberIds"]]
+
+    def put_board_member(self, params, board_id):
+        board = self.boards.get(board_id)
+        member_id = params.get("idMember")
+        if board is None or member_id not in self.members:
+            return 404, {"message": "not found"}
+        if member_id not in board["memberIds"]:
+            board["memberIds"].append(member_id)
+        return 200, {"id": board_id, "members": [self.members[m] for m in board["memberIds"]]}
+
+    def get_board_cards(self, params, board_id):
+        cards = [card for card in self.cards.values()
+                 if card["idBoard"] == board_id and not card["closed"]
+                 and not self.lists[card["idList"]]["closed"]]
+        return 200, sorted(cards, key=lambda card: (card["idList"], card["pos"]))
+
+    def get_board_actions(self, params, board_id):
+        types = set(params.get("filter", "all").split(","))
+        since = params.get("since")
+        before = params.get("before")
+        limit = int(params.get("limit", 50))
+        actions = [action for action in self.actions if action["idBoard"] == board_id
+                   and ("all" in types or action["type"] in types)
+                   and (not since or action["id"] > since)
+                   and (not before or action["id"] < before)]
+        return 200, list(reversed(actions))[:limit]
+
+    def post_list(self, params):
+        board_id = params.get("idBoard")
+        if board_id not in self.boards:
+            return 404, {"message": "board not found"}
+        lst = {"id": self.new_id(), "name": params.get("name", ""), "idBoard": board_id,
+               "closed": params.get("closed") == "true", "pos": len(self.lists) + 1}
+        self.lists[lst["id"]] = lst
+        return 200, lst
+
+    def put_list_closed(self, params, list_id):
+        lst = self.lists.get(list_id)
+        if lst is None:
+            return 404, {"message": "list not found"}
+        lst["closed"] = params.get("value") == "true"
+        return 200, lst
+
+    def archive_all_cards(self, params, list_id):
+        if list_id not in self.lists:
+            return 404, {"message": "list not found"}
+        for card in self.cards.values():
+            if card["idList"] == list_id:
+                card["closed"] = True
+        return 200, {}
+
+    def get_list_cards(self, params, list_id):
+        if list_id not in self.lists:
+            return 404, {"message": "list not found"}
+        cards = [card for card in self.cards.values() if card["idList"] == list_id and not card["closed"]]
+        return 200, sorted(cards, key=lambda card: card["pos"])
+
+    def post_card(self, params):
+        lst = self.lists.get(params.get("idList"))
+        if lst is None:
+            return 400, {"message": "invalid value for idList"}
+        card = {
+            "id": self.new_id(),
+            "name": params.get("name", ""),
+            "desc": params.get("desc", ""),
+            "due": params.get("due"),
+            "dueComplete": False,
+            "closed": params.get("closed") == "true",
+            "idList": lst["id"],
+            "idBoard": lst["idBoard"],
+            "idMembers": [],
+            "pos": float(params.get("pos", len(self.cards) + 1))
+        }
+        self.cards[card["id"]] = card
+        self.record_action("createCard", card["idBoard"], card, card["idList"])
+        if self.auto_complete:
+            self.complete_card(card["id"])
+        return 200, card
+
+    def put_card(self, params, card_id):
+        card = self.cards.get(card_id)
+        if card is None:
+            return 404, {"message": "card not found"}
+        old = {}
+        data = {}
+        for field in ("name", "desc", "idList", "pos", "due", "closed", "dueComplete"):
+            if field not in params:
+                continue
+            value = params[field]
+            if field in ("closed", "dueComplete"):
+                value = value == "true"
+            elif field == "pos":
+                value = float(value)
+            old[field] = card[field]
+            card[field] = value
+        if "idList" in old and old["idList"] != card["idList"]:
+            data = {"listBefore": {"id": old["idList"]}, "listAfter": {"id": card["idList"]}}
+        self.record_action("updateCard", card["idBoard"], card, card["idList"], old)
+        if data:
+            self.actions[-1]["data"].update(data)
+        return 200, card
+
+    def post_card_member(self, params, card_id):
+        card = self.cards.get(card_id)
+        member_id = params.get("value")
+        if card is None or member_id not in self.members:
+            return 400, {"message": "invalid member"}
+        if member_id in card["idMembers"]:
+            return 400, {"message": "member is already on the card"}
+        card["idMembers"].append(member_id)
+        return 200, [self.members[m] for m in card["idMembers"]]
+
+    def delete_card_member(self, params, card_id, member_id):
+        card = self.cards.get(card_id)
+        if card is None or member_id not in card["idMembers"]:
+            return 400, {"message": "member is not on the card"}
+        card["idMembers"].remove(member_id)
+        return 200, [self.members[m] for m in card["idMembers"]]
+
+    def search_members(self, params):
+        query = params.get("query", "").lower()
+        limit = int(params.get("limit", 8))
+        found = [member for member in self.members.values()
+                 if query and (query in member["username"].lower() or query in member["fullName"].lower())]
+        return 200, found[:limit]
+
+    def get_member(self, params, name):
+        for member in self.members.values():
+            if member["username"] == name or member["id"] == name:
+                return 200, member
+        return 404, {"message": "member not found"}
+
+    def get_webhooks(self, params, token):
+        return 200, list(self.webhooks.values())
+
+    def post_webhook(self, params):
+        hook = {"id": self.new_id(), "idModel": params.get("idModel"),
+                "callbackURL": params.get("callbackURL"), "description": params.get("description", "")}
+        self.webhooks[hook["id"]] = hook
+        return 200, hook
+
+    def delete_webhook(self, params, webhook_id):
+        if self.webhooks.pop(webhook_id, None) is None:
+            return 404, {"message": "webhook not found"}
+        return 200, {}
+
+    def get_batch(self, params):
+        urls = [url for url in params.get("urls", "").split(",") if url]
+        if len(urls) > 10:
+            return 400, {"message": "Too many URLs, limit is 10"}
+        results = []
+        for url in urls:
+            parsed = urlparse(url)
+            sub_params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+            status, body = self.dispatch("GET", parsed.path, sub_params)
+            if status == 200:
+                results.append({"200": body})
+            else:
+                results.append({"name": "error", "message": body.get("message", ""), "statusCode": status})
+        return 200, results
+
+    # -- HTTP server ---------------------------------------------------
+
+    def handle(self, method, raw_path):
+        parsed = urlparse(raw_path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        started = time.monotonic()
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            status, body, headers = 429, {"message": "API_TOKEN_LIMIT_EXCEEDED"}, {"Retry-After": str(self.retry_after)}
+        else:
+            status, body = self.dispatch(method, parsed.path, params)
+            headers = {}
+        with self.lock:
+            self.log.append((method, parsed.path, status, time.monotonic() - started))
+        return status, body, headers
+
+    def start(self, host="127.0.0.1", port=0):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def respond(self, method):
+                length = int(self.headers.get("Content-Length", 0))
+                if length:
+                    self.rfile.read(length)
+                status, body, headers = fake.handle(method, self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self.respond("GET")
+
+            def do_POST(self):
+                self.respond("POST")
+
+            def do_PUT(self):
+                self.respond("PUT")
+
+            def do_DELETE(self):
+                self.respond("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/1"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request_count(self, method=None, status=None):
+        with self.lock:
+            return sum(1 for entry in self.log
+                       if (method is None or entry[0] == method) and (status is None or entry[2] == status))
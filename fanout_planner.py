@@ -0,0 +1,142 @@
+import os
+import re
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from crewai import Crew, Process
+from dotenv import load_dotenv
+
+from agents import build_agent
+from config_loader import agents_config
+from parse_allocation import AllocationPlanParser
+from tasks import build_task
+from context_compaction import apply_context_compaction
+
+load_dotenv()
+
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "4"))
+
+
+def usage_dict(crew):
+    usage = getattr(crew, "usage_metrics", None) or {}
+    if hasattr(usage, "model_dump"):
+        usage = usage.model_dump()
+    elif hasattr(usage, "dict"):
+        usage = usage.dict()
+    return {key: value for key, value in usage.items() if isinstance(value, (int, float))}
+
+
+def parse_phase_list(text):
+    """'## Phase N: Name' headers plus their '- scope' bullets -> list of phase dicts."""
+    phases = []
+    for line in text.splitlines():
+        line = line.strip()
+        match = re.match(r'^#*\s*\**\s*Phase\s*(\d+)[\s:.-]*(.+?)\s*$', line, re.IGNORECASE)
+        if match:
+            phases.append({"phase_number": match.group(1), "phase_name": match.group(2).strip("*: "),
+                           "scope": []})
+        elif phases and re.match(r'^[-*•]\s+', line):
+            phases[-1]["scope"].append(re.sub(r'^[-*•]\s+', '', line))
+    # Renumber so the merged plan always runs 1..N, whatever the planner wrote.
+    for number, phase in enumerate(phases, start=1):
+        phase["phase_number"] = str(number)
+    return phases
+
+
+def list_phases(inputs):
+    """Run the planner alone and return its phases."""
+    agent = build_agent("project_planning_agent")
+    crew = Crew(agents=[agent], tasks=[build_task("phase_listing", agent)],
+                process=Process.sequential, memory=False, verbose=True)
+    result = crew.kickoff(inputs=inputs)
+    return result.raw, parse_phase_list(result.raw), usage_dict(crew)
+
+
+def plan_phase(inputs, phase):
+    """Estimate and allocate one phase with its own agents; returns (estimate, allocation, usage)."""
+    estimator = build_agent("estimation_agent")
+    allocator = build_agent("resource_allocation_agent")
+    estimation = build_task("phase_estimation", estimator)
+    allocation = build_task("phase_allocation", allocator, context=[estimation])
+    crew = Crew(agents=[estimator, allocator], tasks=apply_context_compaction([estimation, allocation]),
+                process=Process.sequential, memory=False, verbose=True)
+    phase_inputs = dict(inputs, phase_number=phase["phase_number"], phase_name=phase["phase_name"],
+                        phase_scope="\n".join(f"- {line}" for line in phase["scope"]) or "- See the phase name")
+    result = crew.kickoff(inputs=phase_inputs)
+    return estimation.output.raw, result.raw, usage_dict(crew)
+
+
+def phase_tasks_from_output(phase, text):
+    """Tasks the allocator wrote for one phase, whatever phase header it used."""
+    parser = AllocationPlanParser()
+    if not re.search(r'^\s*##?\s*(Phase\s*)?\d+', text, re.IGNORECASE | re.MULTILINE):
+        parser.feed(f"## Phase {phase['phase_number']}: {phase['phase_name']}\n")
+    parser.feed(text)
+    parser.close()
+    return [task for parsed in parser.result["phases"] for task in parsed["tasks"]]
+
+
+def render_phase(phase, tasks):
+    lines = [f"## Phase {phase['phase_number']}: {phase['phase_name']}"]
+    for index, task in enumerate(tasks, start=1):
+        lines.append(f"### Task {phase['phase_number']}.{index}: {task['task_name']}")
+        lines.append(f"- **Assigned to**: {task['assigned_to']}")
+        lines.append(f"- **Duration**: {task['duration']}")
+        if task.get("resources"):
+            lines.append(f"- **Resources needed**: {', '.join(task['resources'])}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def merge_plan(project_type, phases, allocations):
+    """Reassemble per-phase allocations into one plan in parse_allocation_plan's format."""
+    sections = [f"# Resource Allocation Plan for {project_type} Project", ""]
+    for phase in phases:
+        text = allocations.get(phase["phase_number"])
+        if text is None:
+            continue
+        sections.append(render_phase(phase, phase_tasks_from_output(phase, text)))
+    return "\n".join(sections)
+
+
+def run_fanout_plan(inputs, max_workers=FANOUT_CONCURRENCY):
+    """Plan phases first, then estimate and allocate every phase concurrently.
+
+    Returns a dict shaped like crew.kickoff().dict(), so callers can pick the
+    Resource Allocator's raw output the same way as for the sequential crew.
+    """
+    started = time.monotonic()
+    phase_list, phases, usage = list_phases(inputs)
+    print(f"🗂️ Planner listed {len(phases)} phases; planning them with {max_workers} workers")
+
+    estimates, allocations, failed = {}, {}, []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # Copy the context so each phase keeps the caller's LLM priority.
+        futures = {phase["phase_number"]: executor.submit(contextvars.copy_context().run, plan_phase, inputs, phase)
+                   for phase in phases}
+        for phase in phases:
+            number = phase["phase_number"]
+            try:
+                estimates[number], allocations[number], phase_usage = futures[number].result()
+            except Exception as e:
+                print(f"❌ Planning Phase {number} ({phase['phase_name']}) failed: {str(e)}")
+                failed.append(number)
+                continue
+            for key, value in phase_usage.items():
+                usage[key] = usage.get(key, 0) + value
+
+    plan = merge_plan(inputs.get("project_type", ""), phases, allocations)
+    estimate_text = "\n\n".join(f"## Phase {number}\n{estimates[number]}" for number in sorted(estimates, key=int))
+    print(f"✅ Fan-out plan ready in {time.monotonic() - started:.1f}s"
+          + (f" (failed phases: {', '.join(failed)})" if failed else ""))
+    return {
+        "raw": plan,
+        "tasks_output": [
+            {"agent": agents_config["project_planning_agent"]["role"], "raw": phase_list},
+            {"agent": agents_config["estimation_agent"]["role"], "raw": estimate_text},
+            {"agent": agents_config["resource_allocation_agent"]["role"], "raw": plan}
+        ],
+        "token_usage": usage,
+        "failed_phases": failed
+    }
@@ -3,33 +3,140 @@ from litellm import completion
 import os
 from typing import Optional
 
+from llm_cache import get_llm_cache, cached_completion, cached_stream
+from llm_telemetry import CallTimer, estimate_tokens, usage_tokens
+from llm_scheduler import get_llm_scheduler
+from fake_llm import get_llm_backend
+
 
 class GeminiWrapperLLM(LLM):
-    def __init__(self, api_key: str, model: str = "gemini/gemini-1.5-flash"):
+    # Cap for generate_response(); agent completions through call() use max_tokens (uncapped by default).
+    RESPONSE_MAX_TOKENS = 500
+
+    def __init__(self, api_key: str, model: str = "gemini/gemini-1.5-flash", use_cache: bool = True,
+                 agent_role: Optional[str] = None, max_tokens: Optional[int] = None):
         super().__init__(model=model)
     
         os.environ["GOOGLE_API_KEY"] = api_key
         self.api_key = api_key
         self.model = model
         self.temperature = 0
+        self.max_tokens = max_tokens
+        # use_cache=False bypasses the on-disk response cache for this instance.
+        self.cache = get_llm_cache() if use_cache else None
+        # Telemetry label; agents.build_agent gives every agent its own instance.
+        self.agent_role = agent_role
 
     def supports_stop_words(self) -> bool:
         return False  
 
+    def _scheduled(self, request, prompt, timer, max_tokens):
+        """Run request() under the shared RPM/TPM budgets; throttling retries just this call."""
+        return get_llm_scheduler().run(
+            request,
+            tokens=estimate_tokens(self.model, prompt) + (max_tokens or 0),
+            on_retry=timer.retried,
+            usage=lambda response: sum(usage_tokens(response) or ()) or None
+        )
+
+    def call(self, messages, *args, **kwargs):
+        backend = get_llm_backend()
+        with CallTimer(self.agent_role, self.model, messages) as timer:
+            if backend.offline:
+                timer.output = backend.complete(messages)
+                return timer.output
+
+            def request():
+                timer.cached = False
+                return self._scheduled(lambda: super(GeminiWrapperLLM, self).call(messages, *args, **kwargs),
+                                       messages, timer, self.max_tokens)
+
+            # Tool-calling turns depend on more than the messages, so only plain completions are cached.
+            if self.cache is None or kwargs.get("tools") or kwargs.get("available_functions"):
+                timer.output = request()
+            else:
+                timer.cached = True
+                timer.output = cached_completion(self.cache, self.model, messages, self.temperature,
+                                                 self.max_tokens, request)
+        backend.record(messages, timer.output)
+        return timer.output
+
+    def _completion_model(self) -> str:
+        model = self.model
+        if model.startswith("gemini/"):
+            model = "google/" + model[7:]
+        return model
+
+    def generate_response_stream(self, prompt: str, **kwargs):
+        """Yield the response text as it is generated.
+
+        Errors are raised rather than returned, since part of the response
+        may already have been consumed. A response cut off at max_tokens
+        raises too, before cached_stream can store it.
+        """
+        backend = get_llm_backend()
+        with CallTimer(self.agent_role, self.model, prompt) as timer:
+            if backend.offline:
+                chunks = []
+                for chunk in backend.stream(prompt):
+                    chunks.append(chunk)
+                    yield chunk
+                timer.output = "".join(chunks)
+                return
+
+            timer.cached = self.cache is not None
+
+            def stream():
+                timer.cached = False
+                response = self._scheduled(lambda: completion(
+                    model=self.model,
+                    messages=[{"content": prompt, "role": "user"}],
+                    api_key=self.api_key,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    **kwargs
+                ), prompt, timer, self.max_tokens)
+                for chunk in response:
+                    text = chunk.choices[0].delta.content
+                    if text:
+                        yield text
+                    if chunk.choices[0].finish_reason == "length":
+                        raise RuntimeError("the response was cut off at max_tokens")
+
+            chunks = []
+            for chunk in cached_stream(self.cache, self.model, prompt, self.temperature, self.max_tokens,
+                                       stream, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+            timer.output = "".join(chunks)
+        backend.record(prompt, timer.output)
+
     def generate_response(self, prompt: str, **kwargs) -> str:
         try:
-            model = self.model
-            if model.startswith("gemini/"):
-                model = "google/" + model[7:] 
-            
-            response = completion(
-                model=model,
-                messages=[{"content": prompt, "role": "user"}],
-                temperature=self.temperature,
-                max_tokens=500,
-                **kwargs
-            )
-            return response.choices[0].message.content
+            model = self._completion_model()
+            backend = get_llm_backend()
+            with CallTimer(self.agent_role, model, prompt) as timer:
+                if backend.offline:
+                    timer.output = backend.complete(prompt)
+                    return timer.output
+                timer.cached = self.cache is not None
+
+                def request():
+                    timer.cached = False
+                    timer.response = self._scheduled(lambda: completion(
+                        model=model,
+                        messages=[{"content": prompt, "role": "user"}],
+                        temperature=self.temperature,
+                        max_tokens=self.RESPONSE_MAX_TOKENS,
+                        **kwargs
+                    ), prompt, timer, self.RESPONSE_MAX_TOKENS)
+                    return timer.response.choices[0].message.content
+
+                timer.output = cached_completion(self.cache, model, prompt, self.temperature,
+                                                 self.RESPONSE_MAX_TOKENS, request, **kwargs)
+            backend.record(prompt, timer.output)
+            return timer.output
         except Exception as e:
             error_msg = str(e)
             print(f"Error in LLM call: {error_msg}")
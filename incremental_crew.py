@@ -0,0 +1,100 @@
+import json
+
+from crewai import Crew, Process
+
+from agents import build_agent, llm
+from config_loader import tasks_config
+from crew_definition import TASK_GRAPH, STRUCTURED_ALLOCATION, plan_task_keys
+from context_compaction import compact_context as compact_text, CONTEXT_COMPACTION
+from fanout_planner import usage_dict
+from llm_cache import get_llm_cache, cache_key
+from tasks import build_task, stored_task
+
+
+def task_key(key, inputs, upstream, agent_llm, compact_context):
+    """Cache key of one task's output: its prompt, the inputs it reads and the upstream outputs it is given."""
+    config = tasks_config[key]
+    return cache_key(
+        f"task:{key}:{agent_llm.model}",
+        {"inputs": {field: inputs.get(field) for field in TASK_GRAPH[key]["inputs"]}, "upstream": upstream},
+        agent_llm.temperature,
+        agent_llm.max_tokens,
+        description=config["description"],
+        expected_output=config["expected_output"],
+        compact_context=compact_context
+    )
+
+
+def output_record(output):
+    """A TaskOutput as the JSON-able dict crew.kickoff().dict() gives for it."""
+    return {
+        "description": output.description,
+        "name": output.name,
+        "expected_output": output.expected_output,
+        "summary": output.summary,
+        "raw": output.raw,
+        "pydantic": output.pydantic.model_dump() if output.pydantic is not None else None,
+        "json_dict": output.json_dict,
+        "agent": output.agent
+    }
+
+
+def run_task(key, inputs, upstream_outputs, compact_context):
+    """Run one plan task alone, with its upstream outputs handed over as completed context tasks.
+
+    With compact_context the upstream outputs are passed on as their
+    compact summaries; the stored outputs keep their full text.
+    """
+    agent = build_agent(tasks_config[key]["agent"])
+    context = [stored_task(upstream, compact_text(record["raw"]) if compact_context else record["raw"],
+                           record["agent"])
+               for upstream, record in upstream_outputs]
+    task = build_task(key, agent, context=context or None)
+    crew = Crew(agents=[agent], tasks=[task], process=Process.sequential, memory=False, verbose=True)
+    crew.kickoff(inputs=inputs)
+    return output_record(task.output), usage_dict(crew)
+
+
+def run_incremental_crew(inputs, structured=STRUCTURED_ALLOCATION, compact_context=CONTEXT_COMPACTION, cache=None):
+    """Run the planning tasks in dependency order, reusing every task whose dependencies are unchanged.
+
+    A task's output is cached under its prompt, the input fields it depends
+    on (TASK_GRAPH) and the outputs of its upstream tasks, so editing only
+    the team re-runs the allocation alone. Returns a crew.kickoff().dict()-
+    shaped result, plus "token_usage" and the "reused_tasks" it skipped.
+    """
+    cache = cache if cache is not None else get_llm_cache()
+    keys = plan_task_keys(structured)
+    outputs = {}
+    usage = {}
+    reused = []
+
+    for key in keys:
+        upstream_outputs = [(upstream, outputs[upstream]) for upstream in TASK_GRAPH[key]["context"]]
+        # Compaction only changes the prompt of a task that is given upstream outputs.
+        cache_id = task_key(key, inputs, [record["raw"] for _, record in upstream_outputs], llm,
+                            compact_context and bool(upstream_outputs))
+        cached = cache.get(cache_id) if cache is not None else None
+        if cached is not None:
+            print(f"♻️ Reusing {key}: none of its inputs changed")
+            outputs[key] = json.loads(cached)
+            reused.append(key)
+            continue
+
+        outputs[key], task_usage = run_task(key, inputs, upstream_outputs, compact_context)
+        for name, value in task_usage.items():
+            usage[name] = usage.get(name, 0) + value
+        if cache is not None and outputs[key]["raw"]:
+            cache.put(cache_id, llm.model, json.dumps(outputs[key]))
+
+    final = outputs[keys[-1]]
+    print(f"✅ Plan ready: {len(keys) - len(reused)} of {len(keys)} tasks run"
+          + (f", reused {', '.join(reused)}" if reused else ""))
+    return {
+        "raw": final["raw"],
+        "pydantic": final["pydantic"],
+        "json_dict": final["json_dict"],
+        "tasks_output": [outputs[key] for key in keys],
+        "token_usage": usage,
+        "reused_tasks": reused
+    }
@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# LLM_CACHE_BYPASS=1 skips lookups (responses are still stored); LLM_CACHE=0 disables it entirely.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def cache_key(model, prompt, temperature=None, max_tokens=None, **extra):
+    """Content address of one completion request.
+
+    prompt may be a string or a list of chat messages; extra keyword
+    arguments that change the response (stop words, response format...)
+    are part of the key too.
+    """
+    material = json.dumps({"model": model, "prompt": prompt, "temperature": temperature,
+                           "max_tokens": max_tokens, "extra": extra},
+                          sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Disk-backed LLM response cache with TTL and LRU eviction, stored in SQLite.
+
+    Entries older than `ttl` are treated as misses and dropped. When the
+    cache grows past `max_entries` or `max_bytes`, the least recently used
+    entries are evicted. `bypass` skips lookups but still stores fresh
+    responses, which is handy for forcing a re-run.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 max_bytes=LLM_CACHE_MAX_BYTES, bypass=LLM_CACHE_BYPASS):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def get(self, key):
+        """Cached response for key, or None on a miss."""
+        if self.bypass:
+            with self.lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl and now - row[1] > self.ttl:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.hits += 1
+        return row[0]
+
+    def put(self, key, model, response):
+        if not isinstance(response, str):
+            return
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        count, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        freed = 0
+        rows = self.db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        doomed = []
+        for key, entry_size in rows:
+            if count - len(doomed) <= self.max_entries and size - freed <= self.max_bytes:
+                break
+            doomed.append(key)
+            freed += entry_size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in doomed])
+        self.evictions += len(doomed)
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "bypass": self.bypass
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the shared response cache, or None when LLM_CACHE=0."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+    return _cache
+
+
+def cached_completion(cache, model, prompt, temperature, max_tokens, call, **extra):
+    """Return call()'s response for this request, served from cache when possible.
+
+    Exceptions from call() propagate, so failed requests are never stored.
+    """
+    if cache is None:
+        return call()
+    key = cache_key(model, prompt, temperature, max_tokens, **extra)
+    response = cache.get(key)
+    if response is not None:
+        return response
+    response = call()
+    if response:
+        cache.put(key, model, response)
+    return response
+
+
+def cached_stream(cache, model, prompt, temperature, max_tokens, stream, **extra):
+    """Yield the response to this request chunk by chunk.
+
+    A cache hit is yielded as a single chunk; otherwise stream() is
+    consumed and the full text is stored once it has finished.
+    """
+    if cache is None:
+        yield from stream()
+        return
+    key = cache_key(model, prompt, temperature, max_tokens, **extra)
+    response = cache.get(key)
+    if response is not None:
+        yield response
+        return
+    chunks = []
+    for chunk in stream():
+        chunks.append(chunk)
+        yield chunk
+    if chunks:
+        cache.put(key, model, "".join(chunks))
+
+
+if __name__ == "__main__":
+    # python llm_cache.py [clear|stats]
+    cache = LLMCache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print("🧹 LLM cache cleared")
+    print(f"🗄️ LLM cache: {cache.stats()}")
@@ -0,0 +1,212 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_RPM = int(os.getenv("LLM_RPM", "15"))
+LLM_TPM = int(os.getenv("LLM_TPM", "1000000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "2"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+WINDOW_SECONDS = 60.0
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+_priority = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(name):
+    """Run the block's LLM calls at the given priority ("interactive" or "batch")."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {name}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def is_rate_limit(error):
+    if type(error).__name__ == "RateLimitError":
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def is_retryable(error):
+    if is_rate_limit(error):
+        return True
+    name = type(error).__name__
+    return name in ("APIConnectionError", "Timeout", "ServiceUnavailableError", "InternalServerError")
+
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+    return None
+
+
+def backoff_seconds(attempt, base=LLM_BACKOFF_BASE, cap=LLM_BACKOFF_MAX):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LLMScheduler:
+    """Process-wide admission control for LLM completions.
+
+    Every completion waits for a slot in a sliding one-minute window of
+    `rpm` requests and `tpm` tokens. Waiting callers are served by priority
+    (interactive before batch) and then in arrival order. A rate-limit
+    response pauses admission for everyone for its Retry-After (or a
+    backoff), and only the failed completion is retried.
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, max_retries=LLM_MAX_RETRIES):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.requests = deque()
+        self.tokens = deque()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.stats = {"admitted": 0, "retries": 0, "rate_limited": 0, "waited": 0.0}
+
+    def _expire(self, now):
+        while self.requests and now - self.requests[0] >= WINDOW_SECONDS:
+            self.requests.popleft()
+        while self.tokens and now - self.tokens[0][0] >= WINDOW_SECONDS:
+            self.tokens.popleft()
+
+    def _wait_time(self, tokens, now):
+        """Seconds until a request of `tokens` fits both budgets (0 if it fits now)."""
+        waits = [self.paused_until - now]
+        if self.rpm and len(self.requests) >= self.rpm:
+            waits.append(self.requests[len(self.requests) - self.rpm] + WINDOW_SECONDS - now)
+        if self.tpm:
+            # A single request bigger than the whole budget is admitted into an empty window.
+            used = sum(count for _, count in self.tokens)
+            for stamp, count in self.tokens:
+                if used + tokens <= self.tpm or not used:
+                    break
+                used -= count
+                waits.append(stamp + WINDOW_SECONDS - now)
+        return max(waits)
+
+    def acquire(self, tokens=0, priority=None):
+        """Block until this request may be sent; returns a ticket for settle()."""
+        entry = (PRIORITIES[priority or current_priority()], next(self.sequence))
+        started = time.monotonic()
+        with self.changed:
+            heapq.heappush(self.waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._expire(now)
+                    if self.waiting[0] == entry:
+                        wait = self._wait_time(tokens, now)
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self.changed.wait(wait)
+            finally:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                self.changed.notify_all()
+            ticket = [now, tokens]
+            self.requests.append(now)
+            self.tokens.append(ticket)
+            self.stats["admitted"] += 1
+            self.stats["waited"] += now - started
+        return ticket
+
+    def settle(self, ticket, tokens):
+        """Replace a request's estimated token count with what it actually used."""
+        with self.changed:
+            ticket[1] = tokens
+            self.changed.notify_all()
+
+    def pause(self, seconds):
+        with self.changed:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.changed.notify_all()
+
+    def run(self, request, tokens=0, priority=None, on_retry=None, usage=None):
+        """Send request() through the budgets, retrying only it on throttling or transient errors.
+
+        `tokens` is the estimate charged up front; `usage(result)`, if given,
+        returns the real count to charge instead.
+        """
+        attempt = 0
+        while True:
+            ticket = self.acquire(tokens, priority)
+            try:
+                result = request()
+                if usage:
+                    actual = usage(result)
+                    if actual is not None:
+                        self.settle(ticket, actual)
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = backoff_seconds(attempt)
+                with self.lock:
+                    self.stats["retries"] += 1
+                    if is_rate_limit(e):
+                        self.stats["rate_limited"] += 1
+                print(f"⚠️ LLM call failed ({type(e).__name__}); retrying in {delay:.1f}s")
+                if is_rate_limit(e):
+                    # Everyone sharing the key would hit the same limit; hold them all.
+                    self.pause(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+                if on_retry:
+                    on_retry()
+
+    def snapshot(self):
+        with self.lock:
+            self._expire(time.monotonic())
+            return dict(self.stats, requests_in_window=len(self.requests),
+                        tokens_in_window=sum(count for _, count in self.tokens),
+                        waiting=len(self.waiting))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+    return _scheduler
@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_TELEMETRY_FILE = os.getenv("LLM_TELEMETRY_FILE", "llm_calls.jsonl")
+LLM_TELEMETRY_BUFFER = int(os.getenv("LLM_TELEMETRY_BUFFER", "5000"))
+
+# USD per million tokens: (prompt, completion). Unknown models fall back to DEFAULT_PRICE.
+PRICES = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30)
+}
+DEFAULT_PRICE = (0.150, 0.150)
+
+
+def price_for(model):
+    name = (model or "").split("/")[-1]
+    if name in PRICES:
+        return PRICES[name]
+    # Versioned names like gemini-1.5-flash-002 use their family's price.
+    for family in sorted(PRICES, key=len, reverse=True):
+        if name.startswith(family):
+            return PRICES[family]
+    return DEFAULT_PRICE
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = price_for(model)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def estimate_tokens(model, content):
+    """Token count for a prompt (string or chat messages) or a response."""
+    if not content:
+        return 0
+    try:
+        from litellm import token_counter
+        if isinstance(content, list):
+            return token_counter(model=model, messages=content)
+        return token_counter(model=model, text=str(content))
+    except Exception:
+        text = json.dumps(content) if isinstance(content, list) else str(content)
+        return max(1, len(text) // 4)
+
+
+def usage_tokens(response):
+    """(prompt, completion) tokens reported by a litellm response, or None."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class LLMTelemetry:
+    """Per-completion records (agent, model, tokens, latency, retries, cost).
+
+    Every record is appended to a JSONL file as it happens; the most recent
+    ones are also kept in memory for summaries and the Prometheus export.
+    Totals cover every record since the process started.
+    """
+
+    def __init__(self, path=LLM_TELEMETRY_FILE, buffer_size=LLM_TELEMETRY_BUFFER):
+        self.path = path
+        self.records = deque(maxlen=buffer_size)
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def record(self, agent_role, model, prompt_tokens, completion_tokens, latency,
+               retries=0, cached=False, error=None, persist=True):
+        entry = {
+            "timestamp": time.time(),
+            "agent_role": agent_role or "unknown",
+            "model": model,
+            "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": int(completion_tokens),
+            "latency": round(latency, 4),
+            "retries": retries,
+            "cached": cached,
+            "cost": 0.0 if cached else estimate_cost(model, prompt_tokens, completion_tokens),
+            "error": str(error) if error else None
+        }
+        with self.lock:
+            self.records.append(entry)
+            key = (entry["agent_role"], model)
+            totals = self.totals.setdefault(key, {"calls": 0, "errors": 0, "cached": 0, "retries": 0,
+                                                  "prompt_tokens": 0, "completion_tokens": 0,
+                                                  "cost": 0.0, "latency": 0.0})
+            totals["calls"] += 1
+            totals["errors"] += 1 if error else 0
+            totals["cached"] += 1 if cached else 0
+            totals["retries"] += retries
+            totals["prompt_tokens"] += entry["prompt_tokens"]
+            totals["completion_tokens"] += entry["completion_tokens"]
+            totals["cost"] += entry["cost"]
+            totals["latency"] += entry["latency"]
+            if persist and self.path:
+                try:
+                    with open(self.path, "a") as f:
+                        f.write(json.dumps(entry) + "\n")
+                except OSError as e:
+                    print(f"⚠️ Could not write LLM telemetry: {str(e)}")
+        return entry
+
+    def summary(self):
+        """Per-agent call counts, tokens, cost and p50/p95 latency (uncached calls only)."""
+        with self.lock:
+            records = list(self.records)
+        agents = {}
+        for entry in records:
+            agents.setdefault(entry["agent_role"], []).append(entry)
+        summary = {}
+        for role, entries in sorted(agents.items()):
+            latencies = [e["latency"] for e in entries if not e["cached"] and not e["error"]]
+            summary[role] = {
+                "calls": len(entries),
+                "cached": sum(1 for e in entries if e["cached"]),
+                "errors": sum(1 for e in entries if e["error"]),
+                "retries": sum(e["retries"] for e in entries),
+                "prompt_tokens": sum(e["prompt_tokens"] for e in entries),
+                "completion_tokens": sum(e["completion_tokens"] for e in entries),
+                "cost": round(sum(e["cost"] for e in entries), 6),
+                "p50_latency": round(percentile(latencies, 0.50), 3),
+                "p95_latency": round(percentile(latencies, 0.95), 3)
+            }
+        return summary
+
+    def prometheus(self):
+        """Prometheus text exposition of the totals and recent latency quantiles."""
+        with self.lock:
+            totals = {key: dict(value) for key, value in self.totals.items()}
+        lines = []
+        counters = [
+            ("llm_calls_total", "calls", "Completions requested"),
+            ("llm_errors_total", "errors", "Completions that failed"),
+            ("llm_cache_hits_total", "cached", "Completions served from the response cache"),
+            ("llm_retries_total", "retries", "Retried completion attempts"),
+            ("llm_prompt_tokens_total", "prompt_tokens", "Prompt tokens sent"),
+            ("llm_completion_tokens_total", "completion_tokens", "Completion tokens received"),
+            ("llm_cost_usd_total", "cost", "Estimated spend in USD")
+        ]
+        for name, field, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (role, model), values in sorted(totals.items()):
+                value = round(values[field], 6) if isinstance(values[field], float) else values[field]
+                lines.append(f'{name}{{agent="{_label(role)}",model="{_label(model)}"}} {value}')
+        lines.append("# HELP llm_latency_seconds Recent completion latency by agent")
+        lines.append("# TYPE llm_latency_seconds summary")
+        latency_totals = {}
+        for (role, _), values in totals.items():
+            latency = latency_totals.setdefault(role, [0.0, 0])
+            latency[0] += values["latency"]
+            latency[1] += values["calls"]
+        for role, stats in self.summary().items():
+            label = _label(role)
+            lines.append(f'llm_latency_seconds{{agent="{label}",quantile="0.5"}} {stats["p50_latency"]}')
+            lines.append(f'llm_latency_seconds{{agent="{label}",quantile="0.95"}} {stats["p95_latency"]}')
+            lines.append(f'llm_latency_seconds_sum{{agent="{label}"}} {round(latency_totals[role][0], 4)}')
+            lines.append(f'llm_latency_seconds_count{{agent="{label}"}} {latency_totals[role][1]}')
+        return "\n".join(lines) + "\n"
+
+    def load(self, path=None):
+        """Replay a JSONL file into memory, e.g. to summarise a finished run."""
+        with open(path or self.path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.record(entry["agent_role"], entry["model"], entry["prompt_tokens"],
+                                entry["completion_tokens"], entry["latency"], entry.get("retries", 0),
+                                entry.get("cached", False), entry.get("error"), persist=False)
+        return self
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class CallTimer:
+    """Context manager that times one completion and records it on exit.
+
+    Set `prompt_tokens`/`completion_tokens` (or `response`, a litellm
+    response with usage) inside the block; otherwise they are estimated
+    from `prompt` and `output`. Set `cached` when no request was made.
+    """
+
+    def __init__(self, agent_role, model, prompt=None, telemetry=None):
+        self.agent_role = agent_role
+        self.model = model
+        self.prompt = prompt
+        self.telemetry = telemetry or get_telemetry()
+        self.output = None
+        self.response = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.retries = 0
+        self.cached = False
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def retried(self):
+        self.retries += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.monotonic() - self.started
+        reported = usage_tokens(self.response) if self.response is not None else None
+        if reported and self.prompt_tokens is None:
+            self.prompt_tokens, self.completion_tokens = reported
+        if self.cached:
+            prompt_tokens = completion_tokens = 0
+        else:
+            prompt_tokens = self.prompt_tokens if self.prompt_tokens is not None else \
+                estimate_tokens(self.model, self.prompt)
+            completion_tokens = self.completion_tokens if self.completion_tokens is not None else \
+                estimate_tokens(self.model, self.output if isinstance(self.output, str) else None)
+        self.telemetry.record(self.agent_role, self.model, prompt_tokens, completion_tokens, latency,
+                              retries=self.retries, cached=self.cached, error=exc)
+        return False
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = LLMTelemetry()
+    return _telemetry
+
+
+if __name__ == "__main__":
+    # python llm_telemetry.py [summary|prometheus] [file]
+    mode = sys.argv[1] if len(sys.argv) > 1 else "summary"
+    telemetry = LLMTelemetry(path=sys.argv[2] if len(sys.argv) > 2 else LLM_TELEMETRY_FILE).load()
+    if mode == "prometheus":
+        print(telemetry.prometheus(), end="")
+    else:
+        for role, stats in telemetry.summary().items():
+            print(f"🤖 {role}: {stats}")
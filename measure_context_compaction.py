@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import argparse
+
+# Cached responses report no tokens; every run here has to reach the model.
+os.environ.setdefault("LLM_CACHE_BYPASS", "1")
+
+from crew_definition import build_crew
+from crew_input import inputs
+from context_compaction import compact_context
+
+METRICS = ["prompt_tokens", "completion_tokens", "total_tokens", "successful_requests"]
+
+
+def usage_of(crew):
+    usage = crew.usage_metrics
+    usage = usage.model_dump() if hasattr(usage, "model_dump") else usage.dict()
+    return {metric: usage.get(metric, 0) for metric in METRICS}
+
+
+def run(compact):
+    crew = build_crew(compact_context=compact)
+    started = time.monotonic()
+    result = crew.kickoff(inputs=inputs)
+    usage = usage_of(crew)
+    usage["seconds"] = round(time.monotonic() - started, 1)
+    return usage, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare crew token usage with and without context compaction.")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per mode (results are averaged)")
+    args = parser.parse_args(argv)
+
+    totals = {}
+    context_sizes = []
+    for compact in (False, True):
+        runs = []
+        for _ in range(args.runs):
+            usage, result = run(compact)
+            runs.append(usage)
+            if not compact:
+                # What the allocator would have been handed had this run been compacted.
+                upstream = [output.raw for output in result.tasks_output[:-1]]
+                context_sizes.append((sum(len(text) for text in upstream),
+                                      sum(len(compact_context(text)) for text in upstream)))
+        totals[compact] = {key: round(sum(run[key] for run in runs) / len(runs), 1) for key in runs[0]}
+
+    print(f"\n{'mode':<12}" + "".join(f"{key:>20}" for key in totals[False]))
+    for compact, usage in totals.items():
+        print(f"{'compacted' if compact else 'full prose':<12}" + "".join(f"{value:>20}" for value in usage.values()))
+    before, after = totals[False]["prompt_tokens"], totals[True]["prompt_tokens"]
+    if before:
+        print(f"\n📉 Prompt tokens: {before} -> {after} ({(before - after) / before:.0%} fewer)")
+    for full, compacted in context_sizes:
+        print(f"🗜️ Upstream context: {full} -> {compacted} chars")
+    return totals
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,265 @@
+import re
+import time
+import threading
+import unicodedata
+from urllib.parse import quote
+
+from config_loader import members_config
+
+NO_ASSIGNEE = {"", "unassigned", "none", "n/a", "na", "tbd", "to be determined"}
+NEGATIVE_TTL = 600
+TRIGRAM_THRESHOLD = 0.6
+
+
+def normalize_name(name):
+    """Lowercase, strip accents/punctuation and collapse whitespace."""
+    name = unicodedata.normalize("NFKD", name or "")
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    name = re.sub(r"[^\w\s]", " ", name.lower()).replace("_", " ")
+    return " ".join(name.split())
+
+
+def strip_role(name):
+    """'John Doe (Project Manager)' -> 'John Doe'."""
+    name = re.sub(r"\s*[\(\[].*?[\)\]]", "", name or "")
+    return name.strip(" -:*")
+
+
+def split_assignees(assigned_to):
+    """Split 'John Doe (PM), Jane Doe & Bob Smith' into individual names."""
+    if isinstance(assigned_to, list):
+        parts = assigned_to
+    else:
+        # Drop role suffixes first so commas inside them don't split names.
+        parts = re.split(r",|;|&|/|\band\b", re.sub(r"\s*[\(\[].*?[\)\]]", "", assigned_to or ""))
+    names = []
+    for part in parts:
+        name = strip_role(part)
+        if normalize_name(name) not in NO_ASSIGNEE and name not in names:
+            names.append(name)
+    return names
+
+
+def configured_usernames(config=None):
+    """{normalized name: Trello username} from the usernames section of config/members.yaml."""
+    usernames = (members_config if config is None else config).get("usernames") or {}
+    return {normalize_name(name): str(username).lstrip("@") for name, username in usernames.items() if username}
+
+
+def trigrams(text):
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class MemberIndex:
+    """Lookup structure over Trello member objects (id, username, fullName)."""
+
+    def __init__(self, members=()):
+        self.by_full_name = {}
+        self.by_username = {}
+        self.by_compact = {}
+        self.by_token = {}
+        self.trigrams = {}
+        for member in members:
+            self.add(member)
+
+    def add(self, member):
+        member_id = member.get("id")
+        if not member_id:
+            return
+        full_name = normalize_name(member.get("fullName"))
+        username = normalize_name(member.get("username")).replace(" ", "")
+        if full_name:
+            self.by_full_name.setdefault(full_name, member_id)
+            self.by_compact.setdefault(full_name.replace(" ", ""), member_id)
+            for token in full_name.split():
+                self.by_token.setdefault(token, set()).add(member_id)
+            self.trigrams[member_id] = trigrams(full_name)
+        if username:
+            self.by_username.setdefault(username, member_id)
+
+    def match(self, name):
+        """Best member id for a (role-stripped) name, or None."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        compact = key.replace(" ", "")
+        if key in self.by_full_name:
+            return self.by_full_name[key]
+        if compact in self.by_username:
+            return self.by_username[compact]
+        if compact in self.by_compact:
+            return self.by_compact[compact]
+        # Usernames often carry a numeric suffix, e.g. johndoe892004.
+        for username, member_id in self.by_username.items():
+            if re.fullmatch(re.escape(compact) + r"\d*", username):
+                return member_id
+
+        tokens = key.split()
+        candidates = None
+        for token in tokens:
+            ids = self.by_token.get(token, set())
+            candidates = ids if candidates is None else candidates & ids
+        if candidates and len(candidates) == 1:
+            return next(iter(candidates))
+
+        # Fuzzy matching only forgives typos after an exactly matching first name:
+        # "Rob Smith" is not Bob Smith. No match, or more than one, is left to the remote search.
+        query = trigrams(key)
+        matches = [member_id for member_id in self.by_token.get(tokens[0], set())
+                   if len(query & self.trigrams[member_id]) / len(query | self.trigrams[member_id])
+                   >= TRIGRAM_THRESHOLD]
+        return matches[0] if len(matches) == 1 else None
+
+
+class MemberResolver:
+    """Resolves assignee names to Trello member ids with positive/negative caching.
+
+    resolve_all() handles every assignee of a plan in one pass: board members
+    are matched locally, and only the names left over cost a batched round of
+    lookups. A name with a configured username (config/members.yaml) is
+    looked up directly and its member added to the board once. Anyone else
+    off the board stays unresolved: a /search/members match is only
+    reported, since a stranger who happens to share the name must never be
+    given access to the board.
+
+    Both caches are per board: a member of one board is not automatically
+    one of another, so their names resolve separately.
+    """
+
+    def __init__(self, negative_ttl=NEGATIVE_TTL, usernames=None):
+        self.negative_ttl = negative_ttl
+        self.usernames = configured_usernames() if usernames is None else usernames
+        self.resolved = {}
+        self.missing = {}
+        self.board_indexes = {}
+        self.board_member_ids = {}
+        self.lock = threading.Lock()
+
+    def load_board(self, board_id, members):
+        with self.lock:
+            self.board_indexes[board_id] = MemberIndex(members)
+            self.board_member_ids[board_id] = {member.get("id") for member in members}
+
+    def invalidate_board(self, board_id):
+        with self.lock:
+            self.board_indexes.pop(board_id, None)
+            self.board_member_ids.pop(board_id, None)
+            for cache in (self.resolved, self.missing):
+                for key in [key for key in cache if key[0] == board_id]:
+                    del cache[key]
+
+    def cached(self, name, board_id=None):
+        key = (board_id, normalize_name(name))
+        with self.lock:
+            if key in self.resolved:
+                return self.resolved[key]
+            if time.monotonic() - self.missing.get(key, float("-inf")) < self.negative_ttl:
+                return False
+        return None
+
+    def resolve(self, name, board_id=None):
+        return self.resolve_all([name], board_id).get(normalize_name(strip_role(name)))
+
+    def resolve_card_assignees(self, assigned_to, board_id=None):
+        """Member ids for every assignee named in a card's assigned_to text."""
+        names = split_assignees(assigned_to)
+        resolved = self.resolve_all(names, board_id)
+        return [resolved[normalize_name(name)] for name in names if resolved.get(normalize_name(name))]
+
+    def resolve_all(self, assignee_texts, board_id=None):
+        """Resolve every name in assignee_texts; returns {normalized name: member id or None}."""
+        from trello_utils import BatchReader, get_client
+
+        names = []
+        for text in assignee_texts:
+            for name in split_assignees(text):
+                if normalize_name(name) not in [normalize_name(n) for n in names]:
+                    names.append(name)
+
+        results = {}
+        pending = []
+        for name in names:
+            hit = self.cached(name, board_id)
+            if hit is None:
+                pending.append(name)
+            else:
+                results[normalize_name(name)] = hit or None
+        if not pending:
+            return results
+
+        board_index = None
+        if board_id:
+            board_index = self.board_indexes.get(board_id)
+            if board_index is None:
+                response = get_client().get(f"/boards/{board_id}/members")
+                if response.status_code == 200:
+                    self.load_board(board_id, response.json())
+                    board_index = self.board_indexes[board_id]
+
+        remote = []
+        for name in pending:
+            member_id = board_index.match(name) if board_index else None
+            if member_id:
+                self._remember(name, member_id, board_id)
+                results[normalize_name(name)] = member_id
+            else:
+                remote.append(name)
+
+        if remote:
+            reader = BatchReader()
+            lookups = []
+            for name in remote:
+                username = self.usernames.get(normalize_name(name))
+                if username:
+                    lookups.append((name, username, reader.add(f"/members/{quote(username)}")))
+                else:
+                    lookups.append((name, None, reader.add(f"/search/members?query={quote(name)}&limit=5")))
+            reader.flush()
+
+            for name, username, read in lookups:
+                key = normalize_name(name)
+                member_id = read.data.get("id") if username and read.ok and read.data else None
+                if member_id:
+                    print(f"✅ Found configured member @{username} for '{name}'")
+                    self._remember(name, member_id, board_id)
+                    results[key] = member_id
+                    self._add_to_board(board_id, member_id)
+                    continue
+
+                if username:
+                    print(f"⚠️ Configured Trello username @{username} for '{name}' was not found")
+                else:
+                    suggestion = MemberIndex(read.data if read.ok and read.data else []).match(name)
+                    if suggestion:
+                        handle = next(member.get("username") for member in read.data if member.get("id") == suggestion)
+                        print(f"⚠️ '{name}' is not on the board; Trello search suggests @{handle}. "
+                              f"Add them to the board or to config/members.yaml to assign them.")
+                    else:
+                        print(f"⚠️ Member '{name}' not found")
+                with self.lock:
+                    self.missing[(board_id, key)] = time.monotonic()
+                results[key] = None
+        return results
+
+    def _add_to_board(self, board_id, member_id):
+        from trello_utils import add_member_to_board, TRELLO_USE_OUTBOX
+
+        if not board_id or member_id in self.board_member_ids.get(board_id, set()):
+            return
+        if TRELLO_USE_OUTBOX:
+            from trello_outbox import get_outbox
+            # Assignments that run before the membership fail and are retried.
+            get_outbox().enqueue_add_member_to_board(board_id, member_id)
+            added = True
+        else:
+            added = add_member_to_board(board_id, member_id)
+        if added:
+            with self.lock:
+                self.board_member_ids.setdefault(board_id, set()).add(member_id)
+
+    def _remember(self, name, member_id, board_id=None):
+        key = (board_id, normalize_name(name))
+        with self.lock:
+            self.resolved[key] = member_id
+            self.missing.pop(key, None)
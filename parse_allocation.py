@@ -1,57 +1,107 @@
 import re
 
-def parse_allocation_plan(text):
-    """Parse the allocation plan text into a structured format compatible with app.py."""
-    
-    result = {
-        "phases": []
-    }
-    
+from pydantic import ValidationError
 
-    text = text.strip()
-    if text.startswith('```') and text.endswith('```'):
-        text = text[3:-3].strip()
-    
+from project_models import AllocationPlanOutput
 
-    lines = text.strip().split('\n')
-    
-    current_phase = None
-    current_task = None
-    in_task_section = False
-    
+class AllocationPlanParser:
+    """Incremental, chunk-fed parser for the allocation plan markdown.
+
+    feed() accepts text as it streams in and returns the events that became
+    final with it: ("task", phase, task) once the next task or phase header
+    (or the end of the text) shows the task has no more detail lines, and
+    ("phase", phase) once the phase's last task is final. close() flushes
+    whatever is left, unless the text was cut off. `result` always holds the plan parsed so far, in the
+    same shape parse_allocation_plan() returns.
+    """
+
+    def __init__(self):
+        self.result = {
+            "phases": []
+        }
+        self.buffer = ""
+        self.current_phase = None
+        self.current_task = None
+        self.in_task_section = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split('\n')
+        events = []
+        for line in lines:
+            events.extend(self._parse_line(line))
+        return events
 
-    for line in lines:
+    def close(self, truncated=False):
+        """Flush the rest of the text; with truncated (the stream broke off) the unfinished phase is dropped."""
+        if truncated:
+            self.buffer = ""
+            self.current_task = None
+            self.current_phase = None
+            return []
+        events = []
+        if self.buffer:
+            events.extend(self._parse_line(self.buffer))
+            self.buffer = ""
+        events.extend(self._finish_task())
+        if self.current_phase is not None:
+            events.append(("phase", self.current_phase))
+            self.current_phase = None
+        return events
+
+    def _finish_task(self):
+        task = self.current_task
+        if task is None:
+            return []
+        self.current_task = None
+        if isinstance(task["assigned_to"], list):
+            if not task["assigned_to"]:
+                task["assigned_to"] = "Unassigned"
+            else:
+                task["assigned_to"] = ", ".join(task["assigned_to"])
+        elif not task["assigned_to"]:
+            task["assigned_to"] = "Unassigned"
+
+        if not task["duration"]:
+            task["duration"] = "To Be Determined"
+        return [("task", self.current_phase, task)]
+
+    def _parse_line(self, line):
         line = line.strip()
         
-    
-        if not line or line.startswith('---'):
-            continue
+
+        if not line or line.startswith('---') or line.startswith('```'):
+            return []
         
         phase_match = re.match(r'^##?\s*Phase\s*(\d+)[\s:-]*(.+?)(?:\s*\(.*\))?$', line, re.IGNORECASE)
         if not phase_match:
             phase_match = re.match(r'^##?\s*(\d+)[\s:\.]*(.+?)\s*Phase', line, re.IGNORECASE)
         if phase_match:
+            events = self._finish_task()
+            if self.current_phase is not None:
+                events.append(("phase", self.current_phase))
             phase_number = phase_match.group(1)
             phase_name = phase_match.group(2).strip()
-            current_phase = {
+            self.current_phase = {
                 "phase_number": phase_number,
                 "phase_name": phase_name,
                 "tasks": []
             }
-            result["phases"].append(current_phase)
-            in_task_section = False
-            continue
+            self.result["phases"].append(self.current_phase)
+            self.in_task_section = False
+            return events
             
 
         task_match = re.match(r'^###?\s*Task\s*(\d+\.\d+)[\s:-]*(.+?)(?:\s*\(.*\))?$', line, re.IGNORECASE)
         if not task_match:
             task_match = re.match(r'^###?\s*(\d+\.\d+)[\s:-]*(.+?)$', line, re.IGNORECASE)
         
-        if task_match and current_phase is not None:
+        if task_match and self.current_phase is not None:
+            events = self._finish_task()
             task_id = task_match.group(1)
             task_name = task_match.group(2).strip()
             
-            current_task = {
+            self.current_task = {
                 "task_id": task_id,
                 "task_name": task_name,
                 "assigned_to": [],  
@@ -59,12 +109,13 @@ def parse_allocation_plan(text):
                 "resources": [],
                 "dependencies": []
             }
-            current_phase["tasks"].append(current_task)
-            in_task_section = True
-            continue
+            self.current_phase["tasks"].append(self.current_task)
+            self.in_task_section = True
+            return events
         
 
-        if current_task and in_task_section:
+        current_task = self.current_task
+        if current_task and self.in_task_section:
 
             label_match = re.match(r'[-*•]?\s*\*\*(.*?)[:]\*\*(.*)', line)
             if not label_match:
@@ -119,19 +170,16 @@ def parse_allocation_plan(text):
                 parts = line.split(":", 1)
                 if len(parts) > 1 and parts[1].strip():
                     current_task["duration"] = parts[1].strip()
+        return []
+
+
+def parse_allocation_plan(text):
+    """Parse the allocation plan text into a structured format compatible with app.py."""
     
-    for phase in result["phases"]:
-        for task in phase["tasks"]:
-            if isinstance(task["assigned_to"], list):
-                if not task["assigned_to"]:
-                    task["assigned_to"] = "Unassigned"
-                else:
-                    task["assigned_to"] = ", ".join(task["assigned_to"])
-            elif not task["assigned_to"]:
-                task["assigned_to"] = "Unassigned"
-                
-            if not task["duration"]:
-                task["duration"] = "To Be Determined"
+    parser = AllocationPlanParser()
+    parser.feed(text.strip())
+    parser.close()
+    result = parser.result
     
     print(f"Parsed {len(result['phases'])} phases with a total of {sum(len(phase['tasks']) for phase in result['phases'])} tasks")
     
@@ -139,4 +187,95 @@ def parse_allocation_plan(text):
         print(f"Sample assigned_to from first task: {result['phases'][0]['tasks'][0]['assigned_to']}")
         print(f"Sample duration from first task: {result['phases'][0]['tasks'][0]['duration']}")
     
-    return result
\ No newline at end of file
+    return result
+
+
+def allocation_from_model(plan):
+    """Convert a validated AllocationPlanOutput into the parse_allocation_plan() shape."""
+    return {
+        "phases": [
+            {
+                "phase_number": str(phase.number),
+                "phase_name": phase.name,
+                "tasks": [
+                    {
+                        "task_id": task.id,
+                        "task_name": task.name,
+                        "assigned_to": ", ".join(task.assigned_to) or "Unassigned",
+                        "duration": task.duration or "To Be Determined",
+                        "resources": task.resources,
+                        "dependencies": task.dependencies
+                    }
+                    for task in phase.tasks
+                ]
+            }
+            for phase in plan.phases
+        ]
+    }
+
+
+def parse_allocation_output(raw, structured=None):
+    """Parse the allocator's answer, JSON or markdown.
+
+    `structured` is the task's validated output (crewai's `pydantic` field,
+    as a model or dict) when the structured allocation task was used. A raw
+    JSON answer is validated in one pass; anything else goes through the
+    markdown parser.
+    """
+    if structured:
+        return allocation_from_model(AllocationPlanOutput.model_validate(structured))
+    text = (raw or "").strip()
+    if text.lstrip("`json \n").startswith("{"):
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        try:
+            return allocation_from_model(AllocationPlanOutput.model_validate_json(match.group(0) if match else text))
+        except ValidationError as e:
+            print(f"⚠️ Allocation JSON failed validation, falling back to the markdown parser: {str(e).splitlines()[0]}")
+    return parse_allocation_plan(text)
+
+
+def ensure_fields_present(task):
+    """Ensure all required fields are present in task data, with proper formatting"""
+
+    if "assigned_to" in task:
+        if isinstance(task["assigned_to"], list):
+            task["assigned_to"] = ", ".join(task["assigned_to"])
+        elif task["assigned_to"] is None:
+            task["assigned_to"] = "Unassigned"
+    else:
+        task["assigned_to"] = "Unassigned"
+    
+
+    if "duration" not in task or not task["duration"]:
+        task["duration"] = "N/A"
+    
+
+    if "resources" not in task or not task["resources"]:
+        task["resources"] = []
+    
+    return task
+
+
+def phase_tasks(phase):
+    """Flatten one parsed phase into the task dicts saved to allocation_tasks.json."""
+    tasks = []
+    for task in phase.get("tasks", []):
+
+        task = ensure_fields_present(task)
+        
+        tasks.append({
+            "task_name": f"{task.get('task_id', 'Task')} - {task.get('task_name', 'Unnamed Task')}",
+            "assigned_to": task["assigned_to"],
+            "duration": task["duration"],
+            "resources": task.get("resources", []),
+            "phase": f"{phase.get('phase_number', '0')}. {phase.get('phase_name', 'Unnamed Phase')}"
+        })
+    return tasks
+
+
+def plan_tasks(parsed_data):
+    """Every task of a parsed plan, flattened for allocation_tasks.json."""
+    tasks = []
+    for phase in parsed_data.get("phases", []):
+        tasks.extend(phase_tasks(phase))
+    return tasks
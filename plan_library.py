@@ -0,0 +1,257 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from config_loader import agents_config
+
+load_dotenv()
+
+PLAN_LIBRARY_PATH = os.getenv("PLAN_LIBRARY_PATH", "plan_library.sqlite3")
+PLAN_REUSE_THRESHOLD = float(os.getenv("PLAN_REUSE_THRESHOLD", "0.8"))
+# PLAN_LIBRARY=0 neither stores plans nor looks them up.
+PLAN_LIBRARY_ENABLED = os.getenv("PLAN_LIBRARY", "1") != "0"
+
+# team_members is left out on purpose: a different team is handled by re-running the allocation only.
+FINGERPRINT_FIELDS = ["project_type", "industry", "project_objectives", "project_requirements"]
+TAGGED_FIELDS = ["project_type", "industry"]
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "for", "to", "in", "on", "with", "that", "this", "is", "are", "be",
+    "it", "its", "as", "at", "by", "or", "from", "our", "we", "will", "should", "well", "all"
+}
+TASK_ROLES = {
+    "task_breakdown": agents_config["project_planning_agent"]["role"],
+    "time_resource_estimation": agents_config["estimation_agent"]["role"],
+    "resource_allocation": agents_config["resource_allocation_agent"]["role"]
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT UNIQUE NOT NULL,
+    normalized TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    created REAL NOT NULL,
+    reused INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def normalize_text(text):
+    words = re.sub(r'[^a-z0-9]+', ' ', str(text or "").lower()).split()
+    return " ".join(word for word in words if word not in STOPWORDS)
+
+
+def normalize_inputs(inputs):
+    """Lower-cased, punctuation- and stopword-free text of every fingerprinted input field."""
+    return {field: normalize_text(inputs.get(field)) for field in FINGERPRINT_FIELDS}
+
+
+def fingerprint(inputs):
+    """Exact-match key: inputs that normalize to the same text share it."""
+    material = json.dumps(normalize_inputs(inputs), sort_keys=True)
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+def shingles(normalized):
+    """Term counts: words, word-pair shingles, and field-tagged project type and industry."""
+    terms = Counter()
+    for field, text in normalized.items():
+        words = text.split()
+        terms.update(words)
+        terms.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+        if field in TAGGED_FIELDS and text:
+            terms[f"{field}={text}"] += 1
+    return terms
+
+
+def team_key(team_members):
+    return normalize_text(team_members)
+
+
+def result_outputs(result):
+    """Raw task outputs from a crew.kickoff().dict()-shaped result, keyed by task."""
+    outputs = {}
+    for task_output in result.get("tasks_output") or []:
+        for key, role in TASK_ROLES.items():
+            if isinstance(task_output, dict) and task_output.get("agent") == role and task_output.get("raw"):
+                outputs[key] = task_output["raw"]
+    return outputs
+
+
+class PlanLibrary:
+    """Generated plans, looked up by similarity of their project inputs.
+
+    Plans are stored in SQLite with their inputs and every task's raw
+    output. Lookups score the normalized inputs (team excluded) against
+    each stored plan with TF-IDF-weighted cosine similarity over words and
+    word-pair shingles, using an in-memory index built on first use.
+    """
+
+    def __init__(self, path=PLAN_LIBRARY_PATH, threshold=PLAN_REUSE_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.index = None
+        self.document_frequency = Counter()
+
+    def _load_index(self):
+        if self.index is not None:
+            return
+        self.index = {}
+        self.document_frequency = Counter()
+        for plan_id, normalized in self.db.execute("SELECT id, normalized FROM plans"):
+            self._index(plan_id, shingles(json.loads(normalized)))
+
+    def _index(self, plan_id, terms):
+        if plan_id in self.index:
+            self.document_frequency.subtract(self.index[plan_id].keys())
+        self.index[plan_id] = terms
+        self.document_frequency.update(terms.keys())
+
+    def _vector(self, terms):
+        count = len(self.index) + 1
+        vector = {term: (1 + math.log(tf)) * (math.log(count / (1 + self.document_frequency[term])) + 1)
+                  for term, tf in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {term: weight / norm for term, weight in vector.items()}
+
+    def add(self, inputs, outputs):
+        """Store a plan's inputs and task outputs; a plan for the same fingerprint is replaced."""
+        if not outputs.get("resource_allocation"):
+            return None
+        normalized = normalize_inputs(inputs)
+        with self.lock:
+            self._load_index()
+            self.db.execute(
+                "INSERT INTO plans (fingerprint, normalized, inputs, outputs, created) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(fingerprint) DO UPDATE SET inputs = excluded.inputs, outputs = excluded.outputs, "
+                "created = excluded.created",
+                (fingerprint(inputs), json.dumps(normalized), json.dumps(inputs), json.dumps(outputs), time.time())
+            )
+            plan_id = self.db.execute("SELECT id FROM plans WHERE fingerprint = ?",
+                                      (fingerprint(inputs),)).fetchone()[0]
+            self._index(plan_id, shingles(normalized))
+        return plan_id
+
+    def find(self, inputs, threshold=None):
+        """Best stored plan scoring at least `threshold`, as a dict with its "score"; None if there is none."""
+        threshold = self.threshold if threshold is None else threshold
+        with self.lock:
+            self._load_index()
+            if not self.index:
+                return None
+            query = self._vector(shingles(normalize_inputs(inputs)))
+            best_id, best_score = None, 0.0
+            for plan_id, terms in self.index.items():
+                stored = self._vector(terms)
+                score = sum(weight * stored.get(term, 0.0) for term, weight in query.items())
+                if score > best_score:
+                    best_id, best_score = plan_id, score
+        if best_id is None or best_score < threshold:
+            return None
+        entry = self.get(best_id)
+        entry["score"] = round(min(best_score, 1.0), 3)
+        return entry
+
+    def get(self, plan_id):
+        with self.lock:
+            row = self.db.execute("SELECT id, inputs, outputs, created, reused FROM plans WHERE id = ?",
+                                  (plan_id,)).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "inputs": json.loads(row[1]), "outputs": json.loads(row[2]),
+                "created": row[3], "reused": row[4]}
+
+    def mark_reused(self, plan_id):
+        with self.lock:
+            self.db.execute("UPDATE plans SET reused = reused + 1 WHERE id = ?", (plan_id,))
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM plans")
+            self.index = None
+
+    def stats(self):
+        with self.lock:
+            plans, reused = self.db.execute("SELECT COUNT(*), COALESCE(SUM(reused), 0) FROM plans").fetchone()
+        return {"plans": plans, "reused": reused, "threshold": self.threshold}
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_plan_library():
+    """Return the shared plan library, or None when PLAN_LIBRARY=0."""
+    global _library
+    if not PLAN_LIBRARY_ENABLED:
+        return None
+    with _library_lock:
+        if _library is None:
+            _library = PlanLibrary()
+    return _library
+
+
+def remember_plan(inputs, result):
+    """Store a finished crew or fan-out result for later reuse."""
+    library = get_plan_library()
+    if library is None or not result or result.get("failed_phases"):
+        return None
+    return library.add(inputs, result_outputs(result))
+
+
+def reuse_plan(entry, inputs, structured=False):
+    """A crew.kickoff().dict()-shaped result for `inputs`, built from a stored plan.
+
+    If the team is unchanged the stored plan is returned as is. Otherwise
+    only the allocation task runs, for the new team_members, with the
+    stored breakdown and estimates as its context.
+    """
+    from crewai import Crew, Process
+    from agents import build_agent
+    from tasks import build_task, stored_task
+    from fanout_planner import usage_dict
+
+    outputs = entry["outputs"]
+    upstream = [{"agent": TASK_ROLES[key], "raw": outputs[key]}
+                for key in ("task_breakdown", "time_resource_estimation") if outputs.get(key)]
+    get_plan_library().mark_reused(entry["id"])
+
+    if team_key(entry["inputs"].get("team_members")) == team_key(inputs.get("team_members")):
+        print(f"📚 Reusing stored plan {entry['id']} as is (similarity {entry['score']})")
+        allocation = {"agent": TASK_ROLES["resource_allocation"], "raw": outputs["resource_allocation"]}
+        return {"raw": allocation["raw"], "tasks_output": upstream + [allocation], "token_usage": {}}
+
+    print(f"📚 Re-allocating stored plan {entry['id']} for the new team (similarity {entry['score']})")
+    allocator = build_agent("resource_allocation_agent")
+    context = [stored_task(key, outputs[key], TASK_ROLES[key])
+               for key in ("task_breakdown", "time_resource_estimation") if outputs.get(key)]
+    allocation = build_task("resource_allocation_json" if structured else "resource_allocation", allocator,
+                            context=context)
+    crew = Crew(agents=[allocator], tasks=[allocation], process=Process.sequential, memory=False, verbose=True)
+    result = crew.kickoff(inputs=inputs).dict()
+    result["tasks_output"] = upstream + result.get("tasks_output", [])
+    result["token_usage"] = usage_dict(crew)
+    return result
+
+
+if __name__ == "__main__":
+    # python plan_library.py [stats|clear]
+    library = PlanLibrary()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        library.clear()
+        print("🧹 Plan library cleared")
+    print(f"📚 Plan library: {library.stats()}")
@@ -12,3 +12,19 @@ class MilestoneOutput(BaseModel):
 class ProjectPlanOutput(BaseModel):
     tasks: List[TaskOutput] = Field(..., description="List of tasks with descriptions")
     milestones: List[MilestoneOutput] = Field(..., description="List of project milestones")
+
+class AllocationTaskOutput(BaseModel):
+    id: str = Field(..., description="Task ID, e.g. 1.1")
+    name: str = Field(..., description="Short task name")
+    assigned_to: List[str] = Field(..., description="Team members, as 'Name (Role)'")
+    duration: str = Field(..., description="Estimated duration, e.g. 3 days")
+    resources: List[str] = Field(default_factory=list, description="Resources needed")
+    dependencies: List[str] = Field(default_factory=list, description="IDs of tasks this one depends on")
+
+class AllocationPhaseOutput(BaseModel):
+    number: int = Field(..., description="Phase number, starting at 1")
+    name: str = Field(..., description="Phase name")
+    tasks: List[AllocationTaskOutput] = Field(..., description="Tasks in this phase")
+
+class AllocationPlanOutput(BaseModel):
+    phases: List[AllocationPhaseOutput] = Field(..., description="Every project phase, in order")
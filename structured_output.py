@@ -0,0 +1,73 @@
+import re
+import json
+
+from pydantic import ValidationError
+from crewai.utilities.converter import Converter, ConverterError
+
+import project_models
+
+JSON_OBJECT = re.compile(r'\{.*\}', re.DOTALL)
+
+
+def output_model(name):
+    """Resolve an `output_pydantic` name from tasks.yaml to its project_models class."""
+    if not name:
+        return None
+    model = getattr(project_models, name, None)
+    if model is None:
+        raise ValueError(f"Unknown output_pydantic model in tasks.yaml: {name}")
+    return model
+
+
+def extract_json(text):
+    """The outermost {...} in a model answer, ignoring code fences and surrounding prose."""
+    match = JSON_OBJECT.search(text or "")
+    return match.group(0) if match else (text or "")
+
+
+def validate_output(model, text):
+    """Validate text against model in one pass; raises ValidationError (or ValueError for no JSON)."""
+    return model.model_validate_json(extract_json(text))
+
+
+def repair_prompt(model, text, error):
+    """Ask for the same answer again, with the validation errors to fix."""
+    problems = error.errors() if isinstance(error, ValidationError) else [{"msg": str(error)}]
+    details = "\n".join(
+        f"- {'.'.join(str(part) for part in problem.get('loc', ())) or 'document'}: {problem['msg']}"
+        for problem in problems[:20]
+    )
+    return (
+        f"This JSON does not match the {model.__name__} schema:\n\n{text}\n\n"
+        f"Validation errors:\n{details}\n\n"
+        f"Schema:\n{json.dumps(model.model_json_schema(), separators=(',', ':'))}\n\n"
+        "Reply with the corrected JSON only, compact, without code fences. Keep every value that was already valid."
+    )
+
+
+class RepairConverter(Converter):
+    """Task converter that spends at most one LLM call, and only on validation errors.
+
+    crewai hands a task's answer to its converter only after validating it
+    against `output_pydantic` failed. Instead of crewai's generic
+    re-conversion (up to three full attempts), this sends one repair prompt
+    with the validation errors through the agent's own LLM.
+    """
+
+    def to_pydantic(self, current_attempt=1):
+        try:
+            return validate_output(self.model, self.text)
+        except (ValidationError, ValueError) as e:
+            error = e
+        print(f"🔧 {self.model.__name__} validation failed ({str(error).splitlines()[0]}); asking for a repair")
+        try:
+            reply = self.llm.call([{"role": "user", "content": repair_prompt(self.model, self.text, error)}])
+            return validate_output(self.model, reply)
+        except Exception as e:
+            return ConverterError(f"Repaired {self.model.__name__} output is still invalid: {str(e)}")
+
+    def to_json(self, current_attempt=1):
+        result = self.to_pydantic(current_attempt)
+        if isinstance(result, ConverterError):
+            return result
+        return result.model_dump_json()
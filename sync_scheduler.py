@@ -0,0 +1,316 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from trello_utils import (
+    release_phase,
+    prefetch_phases,
+    get_or_create_list,
+    check_phase_completion,
+    compact_board,
+    finished_phases,
+    phase_list_name,
+    BatchReader,
+    TRELLO_PREFETCH_PHASES,
+    TRELLO_AUTO_COMPACT
+)
+from trello_events import get_phase_monitor, get_polling_monitor
+
+POLL_INTERVAL = 120
+TICK_SECONDS = 1.0
+MAX_BOARD_POLLS_PER_TICK = 2
+RELEASE_WORKERS = 2
+
+
+class ProjectSync:
+    """Phase-by-phase sync state for one registered project."""
+
+    def __init__(self, project_id, board_id, phases, complete=True, finished=()):
+        self.project_id = project_id
+        self.board_id = board_id
+        # Own copy: callers (app.py keeps its plan in session state) may go on extending theirs.
+        self.phases = {phase: list(phase_tasks) for phase, phase_tasks in phases.items()}
+        # Phases an earlier run already finished and compacted are never released again.
+        self.finished = set(finished)
+        self.sorted_phases = self.pending_phases()
+        # False while the plan is still streaming in; see SyncScheduler.extend_project.
+        self.complete = complete
+        self.phase_index = 0
+        self.list_id = None
+        self.state = "pending"
+        self.status = "⏳ Waiting for the scheduler..."
+        self.releasing = False
+        self.stats = []
+
+    def pending_phases(self):
+        return sorted((phase for phase in self.phases if phase not in self.finished), key=int)
+
+    @property
+    def current_phase(self):
+        if self.phase_index < len(self.sorted_phases):
+            return self.sorted_phases[self.phase_index]
+        return None
+
+    def phase_list_name(self, suffix="Not Started"):
+        # Tagged with the project: projects on one board would otherwise share "Phase 1 - ..." lists and cards.
+        return phase_list_name(self.current_phase, suffix, self.project_id)
+
+    def snapshot(self):
+        return {
+            "project_id": self.project_id,
+            "board_id": self.board_id,
+            "state": self.state,
+            "status": self.status,
+            "current_phase": self.current_phase,
+            "phase_number": self.phase_index + 1,
+            "phase_count": len(self.sorted_phases),
+            "stats": list(self.stats)
+        }
+
+
+class SyncScheduler:
+    """One event loop that drives every active project's Trello sync.
+
+    Projects on the same board share one PhaseCompletionIndex and one delta
+    poll of the board's action feed, so N projects cost one small request per
+    board per poll_interval; boards that come due together are polled in one
+    /batch call. Board polls are staggered across the interval
+    and capped per tick; every request also draws from the Trello client's
+    shared token bucket. Phase releases run on a small worker pool so a big
+    release never stalls monitoring of the other projects.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL, tick=TICK_SECONDS,
+                 max_board_polls_per_tick=MAX_BOARD_POLLS_PER_TICK, release_workers=RELEASE_WORKERS):
+        self.poll_interval = poll_interval
+        self.tick = tick
+        self.max_board_polls_per_tick = max_board_polls_per_tick
+        self.monitor = get_phase_monitor() or get_polling_monitor()
+        self.projects = {}
+        self.next_board_poll = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.releases = ThreadPoolExecutor(max_workers=release_workers)
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.releases.shutdown(wait=False)
+
+    def register_project(self, project_id, board_id, phases, complete=True):
+        """Start syncing `phases` (as returned by parse_allocation_tasks) to board_id.
+
+        Pass complete=False when more phases will follow via extend_project().
+        A project id that is still being synced is left as it is and its
+        current snapshot returned; a finished or failed one starts over.
+        """
+        with self.lock:
+            live = self._live_project(project_id)
+        if live is not None:
+            return live.snapshot()
+        project = ProjectSync(project_id, board_id, phases, complete,
+                              finished_phases(board_id, phases, project_id=project_id))
+        with self.lock:
+            # Another caller may have registered it while finished phases were being read.
+            live = self._live_project(project_id)
+            if live is not None:
+                return live.snapshot()
+            self.projects[project_id] = project
+            if board_id not in self.next_board_poll:
+                self.monitor.watch_board(board_id)
+                # Stagger new boards so their polls don't line up with existing ones.
+                offset = (len(self.next_board_poll) * self.poll_interval / 8) % self.poll_interval
+                self.next_board_poll[board_id] = time.monotonic() + offset
+            if project.sorted_phases:
+                self._release(project)
+            elif complete and project.finished:
+                self._finish(project)
+            elif complete:
+                project.state = "done"
+                project.status = "⚠️ No phases found in tasks!"
+            else:
+                self._wait_for_plan(project)
+            return project.snapshot()
+
+    def _live_project(self, project_id):
+        project = self.projects.get(project_id)
+        return project if project is not None and project.state not in ("done", "error") else None
+
+    def extend_project(self, project_id, phases, complete=False):
+        """Add phases to a project registered with complete=False.
+
+        A project that already finished every phase it knew about picks up
+        the next one right away; complete=True marks the plan as final.
+        """
+        with self.lock:
+            project = self.projects.get(project_id)
+            if project is None:
+                return None
+            for phase, phase_tasks in phases.items():
+                project.phases.setdefault(phase, []).extend(phase_tasks)
+            extended = {phase: list(project.phases[phase]) for phase in phases}
+        # Streamed phases this plan already finished on an earlier run are skipped too.
+        finished = finished_phases(project.board_id, extended, project_id=project_id)
+        with self.lock:
+            project.finished |= finished
+            project.sorted_phases = project.pending_phases()
+            project.complete = project.complete or complete
+            # Checked and left in one locked step, so concurrent extends release a phase once.
+            if project.state == "waiting":
+                if project.current_phase is not None:
+                    self._release(project)
+                elif project.complete:
+                    self._finish(project)
+            return project.snapshot()
+
+    def _wait_for_plan(self, project):
+        project.state = "waiting"
+        project.status = "⏳ Waiting for the rest of the plan..."
+
+    def _finish(self, project):
+        project.state = "done"
+        project.status = "🎉 All phases completed! Project finished."
+
+    def unregister_project(self, project_id):
+        with self.lock:
+            return self.projects.pop(project_id, None) is not None
+
+    def get_status(self, project_id):
+        with self.lock:
+            project = self.projects.get(project_id)
+        return project.snapshot() if project else None
+
+    def list_projects(self):
+        with self.lock:
+            return [project.snapshot() for project in self.projects.values()]
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Sync scheduler tick failed: {str(e)}")
+            self.stop_event.wait(self.tick)
+
+    def run_once(self):
+        now = time.monotonic()
+        with self.lock:
+            monitoring = [p for p in self.projects.values() if p.state == "monitoring" and not p.releasing]
+            boards = {p.board_id for p in monitoring}
+            due = sorted((t, b) for b, t in self.next_board_poll.items() if b in boards and t <= now)
+
+        due_boards = [board_id for _, board_id in due[:self.max_board_polls_per_tick]]
+        self._poll_boards(due_boards)
+        with self.lock:
+            for board_id in due_boards:
+                self.next_board_poll[board_id] = now + self.poll_interval
+
+        for project in monitoring:
+            if self.monitor.index.is_complete(project.list_id):
+                self._complete_phase(project)
+
+    def _poll_boards(self, board_ids):
+        """Delta-poll several boards, coalescing their action reads into /batch calls."""
+        pollers = [self.monitor.poller_for(board_id) for board_id in board_ids]
+        if len(pollers) == 1:
+            pollers[0].poll()
+            return
+        reader = BatchReader()
+        reads = [(poller, reader.add(poller.actions_path())) for poller in pollers]
+        reader.flush()
+        for poller, read in reads:
+            # Fall back to a full paginated poll if the batched page failed or was truncated.
+            if not read.ok or not poller.apply_page(read.data):
+                poller.poll()
+
+    def _complete_phase(self, project):
+        list_name = project.phase_list_name()
+        # Confirm against Trello before releasing; a stale index just waits for the next poll.
+        if not check_phase_completion(project.board_id, list_name):
+            self.monitor.seed_list(project.list_id)
+            return
+        project.status = f"✅ {list_name} completed!"
+        if TRELLO_AUTO_COMPACT:
+            # No "Completed" list: it would be archived straight away.
+            done_phases = project.sorted_phases[:project.phase_index + 1]
+            self.releases.submit(self._compact, project.board_id,
+                                 {phase: list(project.phases[phase]) for phase in done_phases}, project.project_id)
+        else:
+            get_or_create_list(project.board_id, project.phase_list_name("Completed"))
+        with self.lock:
+            project.phase_index += 1
+            if project.current_phase is None:
+                if project.complete:
+                    self._finish(project)
+                else:
+                    self._wait_for_plan(project)
+                return
+            self._release(project)
+
+    def _compact(self, board_id, phases, project_id):
+        try:
+            self.monitor.index.forget(compact_board(board_id, phases, project_id=project_id))
+        except Exception as e:
+            print(f"⚠️ Board compaction failed: {str(e)}")
+
+    def _release(self, project):
+        """Hand the current phase to a release worker; call with self.lock held."""
+        project.releasing = True
+        project.state = "releasing"
+        self.releases.submit(self._release_phase, project)
+
+    def _release_phase(self, project):
+        list_name = project.phase_list_name()
+        try:
+            stats = release_phase(project.board_id, project.phases[project.current_phase], list_name)
+            project.stats.append(stats)
+            if TRELLO_PREFETCH_PHASES and project.phase_index == 0:
+                self.releases.submit(prefetch_phases, project.board_id, dict(project.phases),
+                                     set(project.sorted_phases[:1]) | project.finished, project.project_id)
+            project.list_id = get_or_create_list(project.board_id, list_name)
+            poller = self.monitor.poller_for(project.board_id)
+            if poller.cursor is None:
+                poller.start_from_latest()
+            self.monitor.seed_list(project.list_id)
+            poller.save()
+            state, status = "monitoring", (
+                f"🎉 Started {list_name} ({stats['cards_created']} cards, "
+                f"{stats['cards_per_second']} cards/s). Monitoring completion..."
+            )
+        except Exception as e:
+            state, status = "error", f"❌ Failed to release {list_name}: {str(e)}"
+        with self.lock:
+            project.state = state
+            project.status = status
+            project.releasing = False
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide SyncScheduler, starting it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SyncScheduler().start()
+    return _scheduler
+
+
+def register_project(project_id, board_id, phases, complete=True):
+    return get_scheduler().register_project(project_id, board_id, phases, complete)
+
+
+def extend_project(project_id, phases, complete=False):
+    return get_scheduler().extend_project(project_id, phases, complete)
+
+
+def get_project_status(project_id):
+    return get_scheduler().get_status(project_id)
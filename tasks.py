@@ -1,22 +1,44 @@
 from crewai import Task
+from crewai.tasks.task_output import TaskOutput
 from agents import agents
 from config_loader import tasks_config
 from typing import Optional, List, Dict, Any
+from structured_output import output_model, RepairConverter
+
+def build_task(key, agent, context=None):
+    """Create a fresh Task from its tasks_config entry.
+
+    An `output_pydantic` name is resolved from project_models; such tasks
+    are validated by crewai and repaired at most once by RepairConverter.
+    """
+    config = tasks_config[key]
+    model = output_model(config.get("output_pydantic"))
+    task = Task(
+        description=config["description"],
+        agent=agent,
+        expected_output=config["expected_output"],
+        output_pydantic=model,
+        converter_cls=RepairConverter if model else None
+    )
+    if context is not None:
+        task.context = context
+    return task
+
+
+def stored_task(key, raw, agent_role):
+    """A Task that already holds an earlier run's output, to be passed as another task's context."""
+    config = tasks_config[key]
+    task = Task(description=config["description"], expected_output=config["expected_output"])
+    task.output = TaskOutput(description=config["description"], raw=raw, agent=agent_role)
+    return task
 
-# If you have project_models.py with Pydantic models:
-# from project_models import TaskOutput, ProjectPlanOutput
 
-# Create tasks without depending on Pydantic models for now
 tasks = {}
 
 for key, config in tasks_config.items():
     agent_key = config["agent"]
     
-    tasks[key] = Task(
-        description=config["description"],
-        agent=agents[agent_key],
-        expected_output=config["expected_output"],
-    )
+    tasks[key] = build_task(key, agents[agent_key])
 
 task_breakdown = tasks.get("task_breakdown")
 time_resource_estimation = tasks.get("time_resource_estimation")
@@ -0,0 +1,199 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from fake_trello import FakeTrello
+from parse_allocation import AllocationPlanParser
+from trello_outbox import TrelloOutbox
+from trello_utils import (
+    TrelloClient,
+    TokenBucket,
+    set_client,
+    plan_card_sync,
+    summarize_sync_plan,
+    get_or_create_list,
+    _task_card_fields,
+    _card_description
+)
+
+LISTS = [
+    {"id": "todo1", "name": "Phase 1 - Not Started"},
+    {"id": "doing1", "name": "Phase 1 - In Progress"},
+    {"id": "todo2", "name": "Phase 2 - Not Started"}
+]
+
+
+def task(task_id, name, assigned_to="Jane Doe"):
+    return {"task_name": f"{task_id} - {name}", "duration": "2 days", "assigned_to": assigned_to}
+
+
+def card(card_id, list_id, plan_task, **fields):
+    name, description, assignee = _task_card_fields(plan_task)
+    return dict({"id": card_id, "idList": list_id, "name": name, "desc": _card_description(description, assignee),
+                 "dueComplete": False}, **fields)
+
+
+@pytest.fixture
+def trello():
+    fake = FakeTrello(members={"janedoe": "Jane Doe"})
+    board = fake.add_board("Test board")
+    fake.start()
+    set_client(TrelloClient(api_key="test", token="test", base_url=fake.base_url,
+                            rate_limiter=TokenBucket(10 ** 6, 1)))
+    yield fake, board["id"]
+    set_client(None)
+    fake.stop()
+
+
+def test_plan_card_sync_diffs_tasks_against_cards():
+    tasks = [task("1.1", "Design"), task("1.2", "Build"), task("1.3", "Test"), task("1.4", "Ship"),
+             task("1.5", "Review")]
+    board_cards = [
+        card("c1", "todo1", tasks[0]),
+        card("c2", "todo1", tasks[1], desc="outdated"),
+        card("c3", "doing1", tasks[2]),
+        # Finished work in another list of the phase is left where it is.
+        card("c4", "doing1", tasks[3], dueComplete=True),
+        # Same task id, other phase: not this task's card.
+        card("c5", "todo2", tasks[4])
+    ]
+
+    plan = plan_card_sync(tasks, "todo1", "Phase 1 - Not Started", LISTS, board_cards)
+
+    assert [operation["op"] for operation in plan] == ["skip", "update", "move", "skip", "create"]
+    assert [operation["position"] for operation in plan] == [1, 2, 3, 4, 5]
+    assert plan[1]["card"]["id"] == "c2" and plan[4]["card"] is None
+    assert summarize_sync_plan(plan) == {"create": 1, "update": 1, "move": 1, "skip": 2}
+
+
+def test_plan_card_sync_prefers_the_card_in_the_target_list():
+    tasks = [task("1.1", "Design")]
+    board_cards = [card("stale", "doing1", tasks[0]), card("current", "todo1", tasks[0])]
+
+    plan = plan_card_sync(tasks, "todo1", "Phase 1 - Not Started", LISTS, board_cards)
+
+    assert plan[0]["op"] == "skip" and plan[0]["card"]["id"] == "current"
+
+
+def test_outbox_coalesces_pending_card_updates(tmp_path):
+    outbox = TrelloOutbox(path=str(tmp_path / "outbox.sqlite3"))
+
+    first = outbox.enqueue_card_update("card1", {"name": "New name"})
+    second = outbox.enqueue_card_status("card1", "list2")
+    other = outbox.enqueue_card_status("card2", "list2")
+
+    assert first == second != other
+    payload = outbox.db.execute("SELECT payload FROM operations WHERE id = ?", (first,)).fetchone()[0]
+    assert '"name": "New name"' in payload and '"idList": "list2"' in payload
+    assert outbox.counts() == {"pending": 2}
+
+
+def test_outbox_drain_applies_coalesced_operations(trello, tmp_path):
+    fake, board_id = trello
+    list_id = get_or_create_list(board_id, "Phase 1 - Not Started")
+    done_list_id = get_or_create_list(board_id, "Phase 1 - Completed")
+    outbox = TrelloOutbox(path=str(tmp_path / "outbox.sqlite3"))
+
+    created = outbox.enqueue_create_card(list_id, "1.1 - Design", "Task: 1.1 - Design\n")
+    assert outbox.drain() == (1, 0)
+    card_id = next(iter(fake.cards))
+    puts = fake.request_count("PUT")
+    outbox.enqueue_card_update(card_id, {"name": "1.1 - Design v2"})
+    outbox.enqueue_card_status(card_id, done_list_id)
+
+    assert outbox.drain() == (1, 0)
+    assert fake.request_count("PUT") == puts + 1
+    assert fake.cards[card_id]["name"] == "1.1 - Design v2" and fake.cards[card_id]["idList"] == done_list_id
+    assert outbox.wait_for([created], timeout=1)
+
+
+def test_outbox_leaves_live_claims_and_requeues_expired_leases(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    drainer = TrelloOutbox(path=path)
+    drainer.enqueue_card_status("card1", "list2")
+    assert len(drainer.claim()) == 1
+
+    other = TrelloOutbox(path=path)
+    assert other.claim() == []
+
+    time.sleep(0.01)
+    other.lease_seconds = 0
+    rows = other.claim()
+    assert len(rows) == 1 and rows[0][4] == 1
+    assert other.db.execute("SELECT owner, last_error FROM operations").fetchone() == (other.owner, "lease expired")
+
+
+def test_outbox_requeues_claims_of_a_dead_drainer(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    drainer = TrelloOutbox(path=path)
+    drainer.enqueue_card_status("card1", "list2")
+    drainer.claim()
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    drainer.db.execute("UPDATE operations SET owner = ?", (f"{socket.gethostname()}:{exited.pid}:dead",))
+
+    other = TrelloOutbox(path=path)
+    assert len(other.claim()) == 1
+    assert other.db.execute("SELECT last_error FROM operations").fetchone() == ("drainer exited",)
+
+
+def test_outbox_release_claims_requeues_own_work(tmp_path):
+    outbox = TrelloOutbox(path=str(tmp_path / "outbox.sqlite3"))
+    outbox.enqueue_card_status("card1", "list2")
+    outbox.claim()
+
+    outbox.release_claims()
+
+    assert outbox.counts() == {"pending": 1}
+
+
+PLAN = """## Phase 1: Discovery
+### Task 1.1: Interview users
+- **Assigned to:** Jane Doe
+- **Duration:** 3 days
+### Task 1.2: Write brief
+- **Assigned to:** John Smith, Jane Doe
+## Phase 2: Build
+### Task 2.1: Prototype
+- **Duration:** 1 week
+"""
+
+
+def feed_in_chunks(parser, text, size=7):
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return events
+
+
+def describe(events):
+    return [(kind, payload[0]["phase_number"], payload[1]["task_id"]) if kind == "task"
+            else (kind, payload[0]["phase_number"]) for kind, *payload in events]
+
+
+def test_allocation_parser_emits_tasks_and_phases_as_they_finish():
+    parser = AllocationPlanParser()
+
+    streamed = feed_in_chunks(parser, PLAN)
+    closed = parser.close()
+
+    assert describe(streamed) == [("task", "1", "1.1"), ("task", "1", "1.2"), ("phase", "1")]
+    assert describe(closed) == [("task", "2", "2.1"), ("phase", "2")]
+    first, second = parser.result["phases"][0]["tasks"]
+    assert first["assigned_to"] == "Jane Doe" and first["duration"] == "3 days"
+    assert second["assigned_to"] == "John Smith, Jane Doe" and second["duration"] == "To Be Determined"
+
+
+def test_allocation_parser_drops_the_unfinished_phase_when_truncated():
+    parser = AllocationPlanParser()
+    cut = PLAN[:PLAN.index("- **Duration:** 1 week")]
+
+    streamed = feed_in_chunks(parser, cut)
+    closed = parser.close(truncated=True)
+
+    assert ("phase", "1") in describe(streamed)
+    assert closed == []
+    assert all(kind != "task" or payload[0]["phase_number"] == "1" for kind, *payload in streamed)
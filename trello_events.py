@@ -0,0 +1,490 @@
+import os
+import sys
+import json
+import time
+import hmac
+import base64
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from dotenv import load_dotenv
+
+from trello_utils import get_client, get_or_create_list, check_phase_completion
+
+load_dotenv()
+
+# Public URL Trello should call (e.g. an ngrok tunnel to WEBHOOK_PORT).
+# Leave unset to keep plain polling. Webhooks also need TRELLO_WEBHOOK_SECRET
+# (the app secret Trello signs payloads with); unsigned payloads are rejected.
+TRELLO_WEBHOOK_URL = os.getenv("TRELLO_WEBHOOK_URL")
+TRELLO_WEBHOOK_SECRET = os.getenv("TRELLO_WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("TRELLO_WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("TRELLO_WEBHOOK_PORT", "8765"))
+POLL_INTERVAL = 120
+TRELLO_CURSOR_FILE = os.getenv("TRELLO_CURSOR_FILE", "trello_cursor.json")
+
+# Every board's poller shares the cursor file; saves read-modify-write it under this lock.
+_cursor_file_lock = threading.Lock()
+
+
+class PhaseCompletionIndex:
+    """Per-list card completion counters maintained from Trello actions.
+
+    Lists are seeded once from a full card fetch; after that every
+    createCard/updateCard/deleteCard action adjusts the counters in place
+    and wakes anyone waiting on a list.
+    """
+
+    def __init__(self):
+        self.lists = {}
+        self.condition = threading.Condition()
+        self.events_applied = 0
+
+    def seed(self, list_id, cards):
+        with self.condition:
+            self.lists[list_id] = {card["id"]: bool(card.get("dueComplete")) for card in cards}
+            self.condition.notify_all()
+
+    def is_seeded(self, list_id):
+        with self.condition:
+            return list_id in self.lists
+
+    def counts(self, list_id):
+        with self.condition:
+            cards = self.lists.get(list_id, {})
+            return sum(1 for done in cards.values() if done), len(cards)
+
+    def is_complete(self, list_id):
+        """True once every card of a seeded list is done; a list that was never seeded is not complete."""
+        with self.condition:
+            cards = self.lists.get(list_id)
+            return cards is not None and all(cards.values())
+
+    def apply_payload(self, payload):
+        action = payload.get("action") if isinstance(payload, dict) else None
+        if action:
+            self.apply_action(action)
+
+    def apply_action(self, action):
+        action_type = action.get("type")
+        data = action.get("data", {})
+        card = data.get("card") or {}
+        card_id = card.get("id")
+        if not card_id:
+            return
+
+        with self.condition:
+            if action_type == "createCard":
+                self._set(data.get("list", {}).get("id"), card_id, False)
+            elif action_type == "deleteCard":
+                self._remove(card_id)
+            elif action_type == "updateCard":
+                old = data.get("old", {})
+                if "listAfter" in data:
+                    done = self._remove(card_id)
+                    self._set(data["listAfter"].get("id"), card_id, card.get("dueComplete", done))
+                if old.get("closed") is False and card.get("closed"):
+                    self._remove(card_id)
+                elif "closed" in old and not card.get("closed"):
+                    self._set(data.get("list", {}).get("id"), card_id, card.get("dueComplete", False))
+                if "dueComplete" in old:
+                    list_id = data.get("list", {}).get("id") or self._find(card_id)
+                    self._set(list_id, card_id, bool(card.get("dueComplete")))
+            else:
+                return
+            self.events_applied += 1
+            self.condition.notify_all()
+
+    def wait_for_list(self, list_id, timeout):
+        """Block until list_id is complete or timeout elapses; return completion."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                cards = self.lists.get(list_id)
+                if cards is not None and all(cards.values()):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+
+    def forget(self, list_ids):
+        """Stop tracking lists that were archived."""
+        with self.condition:
+            for list_id in list_ids:
+                self.lists.pop(list_id, None)
+
+    def _find(self, card_id):
+        for list_id, cards in self.lists.items():
+            if card_id in cards:
+                return list_id
+        return None
+
+    def _set(self, list_id, card_id, done):
+        # Only lists we have seeded are tracked; anything else is noise.
+        if list_id in self.lists:
+            self.lists[list_id][card_id] = bool(done)
+
+    def _remove(self, card_id):
+        for cards in self.lists.values():
+            if card_id in cards:
+                return cards.pop(card_id)
+        return False
+
+
+def sign_payload(body, callback_url, secret=TRELLO_WEBHOOK_SECRET):
+    """Trello's X-Trello-Webhook value: base64 HMAC-SHA1 of body + callback URL."""
+    digest = hmac.new(secret.encode(), body + callback_url.encode(), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_signature(body, callback_url, signature, secret=TRELLO_WEBHOOK_SECRET):
+    """Check Trello's X-Trello-Webhook header; without a secret nothing verifies."""
+    if not secret:
+        return False
+    return hmac.compare_digest(sign_payload(body, callback_url, secret), signature or "")
+
+
+class WebhookReceiver:
+    """Small HTTP server that feeds Trello webhook payloads into a PhaseCompletionIndex."""
+
+    def __init__(self, index, host=WEBHOOK_HOST, port=WEBHOOK_PORT, callback_url=TRELLO_WEBHOOK_URL,
+                 secret=TRELLO_WEBHOOK_SECRET):
+        if not secret:
+            raise ValueError("TRELLO_WEBHOOK_SECRET is required to receive Trello webhooks")
+        self.index = index
+        self.callback_url = callback_url or ""
+        self.secret = secret
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                # Trello probes the callback URL with HEAD when registering.
+                self.send_response(200)
+                self.end_headers()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not verify_signature(body, receiver.callback_url, self.headers.get("X-Trello-Webhook"),
+                                        receiver.secret):
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+                try:
+                    receiver.index.apply_payload(json.loads(body or b"{}"))
+                except json.JSONDecodeError:
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"📡 Trello webhook receiver listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def register_webhook(model_id, callback_url, description="Project planner phase monitor"):
+    """Register (or reuse) a Trello webhook for model_id and return its id."""
+    client = get_client()
+    response = client.get(f"/tokens/{client.session.params['token']}/webhooks")
+    if response.status_code == 200:
+        for hook in response.json():
+            if hook.get("idModel") == model_id and hook.get("callbackURL") == callback_url:
+                return hook.get("id")
+
+    response = client.post("/webhooks", params={
+        "idModel": model_id,
+        "callbackURL": callback_url,
+        "description": description
+    })
+    if response.status_code == 200:
+        print(f"✅ Registered Trello webhook for {model_id}")
+        return response.json().get("id")
+    print(f"⚠️ Failed to register webhook: {response.status_code} - {response.text}")
+    return None
+
+
+def delete_webhook(webhook_id):
+    return get_client().delete(f"/webhooks/{webhook_id}").status_code == 200
+
+
+class DeltaPoller:
+    """Incremental board poller driven by the /boards/{id}/actions `since` cursor.
+
+    Each poll() fetches only the card actions newer than the cursor and
+    applies them to the shared PhaseCompletionIndex. The cursor and the
+    index are persisted to cursor_file so a restarted monitor resumes
+    from where it stopped instead of rescanning every list.
+    """
+
+    ACTION_FILTER = "createCard,updateCard,deleteCard"
+    PAGE_LIMIT = 1000
+
+    def __init__(self, board_id, index, cursor_file=TRELLO_CURSOR_FILE):
+        self.board_id = board_id
+        self.index = index
+        self.cursor_file = cursor_file
+        self.cursor = None
+        self.load()
+
+    def load(self):
+        if not self.cursor_file or not os.path.exists(self.cursor_file):
+            return
+        try:
+            with open(self.cursor_file, "r") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Ignoring unreadable cursor file {self.cursor_file}: {str(e)}")
+            return
+        self.cursor = state.get("cursors", {}).get(self.board_id)
+        with self.index.condition:
+            for list_id, cards in state.get("lists", {}).items():
+                self.index.lists.setdefault(list_id, cards)
+
+    def save(self):
+        if not self.cursor_file:
+            return
+        with _cursor_file_lock:
+            state = {"cursors": {}, "lists": {}}
+            if os.path.exists(self.cursor_file):
+                try:
+                    with open(self.cursor_file, "r") as f:
+                        state = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    pass
+            state.setdefault("cursors", {})[self.board_id] = self.cursor
+            with self.index.condition:
+                state["lists"] = {list_id: dict(cards) for list_id, cards in self.index.lists.items()}
+            # A temp file of its own, in the same directory so os.replace stays atomic.
+            directory = os.path.dirname(os.path.abspath(self.cursor_file))
+            with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as f:
+                json.dump(state, f)
+            os.replace(f.name, self.cursor_file)
+
+    def start_from_latest(self):
+        """Point the cursor at the newest board action without replaying history."""
+        response = get_client().get(f"/boards/{self.board_id}/actions", params={"limit": 1})
+        if response.status_code == 200 and response.json():
+            self.cursor = response.json()[0]["id"]
+            self.save()
+
+    def fetch_actions(self):
+        """Return actions newer than the cursor, oldest first."""
+        actions = []
+        before = None
+        while True:
+            params = {"filter": self.ACTION_FILTER, "limit": self.PAGE_LIMIT}
+            if self.cursor:
+                params["since"] = self.cursor
+            if before:
+                params["before"] = before
+            response = get_client().get(f"/boards/{self.board_id}/actions", params=params)
+            if response.status_code != 200:
+                print(f"❌ Error polling board actions: {response.status_code} - {response.text}")
+                break
+            page = [action for action in response.json() if action.get("id") != self.cursor]
+            actions.extend(page)
+            # Pages are newest first; keep walking back until we reach the cursor.
+            if len(page) < self.PAGE_LIMIT or not self.cursor:
+                break
+            before = page[-1]["id"]
+        actions.reverse()
+        return actions
+
+    def actions_path(self):
+        """Single-page actions route for /batch.
+
+        /batch routes can't contain commas, so ACTION_FILTER can't be sent:
+        the page holds every action type and apply_page keeps the card ones.
+        """
+        path = f"/boards/{self.board_id}/actions?limit={self.PAGE_LIMIT}"
+        if self.cursor:
+            path += f"&since={self.cursor}"
+        return path
+
+    def apply_page(self, page):
+        """Apply a newest-first page fetched via actions_path(); returns False if it was truncated."""
+        actions = [action for action in page if action.get("id") != self.cursor]
+        if len(actions) >= self.PAGE_LIMIT:
+            return False
+        actions.reverse()
+        self._apply(actions)
+        return True
+
+    def poll(self):
+        actions = self.fetch_actions()
+        self._apply(actions)
+        return len(actions)
+
+    def _apply(self, actions):
+        card_actions = set(self.ACTION_FILTER.split(","))
+        for action in actions:
+            if action.get("type") in card_actions:
+                self.index.apply_action(action)
+        # The cursor moves past every action seen, card action or not.
+        if actions:
+            self.cursor = actions[-1]["id"]
+            self.save()
+
+
+class PhaseMonitor:
+    """Phase completion from webhook events and/or delta polling.
+
+    With a receiver, webhook events wake waiters immediately and the delta
+    poller only catches up on anything missed. Without one, the delta poller
+    alone keeps the index current at one small request per tick.
+    """
+
+    def __init__(self, index=None, receiver=None, cursor_file=TRELLO_CURSOR_FILE):
+        self.index = index or PhaseCompletionIndex()
+        self.receiver = receiver
+        self.cursor_file = cursor_file
+        self.webhooks = {}
+        self.pollers = {}
+
+    def watch_board(self, board_id, callback_url=TRELLO_WEBHOOK_URL):
+        if board_id not in self.webhooks and callback_url:
+            self.webhooks[board_id] = register_webhook(board_id, callback_url)
+        return self.webhooks.get(board_id)
+
+    def poller_for(self, board_id):
+        if board_id not in self.pollers:
+            self.pollers[board_id] = DeltaPoller(board_id, self.index, self.cursor_file)
+        return self.pollers[board_id]
+
+    def seed_list(self, list_id):
+        response = get_client().get(f"/lists/{list_id}/cards")
+        if response.status_code == 200:
+            self.index.seed(list_id, response.json())
+            return True
+        return False
+
+    def wait_for_phase(self, board_id, phase_list_name, poll_interval=POLL_INTERVAL):
+        list_id = get_or_create_list(board_id, phase_list_name)
+        poller = self.poller_for(board_id)
+        if not self.index.is_seeded(list_id):
+            # Set the cursor first so nothing between the two reads is lost.
+            if poller.cursor is None:
+                poller.start_from_latest()
+            self.seed_list(list_id)
+            poller.save()
+
+        while True:
+            poller.poll()
+            if self.index.is_complete(list_id):
+                done, total = self.index.counts(list_id)
+                print(f"📡 Card events report {done}/{total} cards completed in {phase_list_name}")
+                # Confirm once against Trello before releasing the next phase.
+                if check_phase_completion(board_id, phase_list_name):
+                    return True
+                self.seed_list(list_id)
+                poller.save()
+
+            print(f"⚠️ Tasks in {phase_list_name} are not completed yet.")
+            if self.receiver is not None:
+                self.index.wait_for_list(list_id, poll_interval)
+            else:
+                time.sleep(poll_interval)
+
+
+_monitor = None
+_polling_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_phase_monitor():
+    """Start the shared webhook receiver once; None when webhooks aren't configured."""
+    global _monitor
+    if not TRELLO_WEBHOOK_URL:
+        return None
+    if not TRELLO_WEBHOOK_SECRET:
+        print("⚠️ TRELLO_WEBHOOK_URL is set without TRELLO_WEBHOOK_SECRET; falling back to polling")
+        return None
+    with _monitor_lock:
+        if _monitor is None:
+            index = PhaseCompletionIndex()
+            _monitor = PhaseMonitor(index, WebhookReceiver(index).start())
+    return _monitor
+
+
+def get_polling_monitor():
+    """Shared delta-polling monitor used when webhooks aren't configured."""
+    global _polling_monitor
+    with _monitor_lock:
+        if _polling_monitor is None:
+            _polling_monitor = PhaseMonitor()
+    return _polling_monitor
+
+
+def forget_lists(list_ids):
+    """Drop archived lists from every running monitor's completion index."""
+    for monitor in (_monitor, _polling_monitor):
+        if monitor is not None:
+            monitor.index.forget(list_ids)
+            for poller in monitor.pollers.values():
+                poller.save()
+
+
+def wait_for_phase_completion(board_id, phase_list_name, poll_interval=POLL_INTERVAL):
+    """Block until every card in phase_list_name is complete.
+
+    Uses webhook events when TRELLO_WEBHOOK_URL is set; otherwise polls the
+    board's action feed every poll_interval seconds.
+    """
+    monitor = get_phase_monitor()
+    if monitor is not None:
+        monitor.watch_board(board_id)
+    else:
+        monitor = get_polling_monitor()
+    return monitor.wait_for_phase(board_id, phase_list_name, poll_interval)
+
+
+def replay_events(events, url, delay=0.0, secret=TRELLO_WEBHOOK_SECRET, callback_url=TRELLO_WEBHOOK_URL):
+    """POST recorded webhook payloads (dicts or a JSONL path) to a receiver, signed with secret."""
+    if isinstance(events, str):
+        with open(events, "r") as f:
+            events = [json.loads(line) for line in f if line.strip()]
+
+    statuses = []
+    with requests.Session() as session:
+        for payload in events:
+            body = json.dumps(payload).encode()
+            headers = {"Content-Type": "application/json"}
+            if secret:
+                headers["X-Trello-Webhook"] = sign_payload(body, callback_url or "", secret)
+            response = session.post(url, data=body, headers=headers, timeout=10)
+            statuses.append(response.status_code)
+            if delay:
+                time.sleep(delay)
+    print(f"🔁 Replayed {len(statuses)} events to {url}")
+    return statuses
+
+
+if __name__ == "__main__":
+    # python trello_events.py replay events.jsonl [url]
+    if len(sys.argv) >= 3 and sys.argv[1] == "replay":
+        target = sys.argv[3] if len(sys.argv) > 3 else f"http://127.0.0.1:{WEBHOOK_PORT}/"
+        replay_events(sys.argv[2], target)
+    else:
+        print("Usage: python trello_events.py replay <events.jsonl> [receiver_url]")
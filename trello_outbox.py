@@ -0,0 +1,379 @@
+import os
+import sys
+import atexit
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from trello_utils import (
+    create_card,
+    assign_member_to_card,
+    remove_member_from_card,
+    add_member_to_board,
+    get_client,
+    task_key,
+    member_resolver
+)
+
+load_dotenv()
+
+TRELLO_OUTBOX_PATH = os.getenv("TRELLO_OUTBOX_PATH", "trello_outbox.sqlite3")
+OUTBOX_WORKERS = int(os.getenv("TRELLO_OUTBOX_WORKERS", "4"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("TRELLO_OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BATCH_SIZE = 100
+# A claimed operation whose owner hasn't touched it for this long is assumed dead and re-queued.
+OUTBOX_LEASE_SECONDS = float(os.getenv("TRELLO_OUTBOX_LEASE_SECONDS", "300"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    target TEXT,
+    coalesce_key TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    owner TEXT,
+    claimed_at REAL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS operations_status ON operations (status, id);
+CREATE INDEX IF NOT EXISTS operations_coalesce ON operations (coalesce_key, status);
+"""
+
+
+def _owner_is_dead(owner):
+    """True if owner ("host:pid:id") is a drainer on this host whose process has exited."""
+    host, _, rest = (owner or "").partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+class TrelloOutbox:
+    """Write-ahead outbox for Trello mutations, stored in SQLite.
+
+    Callers enqueue operations and return immediately; drain() (or the
+    background drainer) applies them with bounded concurrency. While an
+    operation is still pending, a new one with the same coalesce key
+    replaces it - for card updates the params are merged - so several
+    status moves of one card collapse into a single PUT.
+
+    Claimed operations carry their drainer's owner id and a lease that is
+    renewed while it works. Only operations whose lease has expired (their
+    drainer died) are put back in the queue, so a second process or the
+    status command never steals live work; a create that was attempted
+    before first looks for the card it may already have made.
+    """
+
+    def __init__(self, path=TRELLO_OUTBOX_PATH, max_workers=OUTBOX_WORKERS, max_attempts=OUTBOX_MAX_ATTEMPTS,
+                 lease_seconds=OUTBOX_LEASE_SECONDS):
+        self.path = path
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(operations)")}
+        for column, column_type in (("owner", "TEXT"), ("claimed_at", "REAL")):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE operations ADD COLUMN {column} {column_type}")
+        self.drainer = None
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+
+    # -- enqueueing ----------------------------------------------------
+
+    def enqueue(self, kind, payload, target=None, coalesce_key=None, merge=False):
+        """Queue an operation and return its id (an existing id if coalesced)."""
+        now = time.time()
+        with self.lock:
+            if coalesce_key:
+                row = self.db.execute(
+                    "SELECT id, payload FROM operations WHERE coalesce_key = ? AND status = 'pending' "
+                    "ORDER BY id DESC LIMIT 1", (coalesce_key,)
+                ).fetchone()
+                if row:
+                    if merge:
+                        merged = json.loads(row[1])
+                        merged["params"].update(payload["params"])
+                        payload = merged
+                    self.db.execute("UPDATE operations SET payload = ?, updated = ? WHERE id = ?",
+                                    (json.dumps(payload), now, row[0]))
+                    return row[0]
+            cursor = self.db.execute(
+                "INSERT INTO operations (kind, target, coalesce_key, payload, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, target, coalesce_key, json.dumps(payload), now, now)
+            )
+            op_id = cursor.lastrowid
+        self.wakeup.set()
+        return op_id
+
+    def enqueue_create_card(self, list_id, task_name, description, assigned_to=None, board_id=None, position=None):
+        """Queue a card create; its members are queued as assign_member operations once the card exists."""
+        payload = {"list_id": list_id, "task_name": task_name, "description": description,
+                   "assigned_to": assigned_to, "board_id": board_id, "position": position}
+        # No shared target: card order comes from `pos`, so creates can run in parallel.
+        return self.enqueue("create_card", payload,
+                            coalesce_key=f"create:{list_id}:{task_key(task_name)}")
+
+    def enqueue_card_update(self, card_id, params):
+        return self.enqueue("update_card", {"card_id": card_id, "params": dict(params)},
+                            target=f"card:{card_id}", coalesce_key=f"update:{card_id}", merge=True)
+
+    def enqueue_card_status(self, card_id, new_list_id):
+        return self.enqueue_card_update(card_id, {"idList": new_list_id})
+
+    def enqueue_assign_member(self, card_id, member_id):
+        return self.enqueue("assign_member", {"card_id": card_id, "member_id": member_id},
+                            target=f"card:{card_id}", coalesce_key=f"assign:{card_id}:{member_id}")
+
+    def enqueue_remove_member(self, card_id, member_id):
+        return self.enqueue("remove_member", {"card_id": card_id, "member_id": member_id},
+                            target=f"card:{card_id}", coalesce_key=f"remove:{card_id}:{member_id}")
+
+    def enqueue_add_member_to_board(self, board_id, member_id):
+        return self.enqueue("add_member_to_board", {"board_id": board_id, "member_id": member_id},
+                            target=f"board:{board_id}", coalesce_key=f"board_member:{board_id}:{member_id}")
+
+    # -- draining ------------------------------------------------------
+
+    def claim(self, limit=OUTBOX_BATCH_SIZE):
+        now = time.time()
+        with self.lock:
+            # IMMEDIATE takes the write lock up front so two drainers never claim the same rows.
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                # Counted as an attempt: the request may well have reached Trello before its drainer died.
+                self.db.execute(
+                    "UPDATE operations SET status = 'pending', attempts = attempts + 1, last_error = 'lease expired', "
+                    "owner = NULL, claimed_at = NULL, updated = ? "
+                    "WHERE status = 'in_flight' AND (claimed_at IS NULL OR claimed_at < ?)",
+                    (now, now - self.lease_seconds)
+                )
+                # A drainer on this machine whose process is gone won't renew its lease; don't wait it out.
+                owners = [row[0] for row in self.db.execute(
+                    "SELECT DISTINCT owner FROM operations WHERE status = 'in_flight'")]
+                dead = [owner for owner in owners if owner != self.owner and _owner_is_dead(owner)]
+                if dead:
+                    self.db.execute(
+                        f"UPDATE operations SET status = 'pending', attempts = attempts + 1, "
+                        f"last_error = 'drainer exited', owner = NULL, claimed_at = NULL, updated = ? "
+                        f"WHERE status = 'in_flight' AND owner IN ({','.join('?' * len(dead))})",
+                        [now] + dead
+                    )
+                rows = self.db.execute(
+                    "SELECT id, kind, target, payload, attempts FROM operations WHERE status = 'pending' "
+                    "ORDER BY id LIMIT ?", (limit,)
+                ).fetchall()
+                if rows:
+                    self.db.execute(
+                        f"UPDATE operations SET status = 'in_flight', owner = ?, claimed_at = ?, updated = ? "
+                        f"WHERE id IN ({','.join('?' * len(rows))})",
+                        [self.owner, now, now] + [row[0] for row in rows]
+                    )
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def renew_lease(self):
+        """Keep this drainer's claimed operations from being taken for a dead drainer's."""
+        with self.lock:
+            self.db.execute("UPDATE operations SET claimed_at = ? WHERE owner = ? AND status = 'in_flight'",
+                            (time.time(), self.owner))
+
+    def _existing_card(self, list_id, task_name):
+        """The card for task_name already on list_id, if an earlier attempt got through."""
+        response = get_client().get(f"/lists/{list_id}/cards")
+        if response.status_code != 200:
+            raise RuntimeError(f"could not check list {list_id} for an existing card: {response.status_code}")
+        key = task_key(task_name)
+        return next((card for card in response.json() if task_key(card.get("name")) == key), None)
+
+    def _create_card(self, payload, retry):
+        card = self._existing_card(payload["list_id"], payload["task_name"]) if retry else None
+        if card is None:
+            card = create_card(payload["list_id"], payload["task_name"], payload["description"],
+                               payload.get("assigned_to"), board_id=payload.get("board_id"),
+                               position=payload.get("position"), assign=False)
+        if not card:
+            raise RuntimeError("card was not created")
+        if payload.get("assigned_to"):
+            for member_id in member_resolver.resolve_card_assignees(payload["assigned_to"],
+                                                                    payload.get("board_id")):
+                self.enqueue_assign_member(card["id"], member_id)
+        return {"id": card.get("id")}
+
+    def execute(self, kind, payload, retry=False):
+        """Apply one operation; returns a JSON-able result, or raises on failure.
+
+        retry marks an operation attempted before, whose create may already have reached Trello.
+        """
+        if kind == "create_card":
+            return self._create_card(payload, retry)
+        if kind == "update_card":
+            response = get_client().put(f"/cards/{payload['card_id']}", params=payload["params"])
+            if response.status_code != 200:
+                raise RuntimeError(f"{response.status_code} - {response.text}")
+            return {"id": payload["card_id"]}
+        if kind == "assign_member":
+            if not assign_member_to_card(payload["card_id"], payload["member_id"]):
+                raise RuntimeError("member was not assigned")
+            return {}
+        if kind == "remove_member":
+            if not remove_member_from_card(payload["card_id"], payload["member_id"]):
+                raise RuntimeError("member was not removed")
+            return {}
+        if kind == "add_member_to_board":
+            if not add_member_to_board(payload["board_id"], payload["member_id"]):
+                raise RuntimeError("member was not added to board")
+            return {}
+        raise ValueError(f"Unknown outbox operation: {kind}")
+
+    def _finish(self, op_id, attempts, result=None, error=None):
+        with self.changed:
+            # An operation whose lease expired and was re-claimed belongs to its new owner.
+            if error is None:
+                self.db.execute("UPDATE operations SET status = 'done', result = ?, updated = ? "
+                                "WHERE id = ? AND owner = ?", (json.dumps(result), time.time(), op_id, self.owner))
+            else:
+                status = "failed" if attempts + 1 >= self.max_attempts else "pending"
+                self.db.execute(
+                    "UPDATE operations SET status = ?, attempts = attempts + 1, last_error = ?, updated = ? "
+                    "WHERE id = ? AND owner = ?", (status, str(error), time.time(), op_id, self.owner)
+                )
+            self.changed.notify_all()
+
+    def _run_group(self, rows):
+        # Operations on the same target run in order; different targets run in parallel.
+        failed = 0
+        for op_id, kind, _, payload, attempts in rows:
+            self.renew_lease()
+            try:
+                result = self.execute(kind, json.loads(payload), retry=attempts > 0)
+            except Exception as e:
+                print(f"⚠️ Outbox operation {op_id} ({kind}) failed: {str(e)}")
+                self._finish(op_id, attempts, error=e)
+                failed += 1
+            else:
+                self._finish(op_id, attempts, result=result)
+        return failed
+
+    def drain(self, max_rounds=None):
+        """Apply pending operations until the queue is empty; returns (done, failed)."""
+        done = failed = rounds = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while max_rounds is None or rounds < max_rounds:
+                rows = self.claim()
+                if not rows:
+                    break
+                groups = {}
+                for row in rows:
+                    groups.setdefault(row[2] or f"op:{row[0]}", []).append(row)
+                round_failed = sum(executor.map(self._run_group, groups.values()))
+                failed += round_failed
+                done += len(rows) - round_failed
+                rounds += 1
+                if round_failed == len(rows):
+                    # Nothing got through; let the client's backoff/breaker settle first.
+                    break
+        return done, failed
+
+    def start(self, interval=5.0):
+        """Drain continuously in a background thread, waking early on enqueue."""
+        if self.drainer is None:
+            def run():
+                while not self.stop_event.is_set():
+                    self.wakeup.clear()
+                    try:
+                        self.drain()
+                    except Exception as e:
+                        print(f"❌ Outbox drain failed: {str(e)}")
+                    self.wakeup.wait(interval)
+
+            self.drainer = threading.Thread(target=run, daemon=True)
+            self.drainer.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.wakeup.set()
+
+    def release_claims(self):
+        """Hand this drainer's unfinished claims back to the queue, e.g. before the process exits."""
+        with self.changed:
+            # Counted as an attempt: one may be mid-request, so a released create checks for its card first.
+            self.db.execute("UPDATE operations SET status = 'pending', attempts = attempts + 1, owner = NULL, "
+                            "claimed_at = NULL, last_error = 'released', updated = ? "
+                            "WHERE owner = ? AND status = 'in_flight'", (time.time(), self.owner))
+            self.changed.notify_all()
+
+    def wait_for(self, op_ids, timeout=None):
+        """Block until the given operations are done or failed; returns True if all are done."""
+        op_ids = list(op_ids)
+        if not op_ids:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        query = f"SELECT COUNT(*) FROM operations WHERE id IN ({','.join('?' * len(op_ids))}) AND status = ?"
+        with self.changed:
+            while True:
+                pending = self.db.execute(query.replace("status = ?", "status IN ('pending', 'in_flight')"),
+                                          op_ids).fetchone()[0]
+                if not pending:
+                    return self.db.execute(query, op_ids + ["failed"]).fetchone()[0] == 0
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.changed.wait(remaining if remaining is not None else 1.0)
+
+    def counts(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT status, COUNT(*) FROM operations GROUP BY status").fetchall())
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    """Return the shared outbox with its background drainer running."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = TrelloOutbox().start()
+            # The drainer is a daemon thread; don't leave its claims stuck until the lease expires.
+            atexit.register(_outbox.release_claims)
+    return _outbox
+
+
+if __name__ == "__main__":
+    # python trello_outbox.py [drain|status]
+    outbox = TrelloOutbox()
+    # drain also takes back claims left by drainers that exited or whose lease expired.
+    if len(sys.argv) > 1 and sys.argv[1] == "drain":
+        done, failed = outbox.drain()
+        print(f"📤 Outbox drained: {done} done, {failed} failed")
+    print(f"📬 Outbox status: {outbox.counts()}")
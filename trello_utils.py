@@ -1,11 +1,19 @@
 import os
 import requests
 import json
+import hashlib
 import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
 from dotenv import load_dotenv
 import datetime
 import re
 
+from member_resolver import MemberResolver, split_assignees
+
 load_dotenv()
 
 TRELLO_API_KEY = os.getenv("TRELLO_API_KEY")
@@ -13,188 +21,582 @@ TRELLO_OAUTH_TOKEN = os.getenv("TRELLO_OAUTH_TOKEN")
 BOARD_NAME = "My Project Manager Crew"
 JSON_FILE = "allocation_tasks.json"
 
-BASE_URL = "https://api.trello.com/1"
+BASE_URL = os.getenv("TRELLO_BASE_URL", "https://api.trello.com/1")
+
+TRELLO_POOL_SIZE = int(os.getenv("TRELLO_POOL_SIZE", "10"))
+TRELLO_CONNECT_TIMEOUT = float(os.getenv("TRELLO_CONNECT_TIMEOUT", "5"))
+TRELLO_READ_TIMEOUT = float(os.getenv("TRELLO_READ_TIMEOUT", "30"))
+TRELLO_BATCH_LIMIT = 10
+
+# Trello allows 100 requests per 10 seconds per token.
+TRELLO_RATE_LIMIT = int(os.getenv("TRELLO_RATE_LIMIT", "100"))
+TRELLO_RATE_PERIOD = float(os.getenv("TRELLO_RATE_PERIOD", "10"))
+TRELLO_SYNC_WORKERS = int(os.getenv("TRELLO_SYNC_WORKERS", "1"))
+# TRELLO_USE_OUTBOX=1 queues card creates, updates, moves, member assignments and board
+# memberships in trello_outbox. List creates and archiving stay direct: callers need the
+# new list id (or the archived ids) before they can go on.
+TRELLO_USE_OUTBOX = os.getenv("TRELLO_USE_OUTBOX", "").lower() in ("1", "true", "yes")
+# TRELLO_AUTO_COMPACT=1 archives each finished phase's lists and cards (see compact_board).
+TRELLO_AUTO_COMPACT = os.getenv("TRELLO_AUTO_COMPACT", "0").lower() in ("1", "true", "yes")
+BOARD_SUMMARY_FILE = os.getenv("TRELLO_BOARD_SUMMARY_FILE", "board_summary.json")
+TRELLO_PREFETCH_PHASES = os.getenv("TRELLO_PREFETCH_PHASES", "").lower() in ("1", "true", "yes")
+
+TRELLO_MAX_RETRIES = int(os.getenv("TRELLO_MAX_RETRIES", "5"))
+TRELLO_BACKOFF_BASE = float(os.getenv("TRELLO_BACKOFF_BASE", "0.5"))
+TRELLO_BACKOFF_MAX = float(os.getenv("TRELLO_BACKOFF_MAX", "30"))
+TRELLO_BREAKER_THRESHOLD = int(os.getenv("TRELLO_BREAKER_THRESHOLD", "5"))
+TRELLO_BREAKER_COOLDOWN = float(os.getenv("TRELLO_BREAKER_COOLDOWN", "10"))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+TRELLO_BOARD_TTL = float(os.getenv("TRELLO_BOARD_TTL", "3600"))
+TRELLO_LIST_TTL = float(os.getenv("TRELLO_LIST_TTL", "300"))
+TRELLO_MEMBER_TTL = float(os.getenv("TRELLO_MEMBER_TTL", "300"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, capacity=TRELLO_RATE_LIMIT, period=TRELLO_RATE_PERIOD):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Pauses every request on a client while Trello is throttling or failing.
+
+    A 429 pauses the client for the Retry-After period; a run of consecutive
+    server errors opens the breaker for `cooldown` seconds. Workers block in
+    wait() instead of each sending its own doomed request.
+    """
+
+    def __init__(self, threshold=TRELLO_BREAKER_THRESHOLD, cooldown=TRELLO_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self.lock:
+                delay = self.resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                print(f"⛔ Trello circuit open for {self.cooldown}s after {self.failures} failures")
+                self.resume_at = max(self.resume_at, time.monotonic() + self.cooldown)
+                self.failures = 0
+
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+    return None
+
+
+def _request_not_sent(error):
+    """True if the connection failed before the request went out, so even a POST can be resent."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+def _backoff_seconds(attempt, base=TRELLO_BACKOFF_BASE, cap=TRELLO_BACKOFF_MAX):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TrelloClient:
+    """Trello REST client backed by a pooled, keep-alive requests.Session.
+
+    Key and token are attached once as session defaults, so callers only pass
+    the endpoint path (e.g. "/boards/{id}/lists") and its own parameters.
+    """
+
+    def __init__(self, api_key=None, token=None, base_url=None,
+                 pool_size=TRELLO_POOL_SIZE,
+                 timeout=(TRELLO_CONNECT_TIMEOUT, TRELLO_READ_TIMEOUT),
+                 rate_limiter=None, max_retries=TRELLO_MAX_RETRIES, breaker=None):
+        self.base_url = (base_url or BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_stats = {"retries": 0, "throttled": 0, "gave_up": 0}
+
+        self.session = requests.Session()
+        self.session.params = {
+            "key": api_key or TRELLO_API_KEY,
+            "token": token or TRELLO_OAUTH_TOKEN
+        }
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Connection": "keep-alive"
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.batch_stats = {"batch_calls": 0, "batched_urls": 0}
+        self._stats_lock = threading.Lock()
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, params=None, **kwargs):
+        """Send a request, retrying 429/5xx and connection errors.
+
+        Retry-After is honoured when present, otherwise the delay is jittered
+        exponential backoff. A 429 pauses the whole client via the circuit
+        breaker. A POST is only retried on 429 or when the connection failed
+        before it was sent: after a 5xx or a dropped response Trello may
+        already have created the object.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+        attempt = 0
+        while True:
+            self.breaker.wait()
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.request(method, url, params=params, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                unsafe = method == "POST" and not _request_not_sent(e)
+                self.breaker.record_failure()
+                if unsafe or attempt >= self.max_retries:
+                    self._count("gave_up")
+                    raise
+                delay = _backoff_seconds(attempt)
+                print(f"⚠️ Trello {method} {path} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                if method == "POST" and response.status_code != 429:
+                    self.breaker.record_failure()
+                    print(f"❌ Trello {method} {path} returned {response.status_code}; not retried, "
+                          f"it may already have been applied")
+                    return response
+                if attempt >= self.max_retries:
+                    self._count("gave_up")
+                    print(f"❌ Trello {method} {path} still failing after {attempt} retries: {response.status_code}")
+                    return response
+                delay = _retry_after_seconds(response)
+                if delay is None:
+                    delay = _backoff_seconds(attempt)
+                if response.status_code == 429:
+                    self._count("throttled")
+                    self.breaker.pause(delay)
+                else:
+                    self.breaker.record_failure()
+                print(f"⚠️ Trello {method} {path} returned {response.status_code}, retrying in {delay:.1f}s")
+                if response.status_code == 429:
+                    # The breaker pause already holds this and every other worker.
+                    delay = 0
+            attempt += 1
+            self._count("retries")
+            if delay:
+                time.sleep(delay)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.retry_stats[name] += 1
+
+    def get(self, path, params=None, **kwargs):
+        return self.request("GET", path, params=params, **kwargs)
+
+    def post(self, path, params=None, **kwargs):
+        return self.request("POST", path, params=params, **kwargs)
+
+    def put(self, path, params=None, **kwargs):
+        return self.request("PUT", path, params=params, **kwargs)
+
+    def delete(self, path, params=None, **kwargs):
+        return self.request("DELETE", path, params=params, **kwargs)
+
+    def batch_get(self, paths):
+        """Fetch several GET routes through /batch, at most 10 per round trip.
+
+        Returns one (status_code, body) tuple per path, in the same order.
+        Paths must not contain commas since Trello splits `urls` on them.
+        """
+        results = []
+        for start in range(0, len(paths), TRELLO_BATCH_LIMIT):
+            chunk = paths[start:start + TRELLO_BATCH_LIMIT]
+            response = self.get("/batch", params={"urls": ",".join(chunk)})
+            with self._stats_lock:
+                self.batch_stats["batch_calls"] += 1
+                self.batch_stats["batched_urls"] += len(chunk)
+
+            if response.status_code != 200:
+                print(f"❌ Trello batch error: {response.status_code} - {response.text}")
+                results.extend((response.status_code, None) for _ in chunk)
+                continue
+
+            for item in response.json():
+                if "200" in item:
+                    results.append((200, item["200"]))
+                else:
+                    results.append((item.get("statusCode", 500), None))
+        return results
+
+    def round_trips_saved(self):
+        with self._stats_lock:
+            return self.batch_stats["batched_urls"] - self.batch_stats["batch_calls"]
+
+    def reset_batch_stats(self):
+        with self._stats_lock:
+            self.batch_stats = {"batch_calls": 0, "batched_urls": 0}
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared TrelloClient used by the module-level helpers."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TrelloClient()
+    return _client
+
+
+def set_client(client):
+    """Replace the shared TrelloClient (e.g. to point at another base URL)."""
+    global _client
+    with _client_lock:
+        previous = _client
+        _client = client
+    if previous is not None and previous is not client:
+        previous.close()
+    return client
+
+
+class BatchRead:
+    """Placeholder for one queued GET; filled in by BatchReader.flush()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.status_code = None
+        self.data = None
+
+    @property
+    def ok(self):
+        return self.status_code == 200
+
+
+class BatchReader:
+    """Collect independent GETs and resolve them with as few /batch calls as possible."""
+
+    def __init__(self, client=None):
+        self.client = client or get_client()
+        self.pending = []
+
+    def add(self, path):
+        read = BatchRead(path)
+        self.pending.append(read)
+        return read
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return []
+        if len(pending) == 1:
+            response = self.client.get(pending[0].path)
+            pending[0].status_code = response.status_code
+            if response.status_code == 200:
+                pending[0].data = response.json()
+            return pending
+        results = self.client.batch_get([read.path for read in pending])
+        for read, (status_code, data) in zip(pending, results):
+            read.status_code = status_code
+            read.data = data
+        return pending
+
+
+def get_batch_stats():
+    """Round-trip counters for /batch reads made by the shared client."""
+    client = get_client()
+    stats = dict(client.batch_stats)
+    stats["round_trips_saved"] = client.round_trips_saved()
+    return stats
+
+
+def reset_batch_stats():
+    get_client().reset_batch_stats()
+
+
+class BoardCache:
+    """TTL cache for board ids, board lists and board member maps.
+
+    Entries are keyed by (kind, key), e.g. ("lists", board_id). Writers that
+    change the underlying data (creating a list, adding a member) call
+    invalidate() so the next read goes back to Trello.
+    """
+
+    def __init__(self, ttls=None):
+        self.ttls = ttls or {
+            "board": TRELLO_BOARD_TTL,
+            "lists": TRELLO_LIST_TTL,
+            "members": TRELLO_MEMBER_TTL
+        }
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, key):
+        with self.lock:
+            entry = self.entries.get((kind, key))
+            if entry is not None and time.monotonic() - entry[0] < self.ttls.get(kind, 0):
+                self.hits += 1
+                return entry[1]
+            self.entries.pop((kind, key), None)
+            self.misses += 1
+            return None
+
+    def set(self, kind, key, value):
+        with self.lock:
+            self.entries[(kind, key)] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self, kind=None, key=None):
+        with self.lock:
+            for entry_kind, entry_key in list(self.entries):
+                if (kind is None or entry_kind == kind) and (key is None or entry_key == key):
+                    del self.entries[(entry_kind, entry_key)]
+
+
+board_cache = BoardCache()
+member_resolver = MemberResolver()
+
+
+def fetch_board_snapshot(board_id, list_ids=(), include_board_cards=False):
+    """Read board lists, members and (optionally) cards in a single batched round trip.
+
+    Lists and members come from board_cache when fresh, so only the missing
+    pieces are fetched.
+    """
+    lists = board_cache.get("lists", board_id)
+    members = board_cache.get("members", board_id)
+
+    reader = BatchReader()
+    lists_read = reader.add(f"/boards/{board_id}/lists") if lists is None else None
+    members_read = reader.add(f"/boards/{board_id}/members") if members is None else None
+    board_cards_read = reader.add(f"/boards/{board_id}/cards/open") if include_board_cards else None
+    list_card_reads = {list_id: reader.add(f"/lists/{list_id}/cards") for list_id in list_ids}
+    reader.flush()
+
+    if lists_read is not None:
+        lists = board_cache.set("lists", board_id, lists_read.data) if lists_read.ok else []
+    if members_read is not None:
+        members = (board_cache.set("members", board_id, _members_by_username(members_read.data))
+                   if members_read.ok else {})
+        if members_read.ok:
+            member_resolver.load_board(board_id, members_read.data)
+
+    snapshot = {
+        "lists": lists,
+        "members": members,
+        "cards": {list_id: read.data for list_id, read in list_card_reads.items() if read.ok}
+    }
+    if board_cards_read is not None and board_cards_read.ok:
+        for card in board_cards_read.data:
+            snapshot["cards"].setdefault(card.get("idList"), []).append(card)
+    return snapshot
+
+
+def _members_by_username(members):
+    return {member.get("username"): member.get("id") for member in members}
+
+
+def _find_list_id(lists, list_name):
+    for lst in lists:
+        if lst["name"] == list_name:
+            return lst["id"]
+    return None
 
 
 def create_board(board_name):
-    url = f"{BASE_URL}/boards/"
+    url = "/boards/"
     query = {
-        "name": board_name,
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN
+        "name": board_name
     }
-    response = requests.post(url, params=query)
+    response = get_client().post(url, params=query)
     return response.json()
 
 
 def get_board_id(board_name=BOARD_NAME):
-    url = f"{BASE_URL}/members/me/boards"
-    query = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN
-    }
-    response = requests.get(url, params=query)
+    board_id = board_cache.get("board", board_name)
+    if board_id:
+        return board_id
+    url = "/members/me/boards"
+    response = get_client().get(url)
     boards = response.json()
     for board in boards:
         if board["name"] == board_name:
-            return board["id"]
+            return board_cache.set("board", board_name, board["id"])
     return None
 
 
-def get_or_create_list(board_id, list_name):
-    url = f"{BASE_URL}/boards/{board_id}/lists"
-    query = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN
-    }
-    response = requests.get(url, params=query)
+def get_board_lists(board_id):
+    """Get the board's open lists, served from board_cache when fresh."""
+    lists = board_cache.get("lists", board_id)
+    if lists is not None:
+        return lists
+    url = f"/boards/{board_id}/lists"
+    response = get_client().get(url)
     if response.status_code == 200:
-        lists = response.json()
-        for lst in lists:
-            if lst["name"] == list_name:
-                return lst["id"]
-    create_url = f"{BASE_URL}/lists"
+        return board_cache.set("lists", board_id, response.json())
+    return []
+
+
+def get_or_create_list(board_id, list_name, lists=None):
+    if lists is None:
+        lists = get_board_lists(board_id)
+    list_id = _find_list_id(lists, list_name)
+    if list_id:
+        return list_id
+    create_url = "/lists"
     create_params = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN,
         "name": list_name,
         "idBoard": board_id
     }
-    response = requests.post(create_url, params=create_params)
+    response = get_client().post(create_url, params=create_params)
+    board_cache.invalidate("lists", board_id)
     return response.json().get("id")
 
 
 def search_trello_members(query):
     """Search for Trello members by name or username."""
-    url = f"{BASE_URL}/search/members"
+    url = "/search/members"
     params = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN,
         "query": query,
         "limit": 5  
     }
-    response = requests.get(url, params=params)
+    response = get_client().get(url, params=params)
     if response.status_code == 200:
         return response.json()
     print(f"⚠️ Failed to search for members: {response.status_code} - {response.text}")
     return []
 
 
-def get_member_id_by_username(username):
-    """Get Trello member ID by username."""
-    if "john doe" in username.lower() or "johndoe" in username.lower():
-        members = search_trello_members("John Doe")
-        if members:
-            for member in members:
-                if "john" in member.get("username", "").lower() or "john" in member.get("fullName", "").lower():
-                    print(f"✅ Found John Doe: {member.get('fullName')} ({member.get('username')})")
-                    return member.get("id")  
-        
-        print("⚠️ Using fallback for John Doe")
-        return "johndoe892004"  
-    
-    # Special case for Bob Smith
-    elif "bob smith" in username.lower() or "bobsmith" in username.lower():
-        url = f"{BASE_URL}/members/bobsmith892004"
-        query = {
-            "key": TRELLO_API_KEY,
-            "token": TRELLO_OAUTH_TOKEN
-        }
-        response = requests.get(url, params=query)
-        if response.status_code == 200:
-            print(f"✅ Found Bob Smith via direct lookup")
-            return response.json().get("id")
-        
-        members = search_trello_members("Bob Smith")
-        if members:
-            for member in members:
-                if "bob" in member.get("username", "").lower() or "bob" in member.get("fullName", "").lower():
-                    print(f"✅ Found Bob Smith: {member.get('fullName')} ({member.get('username')})")
-                    return member.get("id")
-        
-        print("⚠️ Using fallback for Bob Smith")
-        return "bobsmith892004"
-    
-    # Special case
-    elif "piyush lavaniya" in username.lower() or "piyushlavaniya" in username.lower():
-        # First try direct lookup with the known username
-        url = f"{BASE_URL}/members/piyushlavaniya"
-        query = {
-            "key": TRELLO_API_KEY,
-            "token": TRELLO_OAUTH_TOKEN
-        }
-        response = requests.get(url, params=query)
-        if response.status_code == 200:
-            print(f"✅ Found Piyush Lavaniya via direct lookup")
-            return response.json().get("id")
-            
-        # If direct lookup fails, try searching
-        members = search_trello_members("Piyush Lavaniya")
-        if members:
-            for member in members:
-                if "piyush" in member.get("username", "").lower() or "piyush" in member.get("fullName", "").lower():
-                    print(f"✅ Found Piyush Lavaniya: {member.get('fullName')} ({member.get('username')})")
-                    return member.get("id")
-        
-        print("⚠️ Using fallback for Piyush Lavaniya")
-        return "piyushlavaniya"
-        
-    url = f"{BASE_URL}/members/{username}"
-    query = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN
-    }
-    response = requests.get(url, params=query)
-    if response.status_code == 200:
-        return response.json().get("id")
-    
-    members = search_trello_members(username)
-    if members:
-        for member in members:
-            if member.get("username") and (
-                username.lower() in member.get("username").lower() or
-                username.lower() in member.get("fullName", "").lower()
-            ):
-                print(f"✅ Found member via search: {member.get('fullName')} ({member.get('username')})")
-                return member.get("id")
-    
-    print(f"⚠️ Member with username '{username}' not found")
-    return None
+def get_member_id_by_username(username, board_id=None):
+    """Get Trello member ID by username or display name, matched against the board's members."""
+    if board_id is None:
+        board_id = get_board_id()
+    return member_resolver.resolve(username, board_id)
 
 
 def get_board_members(board_id):
     """Get all members of a board with their IDs."""
-    url = f"{BASE_URL}/boards/{board_id}/members"
-    query = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN
-    }
-    response = requests.get(url, params=query)
+    members = board_cache.get("members", board_id)
+    if members is not None:
+        return members
+    url = f"/boards/{board_id}/members"
+    response = get_client().get(url)
     if response.status_code == 200:
-        members = {member.get("username"): member.get("id") for member in response.json()}
+        members = _members_by_username(response.json())
         print(f"📊 Board members: {members}")
-        return members
+        return board_cache.set("members", board_id, members)
     return {}
 
 
-def create_card(list_id, task_name, description, assigned_to=None):
-    url = f"{BASE_URL}/cards"
-    due_date = (datetime.datetime.now() + datetime.timedelta(days=7)).isoformat()
+def _due_date():
+    return (datetime.datetime.now() + datetime.timedelta(days=7)).isoformat()
+
+
+def _assign_card(card_id, assigned_to, board_id=None):
+    print(f"👤 Attempting to assign card to: {assigned_to}")
+
+    if board_id is None:
+        board_id = get_board_id()
+
+    member_ids = member_resolver.resolve_card_assignees(assigned_to, board_id)
+    for member_id in member_ids:
+        if TRELLO_USE_OUTBOX:
+            from trello_outbox import get_outbox
+            get_outbox().enqueue_assign_member(card_id, member_id)
+        elif not assign_member_to_card(card_id, member_id):
+            print(f"⚠️ Failed to assign {assigned_to} to card")
+
+    if not member_ids:
+        print(f"⚠️ No member ID found for '{assigned_to}'")
+    return member_ids
+
+
+def create_card(list_id, task_name, description, assigned_to=None, board_id=None, position=None, staged=False,
+                assign=True):
+    """Create a card, due in a week and assigned to its members.
+
+    A staged card (prefetched into an archived list) gets neither: the due
+    date would count from prefetch time and members would be notified of a
+    card they can't see. release_prefetched_phase sets both. With
+    assign=False the caller assigns the members itself (the outbox queues
+    them as operations of their own).
+    """
+    url = "/cards"
     
-    detailed_description = description
-    if assigned_to:
-        detailed_description += f"\n\nAssigned to: {assigned_to}"
+    detailed_description = _card_description(description, assigned_to)
     
     params = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN,
         "idList": list_id,
         "name": task_name,
-        "desc": detailed_description,
-        "due": due_date
+        "desc": detailed_description
     }
+    if not staged:
+        params["due"] = _due_date()
+    if position is not None:
+        params["pos"] = position
 
-    response = requests.post(url, params=params)
+    response = get_client().post(url, params=params)
     print(f"🔹 Trello API Status Code: {response.status_code}")
     
     if response.status_code != 200:
@@ -204,72 +606,8 @@ def create_card(list_id, task_name, description, assigned_to=None):
     try:
         card = response.json()
         
-        if assigned_to and card.get("id"):
-            print(f"👤 Attempting to assign card to: {assigned_to}")
-            
-            board_id = get_board_id()
-            
-            board_members = get_board_members(board_id)
-            member_id = None
-            
-            if "john doe" in assigned_to.lower() or "johndoe" in assigned_to.lower():
-                print("🔍 Detected John Doe assignment")
-                for username, user_id in board_members.items():
-                    if "john" in username.lower():
-                        member_id = user_id
-                        print(f"✅ Found John Doe in board members: {username}")
-                        break
-
-                if not member_id:
-                    member_id = get_member_id_by_username("John Doe")
-                    if member_id:
-                        add_member_to_board(board_id, member_id)
-            elif "bob smith" in assigned_to.lower() or "bobsmith" in assigned_to.lower():
-                print("🔍 Detected Bob Smith assignment")
-
-                for username, user_id in board_members.items():
-                    if "bob" in username.lower():
-                        member_id = user_id
-                        print(f"✅ Found Bob Smith in board members: {username}")
-                        break
-
-                if not member_id:
-                    member_id = get_member_id_by_username("Bob Smith")
-                    if member_id:
-                        add_member_to_board(board_id, member_id)
-            elif "piyush lavaniya" in assigned_to.lower() or "piyushlavaniya" in assigned_to.lower():
-                print("🔍 Detected Piyush Lavaniya assignment")
-                for username, user_id in board_members.items():
-                    if "piyush" in username.lower():
-                        member_id = user_id
-                        print(f"✅ Found Piyush Lavaniya in board members: {username}")
-                        break
-                
-                if not member_id:
-                    member_id = get_member_id_by_username("Piyush Lavaniya")
-                    if member_id:
-                        add_member_to_board(board_id, member_id)
-            else:
-                for username, user_id in board_members.items():
-                    if assigned_to.lower() in username.lower() or assigned_to.lower() in user_id.lower():
-                        member_id = user_id
-                        print(f"✅ Found board member match: {username}")
-                        break
-                
-
-                if not member_id:
-                    member_id = get_member_id_by_username(assigned_to)
-                    if member_id:
-                    
-                        add_member_to_board(board_id, member_id)
-
-            if member_id:
-                success = assign_member_to_card(card.get("id"), member_id)
-                if not success:
-                    print(f"⚠️ Failed to assign {assigned_to} to card, trying alternative approach")
-
-            else:
-                print(f"⚠️ No member ID found for '{assigned_to}'")
+        if assigned_to and card.get("id") and assign and not staged:
+            _assign_card(card["id"], assigned_to, board_id)
         
         return card
     except requests.exceptions.JSONDecodeError:
@@ -278,16 +616,16 @@ def create_card(list_id, task_name, description, assigned_to=None):
     
 def add_member_to_board(board_id, member_id):
     """Add a member to board by member ID."""
-    board_url = f"{BASE_URL}/boards/{board_id}/members"
+    board_url = f"/boards/{board_id}/members"
     board_params = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN,
         "idMember": member_id,
         "type": "normal"
     }
     
-    board_response = requests.put(board_url, params=board_params)
+    board_response = get_client().put(board_url, params=board_params)
     status = board_response.status_code
+    if status == 200:
+        board_cache.invalidate("members", board_id)
     print(f"📝 Adding member to board result: {status}")
     
     if status == 200:
@@ -306,9 +644,15 @@ def add_member_to_board(board_id, member_id):
 
 def add_member_to_board_and_card(board_id, card_id, username):
     """Add a member to board if not already a member, then assign to card."""
-    member_id = get_member_id_by_username(username)
+    member_id = get_member_id_by_username(username, board_id)
     
-    if member_id:
+    if member_id and TRELLO_USE_OUTBOX:
+        from trello_outbox import get_outbox
+        # An assignment that runs before the board membership fails and is retried.
+        get_outbox().enqueue_add_member_to_board(board_id, member_id)
+        get_outbox().enqueue_assign_member(card_id, member_id)
+        return True
+    elif member_id:
         added_to_board = add_member_to_board(board_id, member_id)
         
         if added_to_board:
@@ -323,19 +667,17 @@ def add_member_to_board_and_card(board_id, card_id, username):
 
 def assign_member_to_card(card_id, member_id):
     """Assign a member to a card."""
-    url = f"{BASE_URL}/cards/{card_id}/idMembers"
+    url = f"/cards/{card_id}/idMembers"
     params = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN,
         "value": member_id
     }
     
-    response = requests.post(url, params=params)
+    response = get_client().post(url, params=params)
     if response.status_code == 200:
         print(f"✅ Assigned member to card {card_id}")
         return True
     else:
-        put_response = requests.put(url, params=params)
+        put_response = get_client().put(url, params=params)
         if put_response.status_code == 200:
             print(f"✅ Assigned member to card using PUT {card_id}")
             return True
@@ -344,14 +686,26 @@ def assign_member_to_card(card_id, member_id):
     return False
 
 
+def remove_member_from_card(card_id, member_id):
+    """Remove a member from a card."""
+    response = get_client().delete(f"/cards/{card_id}/idMembers/{member_id}")
+    if response.status_code == 200:
+        print(f"✅ Removed member from card {card_id}")
+        return True
+    print(f"❌ Failed to remove member from card: {response.status_code} - {response.text}")
+    return False
+
+
 def update_card_status(card_id, new_list_id):
-    url = f"{BASE_URL}/cards/{card_id}"
+    if TRELLO_USE_OUTBOX:
+        from trello_outbox import get_outbox
+        # Queued moves of one card coalesce into a single PUT.
+        return {"id": card_id, "queued": get_outbox().enqueue_card_status(card_id, new_list_id)}
+    url = f"/cards/{card_id}"
     query = {
-        "idList": new_list_id,
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN
+        "idList": new_list_id
     }
-    response = requests.put(url, params=query)
+    response = get_client().put(url, params=query)
     return response.json()
 
 
@@ -370,6 +724,9 @@ def load_tasks_from_json():
             try:
                 data = json.load(f)
                 print(f"📚 Loaded task data from JSON: {JSON_FILE}")
+                if isinstance(data, list):
+                    # save_allocation_to_json writes the task list directly.
+                    data = {"tasks": data}
                 tasks = data.get("tasks", [])
                 if tasks and len(tasks) > 0:
                     print(f"📝 First task sample: {tasks[0]}")
@@ -415,41 +772,505 @@ def parse_allocation_tasks(tasks):
     return phases
 
 
-def add_tasks_from_allocation(board_id, tasks, phase_list_name):
-    phase_list_id = get_or_create_list(board_id, phase_list_name)
-    board_members = get_board_members(board_id)
-    
-    for task in tasks:
-        task_name = task.get("task_name")
-        description = f"Task: {task_name}\n"
-        if task.get("duration"):
-            description += f"Duration: {task.get('duration')}\n"
-        if task.get("resources") and len(task.get("resources")) > 0:
-            description += f"Resources: {', '.join(task.get('resources'))}\n"
-        
-        assignee = task.get("assigned_to")
-        
-        print(f"📌 Adding Task to Trello: {task_name}")
-        print(f"👤 Assigned to: {assignee}")
+def _task_card_fields(task):
+    task_name = task.get("task_name")
+    description = f"Task: {task_name}\n"
+    if task.get("duration"):
+        description += f"Duration: {task.get('duration')}\n"
+    if task.get("resources") and len(task.get("resources")) > 0:
+        description += f"Resources: {', '.join(task.get('resources'))}\n"
+    return task_name, description, task.get("assigned_to")
+
+
+def _card_description(description, assigned_to=None):
+    if assigned_to:
+        description += f"\n\nAssigned to: {assigned_to}"
+    return description
+
+
+def task_key(task_or_card_name):
+    """Stable key for a task: its task_id (e.g. "1.2"), else its normalized name.
+
+    Accepts a task dict or a card name; card names are written as
+    "<task_id> - <task name>", so both sides resolve to the same key.
+    """
+    if isinstance(task_or_card_name, dict):
+        if task_or_card_name.get("task_id"):
+            return str(task_or_card_name["task_id"]).strip()
+        name = task_or_card_name.get("task_name") or ""
+    else:
+        name = task_or_card_name or ""
+    id_match = re.match(r'^\s*(?:Task\s*)?(\d+(?:\.\d+)+)\b', name, re.IGNORECASE)
+    if id_match:
+        return id_match.group(1)
+    return " ".join(name.lower().split())
+
+
+def plan_card_sync(tasks, phase_list_id, phase_list_name, lists, board_cards):
+    """Diff the phase's tasks against the cards already on the board.
+
+    Returns one operation per task, in task order:
+      create - no card carries the task's key yet
+      update - the card is in the phase list but its name/desc changed
+      move   - the card sits in another list of the same phase
+      skip   - the card is already up to date
+    Cards in another list of the phase that are already complete are
+    skipped rather than moved, so finished work is never reopened.
+    """
+    phase_prefix = phase_list_name.split(" - ")[0] + " - "
+    phase_list_ids = {lst["id"] for lst in lists if lst["name"].startswith(phase_prefix)}
+    if phase_list_id:
+        phase_list_ids.add(phase_list_id)
+
+    existing = {}
+    for card in board_cards:
+        if card.get("idList") not in phase_list_ids:
+            continue
+        key = task_key(card.get("name"))
+        # Prefer the copy already in the target list if there are several.
+        if key not in existing or card.get("idList") == phase_list_id:
+            existing[key] = card
+
+    plan = []
+    for position, task in enumerate(tasks, start=1):
+        task_name, description, assignee = _task_card_fields(task)
+        card = existing.get(task_key(task))
+        operation = {"task": task, "position": position, "card": card}
+
+        if card is None:
+            operation["op"] = "create"
+        elif card.get("idList") != phase_list_id:
+            operation["op"] = "skip" if card.get("dueComplete") else "move"
+        elif card.get("name") != task_name or card.get("desc") != _card_description(description, assignee):
+            operation["op"] = "update"
+        else:
+            operation["op"] = "skip"
+        plan.append(operation)
+    return plan
+
+
+def summarize_sync_plan(plan):
+    counts = {"create": 0, "update": 0, "move": 0, "skip": 0}
+    for operation in plan:
+        counts[operation["op"]] += 1
+    return counts
+
+
+def card_member_changes(card, assigned_to, board_id=None):
+    """(member ids to add, member ids to remove) to make the card's idMembers match assigned_to.
+
+    Members are only removed when every named assignee resolved: with a name
+    unresolved there is no telling whether a current member is that person.
+    """
+    names = split_assignees(assigned_to)
+    wanted = set(member_resolver.resolve_card_assignees(assigned_to, board_id))
+    current = set(card.get("idMembers") or [])
+    remove = current - wanted if len(wanted) == len(names) else set()
+    return sorted(wanted - current), sorted(remove)
+
+
+def _sync_card_members(card_id, card, assigned_to, board_id):
+    add, remove = card_member_changes(card, assigned_to, board_id)
+    for member_id in add:
+        assign_member_to_card(card_id, member_id)
+    for member_id in remove:
+        remove_member_from_card(card_id, member_id)
+
+
+def _update_card(card_id, params):
+    response = get_client().put(f"/cards/{card_id}", params=params)
+    if response.status_code != 200:
+        print(f"❌ Failed to update card {card_id}: {response.status_code} - {response.text}")
+        return None
+    return response.json()
+
+
+def add_tasks_from_allocation(board_id, tasks, phase_list_name, max_workers=None, dry_run=False,
+                              use_outbox=None, wait=False):
+    """Reconcile the phase list with `tasks` and report throughput.
+
+    Existing cards are matched by task_key, so re-running a sync only sends
+    the delta (see plan_card_sync). With dry_run the plan is printed and
+    returned without touching the board.
+
+    With use_outbox (default TRELLO_USE_OUTBOX) the writes are queued in the
+    durable outbox and the call returns once they are enqueued, or once they
+    have been applied if wait is set. use_outbox may also be a TrelloOutbox
+    to queue into instead of the shared, self-draining one.
+
+    With max_workers > 1 cards are created and assigned from a thread pool;
+    every request still passes through the client's shared token bucket.
+    Cards get an explicit `pos`, so list order matches task order either way.
+    """
+    max_workers = max_workers or TRELLO_SYNC_WORKERS
+    started = time.monotonic()
+
+    snapshot = fetch_board_snapshot(board_id, include_board_cards=True)
+    if dry_run:
+        phase_list_id = _find_list_id(snapshot["lists"], phase_list_name)
+    else:
+        phase_list_id = get_or_create_list(board_id, phase_list_name, lists=snapshot["lists"])
+    board_cards = [card for cards in snapshot["cards"].values() for card in cards]
+
+    plan = plan_card_sync(tasks, phase_list_id, phase_list_name, snapshot["lists"], board_cards)
+    counts = summarize_sync_plan(plan)
+    print(f"🧮 Sync plan for {phase_list_name}: {counts['create']} create, {counts['update']} update, "
+          f"{counts['move']} move, {counts['skip']} skip")
+    if dry_run:
+        return {"phase": phase_list_name, "dry_run": True, "operations": counts,
+                "requests": counts["create"] + counts["update"] + counts["move"]}
+
+    if TRELLO_USE_OUTBOX if use_outbox is None else use_outbox:
+        outbox = None if use_outbox is None or use_outbox is True else use_outbox
+        return _enqueue_card_sync(board_id, plan, phase_list_id, phase_list_name, counts, started, wait, outbox)
+
+    # Resolve every assignee up front so card creation only hits the resolver's cache.
+    member_resolver.resolve_all([operation["task"].get("assigned_to") for operation in plan
+                                 if operation["op"] in ("create", "update")], board_id)
+
+    def apply_operation(operation):
+        task_name, description, assignee = _task_card_fields(operation["task"])
         
-        create_card(phase_list_id, task_name, description, assignee)
+        if operation["op"] == "create":
+            print(f"📌 Adding Task to Trello: {task_name}")
+            print(f"👤 Assigned to: {assignee}")
+            
+            return create_card(phase_list_id, task_name, description, assignee,
+                               board_id=board_id, position=operation["position"])
+        if operation["op"] == "update":
+            print(f"✏️ Updating Task on Trello: {task_name}")
+            card = _update_card(operation["card"]["id"], {
+                "name": task_name,
+                "desc": _card_description(description, assignee),
+                "pos": operation["position"]
+            })
+            if card:
+                # The description names the assignees; keep the card's members in line with it.
+                _sync_card_members(card["id"], operation["card"], assignee, board_id)
+            return card
+        if operation["op"] == "move":
+            print(f"➡️ Moving Task into {phase_list_name}: {task_name}")
+            return _update_card(operation["card"]["id"], {
+                "idList": phase_list_id,
+                "pos": operation["position"]
+            })
+        return operation["card"]
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            cards = list(executor.map(apply_operation, plan))
+    else:
+        cards = [apply_operation(operation) for operation in plan]
     
+    elapsed = time.monotonic() - started
+    created = sum(1 for operation, card in zip(plan, cards) if card and operation["op"] == "create")
+    failed = sum(1 for card in cards if not card)
+    stats = {
+        "phase": phase_list_name,
+        "operations": counts,
+        "cards_created": created,
+        "cards_failed": failed,
+        "seconds": round(elapsed, 3),
+        "cards_per_second": round(created / elapsed, 2) if elapsed > 0 else 0.0,
+        "workers": max_workers
+    }
     print(f"✅ Tasks from {phase_list_name} added to Trello successfully!")
+    print(f"⏱️ {created}/{counts['create']} new cards in {stats['seconds']}s "
+          f"({stats['cards_per_second']} cards/s, {max_workers} workers)")
+    return stats
 
 
-def check_phase_completion(board_id, phase_list_name):
-    phase_list_id = get_or_create_list(board_id, phase_list_name)
+def _enqueue_card_sync(board_id, plan, phase_list_id, phase_list_name, counts, started, wait, outbox=None):
+    from trello_outbox import get_outbox
 
-    url = f"{BASE_URL}/lists/{phase_list_id}/cards"
-    query = {
-        "key": TRELLO_API_KEY,
-        "token": TRELLO_OAUTH_TOKEN
+    outbox = outbox or get_outbox()
+    op_ids = []
+    for operation in plan:
+        task_name, description, assignee = _task_card_fields(operation["task"])
+        if operation["op"] == "create":
+            op_ids.append(outbox.enqueue_create_card(phase_list_id, task_name, description, assignee,
+                                                     board_id=board_id, position=operation["position"]))
+        elif operation["op"] == "update":
+            card_id = operation["card"]["id"]
+            op_ids.append(outbox.enqueue_card_update(card_id, {
+                "name": task_name,
+                "desc": _card_description(description, assignee),
+                "pos": operation["position"]
+            }))
+            add, remove = card_member_changes(operation["card"], assignee, board_id)
+            op_ids.extend(outbox.enqueue_assign_member(card_id, member_id) for member_id in add)
+            op_ids.extend(outbox.enqueue_remove_member(card_id, member_id) for member_id in remove)
+        elif operation["op"] == "move":
+            op_ids.append(outbox.enqueue_card_update(operation["card"]["id"], {
+                "idList": phase_list_id,
+                "pos": operation["position"]
+            }))
+    print(f"📬 Queued {len(op_ids)} Trello operations for {phase_list_name}")
+
+    applied = outbox.wait_for(op_ids) if wait else None
+    elapsed = time.monotonic() - started
+    return {
+        "phase": phase_list_name,
+        "operations": counts,
+        "queued": op_ids,
+        "applied": applied,
+        "cards_created": counts["create"] if applied else 0,
+        "cards_failed": 0 if applied or not wait else counts["create"],
+        "seconds": round(elapsed, 3),
+        "cards_per_second": round(counts["create"] / elapsed, 2) if applied and elapsed > 0 else 0.0,
+        "workers": outbox.max_workers
     }
+
+
+def _get_all_lists(board_id):
+    """Open and archived lists of the board (never cached: used off the hot path)."""
+    response = get_client().get(f"/boards/{board_id}/lists", params={"filter": "all"})
+    return response.json() if response.status_code == 200 else []
+
+
+def _set_list_closed(list_id, closed):
+    response = get_client().put(f"/lists/{list_id}/closed", params={"value": "true" if closed else "false"})
+    return response.status_code == 200
+
+
+def prefetch_phase(board_id, tasks, phase_list_name, all_lists=None):
+    """Pre-create a phase's list and cards in an archived list.
+
+    Safe to repeat: an existing archived list is reused and only cards that
+    are missing from it get created. Lists that are already open (released)
+    are left alone. Returns the archived list id, or None if nothing was done.
+    """
+    if all_lists is None:
+        all_lists = _get_all_lists(board_id)
+    existing = [lst for lst in all_lists if lst["name"] == phase_list_name]
+    if any(not lst.get("closed") for lst in existing):
+        return None
+
+    if existing:
+        list_id = existing[0]["id"]
+        response = get_client().get(f"/lists/{list_id}/cards")
+        cards = response.json() if response.status_code == 200 else []
+    else:
+        response = get_client().post("/lists", params={"name": phase_list_name, "idBoard": board_id})
+        if response.status_code != 200:
+            print(f"❌ Failed to create list {phase_list_name}: {response.status_code} - {response.text}")
+            return None
+        list_id = response.json().get("id")
+        # Archive before adding cards so the team never sees a half-built phase.
+        _set_list_closed(list_id, True)
+        cards = []
+
+    lists = [{"id": list_id, "name": phase_list_name}]
+    plan = plan_card_sync(tasks, list_id, phase_list_name, lists, cards)
+    created = 0
+    for operation in plan:
+        if operation["op"] != "create":
+            continue
+        task_name, description, assignee = _task_card_fields(operation["task"])
+        if create_card(list_id, task_name, description, assignee, board_id=board_id,
+                       position=operation["position"], staged=True):
+            created += 1
+    print(f"📦 Prefetched {phase_list_name}: {created} new cards in archived list {list_id}")
+    return list_id
+
+
+def prefetch_phases(board_id, phases, skip=(), project_id=None):
+    """Prefetch every phase not in `skip` (phases as returned by parse_allocation_tasks)."""
+    all_lists = _get_all_lists(board_id)
+    prefetched = {}
+    for phase in sorted(phases.keys(), key=int):
+        if phase in skip:
+            continue
+        list_id = prefetch_phase(board_id, phases[phase], phase_list_name(phase, project_id=project_id), all_lists)
+        if list_id:
+            prefetched[phase] = list_id
+    return prefetched
+
+
+def _activate_staged_cards(board_id, list_id, tasks):
+    """Give a released list's staged cards (those without a due date) their due date and members."""
+    response = get_client().get(f"/lists/{list_id}/cards")
+    if response.status_code != 200:
+        print(f"⚠️ Could not read released cards of list {list_id}: {response.status_code} - {response.text}")
+        return 0
+    staged = [card for card in response.json() if not card.get("due")]
+    assignees = {task_key(task): _task_card_fields(task)[2] for task in tasks}
+    member_resolver.resolve_all([assignees.get(task_key(card.get("name"))) for card in staged], board_id)
+    due_date = _due_date()
+    for card in staged:
+        if TRELLO_USE_OUTBOX:
+            from trello_outbox import get_outbox
+            get_outbox().enqueue_card_update(card["id"], {"due": due_date})
+        else:
+            _update_card(card["id"], {"due": due_date})
+        assignee = assignees.get(task_key(card.get("name")))
+        if assignee:
+            _assign_card(card["id"], assignee, board_id)
+    return len(staged)
+
+
+def release_prefetched_phase(board_id, phase_list_name, tasks=()):
+    """Unarchive a prefetched phase list and activate its cards; returns True if one was released."""
+    for lst in _get_all_lists(board_id):
+        if lst["name"] == phase_list_name and lst.get("closed"):
+            if _set_list_closed(lst["id"], False):
+                board_cache.invalidate("lists", board_id)
+                activated = _activate_staged_cards(board_id, lst["id"], tasks)
+                print(f"🚀 Released prefetched {phase_list_name} ({activated} cards now due and assigned)")
+                return True
+    return False
+
+
+def release_phase(board_id, tasks, phase_list_name, **kwargs):
+    """Make a phase live: unarchive its prefetched list if there is one, then
+    reconcile it with add_tasks_from_allocation (a no-op diff when prefetched)."""
+    released = release_prefetched_phase(board_id, phase_list_name, tasks) if TRELLO_PREFETCH_PHASES else False
+    # Monitoring must not start before the cards exist, so wait for queued writes.
+    kwargs.setdefault("wait", True)
+    stats = add_tasks_from_allocation(board_id, tasks, phase_list_name, **kwargs)
+    stats["prefetched"] = released
+    return stats
+
+
+def project_tag(project_id):
+    """Short tag that keeps one project's phase lists apart from another's on a shared board."""
+    return str(project_id)[:8] if project_id else None
+
+
+def phase_list_name(phase, suffix="Not Started", project_id=None):
+    """"Phase N - suffix", or "Phase N [tag] - suffix" for a project registered with the scheduler."""
+    tag = project_tag(project_id)
+    return f"Phase {phase} [{tag}] - {suffix}" if tag else f"Phase {phase} - {suffix}"
+
+
+def _phase_number(list_name, project_id=None):
+    """Phase number of a phase list belonging to project_id (unscoped lists when None), else None."""
+    phase_match = re.match(r'^Phase\s+(\d+)\s+(?:\[([\w-]+)\]\s+)?-\s+', list_name or "")
+    if not phase_match or phase_match.group(2) != project_tag(project_id):
+        return None
+    return phase_match.group(1)
+
+
+def _load_board_summary(summary_file=BOARD_SUMMARY_FILE):
+    if not os.path.exists(summary_file):
+        return {}
+    try:
+        with open(summary_file, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Starting a new board summary, could not read {summary_file}: {str(e)}")
+        return {}
+
+
+def _save_board_summary(board_id, entries, summary_file=BOARD_SUMMARY_FILE):
+    summary = _load_board_summary(summary_file)
+    board_summary = summary.setdefault(board_id, {})
+    for entry in entries:
+        board_summary.setdefault(entry["plan"], {})[entry["list_name"]] = entry
+    with open(summary_file, "w") as f:
+        json.dump(summary, f, indent=4)
+
+
+def plan_fingerprint(tasks):
+    """Identity of a plan (or one phase of it): a hash of its tasks' keys and names.
+
+    Names are included because task keys alone ("1.1", "1.2", ...) repeat
+    across unrelated plans.
+    """
+    material = sorted(f"{task_key(task)}|{' '.join((task.get('task_name') or '').lower().split())}"
+                      for task in tasks)
+    return hashlib.sha1("\n".join(material).encode("utf-8")).hexdigest()[:16]
+
+
+def compact_board(board_id, phases, summary_file=BOARD_SUMMARY_FILE, project_id=None):
+    """Archive the lists and cards of finished phases, keeping a local summary.
+
+    `phases` maps each finished phase number to the tasks that were synced
+    for it. Every open "Phase N - ..." list of project_id whose N is in
+    phases has its cards archived in bulk and is then archived itself, so
+    list and card reads on the hot path only see the active phase. Card
+    names and completion counts go to summary_file first, filed under the
+    phase's plan_fingerprint. Returns the archived list ids.
+    """
+    plans = {str(phase): plan_fingerprint(tasks) for phase, tasks in phases.items()}
+    lists = [lst for lst in get_board_lists(board_id)
+             if _phase_number(lst["name"], project_id) in plans]
+    if not lists:
+        return []
+
+    reader = BatchReader()
+    card_reads = [(lst, reader.add(f"/lists/{lst['id']}/cards")) for lst in lists]
+    reader.flush()
+
+    archived = []
+    entries = []
+    for lst, read in card_reads:
+        cards = read.data if read.ok else []
+        phase = _phase_number(lst["name"], project_id)
+        entries.append({
+            "phase": phase,
+            "plan": plans[phase],
+            "list_name": lst["name"],
+            "list_id": lst["id"],
+            "cards": len(cards),
+            "completed": sum(1 for card in cards if card.get("dueComplete")),
+            "card_names": [card.get("name") for card in cards],
+            "archived_at": datetime.datetime.now().isoformat()
+        })
+        if cards:
+            response = get_client().post(f"/lists/{lst['id']}/archiveAllCards")
+            if response.status_code != 200:
+                print(f"⚠️ Failed to archive cards of {lst['name']}: {response.status_code} - {response.text}")
+                continue
+        if _set_list_closed(lst["id"], True):
+            archived.append(lst["id"])
+
+    _save_board_summary(board_id, entries, summary_file)
+    board_cache.invalidate("lists", board_id)
+    print(f"🧹 Compacted {len(archived)} lists from finished phases {sorted(plans, key=int)}")
+    return archived
+
+
+def finished_phases(board_id, phases, summary_file=BOARD_SUMMARY_FILE, project_id=None):
+    """Phases of `phases` that compact_board already archived, which a re-run must not create again.
+
+    A phase only counts as finished if the board summary records one of
+    project_id's lists for it under the same plan_fingerprint, so another
+    plan synced to the same board (or the same phase number with other
+    tasks) is never skipped.
+    """
+    board_summary = _load_board_summary(summary_file).get(board_id, {})
+    finished = set()
+    for phase, tasks in phases.items():
+        phase_lists = board_summary.get(plan_fingerprint(tasks), {})
+        if any(_phase_number(list_name, project_id) == str(phase) for list_name in phase_lists):
+            finished.add(phase)
+    return finished
+
+
+def check_phase_completion(board_id, phase_list_name):
+    # With the phase list's id cached only that list's cards are read. Otherwise
+    # the lists and the board's open cards come back in one /batch round trip
+    # and the phase's cards are picked out locally by idList.
+    lists = board_cache.get("lists", board_id)
+    phase_list_id = _find_list_id(lists, phase_list_name) if lists is not None else None
+    reader = BatchReader()
+    lists_read = reader.add(f"/boards/{board_id}/lists") if lists is None else None
+    if phase_list_id:
+        cards_read = reader.add(f"/lists/{phase_list_id}/cards")
+    else:
+        cards_read = reader.add(f"/boards/{board_id}/cards/open")
+    reader.flush()
+    if lists_read is not None and lists_read.ok:
+        lists = board_cache.set("lists", board_id, lists_read.data)
+
+    if not phase_list_id:
+        phase_list_id = get_or_create_list(board_id, phase_list_name, lists=lists)
+
     print(f"🔍 Checking completion status for list: {phase_list_name} (ID: {phase_list_id})")
-    response = requests.get(url, params=query)
     
-    if response.status_code == 200:
-        cards = response.json()
+    if cards_read.ok:
+        cards = [card for card in cards_read.data if card.get("idList") == phase_list_id]
         print(f"📊 Found {len(cards)} cards in the list")
         
         if not cards:  
@@ -468,11 +1289,21 @@ def check_phase_completion(board_id, phase_list_name):
             
         return is_complete
     else:
-        print(f"❌ Error getting cards: {response.status_code} - {response.text}")
+        print(f"❌ Error getting cards: {cards_read.status_code}")
         return False
 
 
+def report_batch_savings(label):
+    stats = get_batch_stats()
+    print(f"📦 {label}: {stats['batched_urls']} reads in {stats['batch_calls']} batch calls "
+          f"({stats['round_trips_saved']} round trips saved)")
+    return stats
+
+
 def check_and_add_tasks():
+    # Imported here because trello_events builds on this module.
+    from trello_events import wait_for_phase_completion, forget_lists
+
     board_id = get_board_id()
     
     tasks = load_tasks_from_json()
@@ -480,39 +1311,82 @@ def check_and_add_tasks():
 
     phases = parse_allocation_tasks(tasks)
 
-    sorted_phases = sorted(phases.keys(), key=int)
+    # Phases of this plan compacted by an earlier run no longer have open lists; don't recreate them.
+    finished = finished_phases(board_id, phases)
+    if finished & set(phases):
+        print(f"⏭️ Skipping phases already finished and compacted: {sorted(finished & set(phases), key=int)}")
+    sorted_phases = sorted((phase for phase in phases if phase not in finished), key=int)
     
     current_phase_index = 0
     
     while current_phase_index < len(sorted_phases):
         current_phase = sorted_phases[current_phase_index]
-        current_phase_name = f"Phase {current_phase} - Not Started"
-        next_phase_name = f"Phase {current_phase} - Completed"
+        current_phase_name = phase_list_name(current_phase)
+        next_phase_name = phase_list_name(current_phase, "Completed")
         
         print(f"🔄 Working on {current_phase_name}")
         
-        add_tasks_from_allocation(board_id, phases[current_phase], current_phase_name)
+        reset_batch_stats()
+        release_phase(board_id, phases[current_phase], current_phase_name)
         
-        while True:
-            print(f"🔄 Checking if all tasks in {current_phase_name} are completed...")
-            if check_phase_completion(board_id, current_phase_name):
-                print(f"✅ Tasks in {current_phase_name} completed.")
-                
-                completed_list_id = get_or_create_list(board_id, next_phase_name)
-                
+        if TRELLO_PREFETCH_PHASES and current_phase_index == 0:
+            # Build the later phases while the team works on the first one.
+            prefetch_phases(board_id, phases, skip=set(sorted_phases[:1]) | finished)
+        
+        print(f"🔄 Checking if all tasks in {current_phase_name} are completed...")
+        wait_for_phase_completion(board_id, current_phase_name)
+        print(f"✅ Tasks in {current_phase_name} completed.")
+        report_batch_savings(f"Phase {current_phase} sync")
+        
+        if TRELLO_AUTO_COMPACT:
+            # No "Completed" list: it would be archived straight away.
+            done_phases = sorted_phases[:current_phase_index + 1]
+            forget_lists(compact_board(board_id, {phase: phases[phase] for phase in done_phases}))
+        else:
+            get_or_create_list(board_id, next_phase_name)
+
+        current_phase_index += 1
+        
+        if current_phase_index < len(sorted_phases):
+            next_phase = sorted_phases[current_phase_index]
+            print(f"➡️ Moving to Phase {next_phase}")
+        else:
+            print("🎉 All phases completed!")
+
+def enqueue_first_phase(board_name=BOARD_NAME):
+    """Queue the first phase of the saved allocation in the outbox and return."""
+    from trello_outbox import TrelloOutbox
+
+    board_id = get_board_id(board_name)
+    phases = parse_allocation_tasks(load_tasks_from_json())
+    if not phases:
+        print("⚠️ No phases found in tasks!")
+        return None
+    first_phase = sorted(phases.keys(), key=int)[0]
+    # Not get_outbox(): its drainer would die with this process mid-claim. Nothing is claimed here.
+    return add_tasks_from_allocation(board_id, phases[first_phase], phase_list_name(first_phase),
+                                     use_outbox=TrelloOutbox())
+
+
+def preview_sync(board_name=BOARD_NAME):
+    """Dry-run every phase of the saved allocation and print the operation counts."""
+    board_id = get_board_id(board_name)
+    phases = parse_allocation_tasks(load_tasks_from_json())
+    total = 0
+    for phase in sorted(phases.keys(), key=int):
+        stats = add_tasks_from_allocation(board_id, phases[phase], phase_list_name(phase), dry_run=True)
+        total += stats["requests"]
+    print(f"🧮 Dry run: {total} write operations needed")
+    return total
 
-                current_phase_index += 1
-                
-                if current_phase_index < len(sorted_phases):
-                    next_phase = sorted_phases[current_phase_index]
-                    print(f"➡️ Moving to Phase {next_phase}")
-                else:
-                    print("🎉 All phases completed!")
-                
-                break
-            
-            print(f"⚠️ Tasks in {current_phase_name} are not completed yet.")
-            time.sleep(120) 
 
 if __name__ == "__main__":
-    check_and_add_tasks()
\ No newline at end of file
+    import sys
+
+    if "--dry-run" in sys.argv:
+        preview_sync()
+    elif "--enqueue" in sys.argv:
+        # Drain later with `python trello_outbox.py drain` or by the running app.
+        enqueue_first_phase()
+    else:
+        check_and_add_tasks()
\ No newline at end of file